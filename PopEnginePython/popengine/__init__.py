@@ -0,0 +1,12 @@
+"""Shared population engine for Project Microbe"""
+
+from .checkpoint import CheckpointError
+from .continuous import ContinuousResult, integrate
+from .engine import ModelArrays, PeriodicOrbit, VectorEngine
+from .ensemble import Ensemble, Trajectories
+from .export import StreamExporter, history_block, read_columns
+from .history import ArrayHistory, ColumnHistory, DiskHistory, HistoryBuffer, HistoryPyramid, HistoryTable, shared_pyramid
+from .model import Environment, Microbe, advance
+from .simulation import Simulation, run_many, run_scenario
+from .store import SimulationStore, TurnLock
+from .toxicity import ToxinTable, toxicity_multipliers
@@ -0,0 +1,141 @@
+import json
+import os
+import struct
+
+import numpy as np
+
+from .history import ArrayHistory, DiskHistory
+
+#
+# --- CHECKPOINTS ---
+#
+# A checkpoint is one file holding the whole state of a Simulation:
+#
+#   8 bytes   magic, b"POPCKPT1"
+#   8 bytes   length of the header, little endian
+#   header    JSON with the step counter, resources, refresh rates, every microbe
+#             (including its toxins) and where each history is in the file
+#   data      every history as raw little endian float64, each starting on a
+#             64 byte boundary
+#
+# The histories are written straight from memory and memory-mapped when read,
+# so only the parts that are used get loaded.
+#
+
+MAGIC = b"POPCKPT1"
+VERSION = 1
+
+# Every array starts on a multiple of this many bytes
+ALIGNMENT = 64
+
+HISTORY_DTYPE = np.dtype("<f8")
+
+class CheckpointError(ValueError):
+    """Raised when a file is not a checkpoint this version can read"""
+
+def save_checkpoint(simulation, path):
+    """Write the state and every history of a simulation to path
+
+    The file is written next to path first and then moved over it, so a crash
+    while saving leaves the previous checkpoint in place.
+    """
+
+    env = simulation.env
+    histories = []
+
+    def add(values):
+        histories.append(values)
+        return len(histories) - 1
+
+    header = {
+        "version": VERSION,
+        "step": simulation.current_step,
+        "backend": simulation.backend,
+        "resources": dict(env.resources),
+        "resource_refresh_rate": dict(env.resource_refresh_rate),
+        "resource_history": {res: add(values) for res, values in env.resource_history.items()},
+        "microbes": [
+            {
+                "name": microbe.name,
+                "population": microbe.population,
+                "growth_rate": microbe.growth_rate,
+                "required_resources": dict(microbe.required_resources),
+                "produced_resources": dict(microbe.produced_resources),
+                "toxins": {res: dict(toxin) for res, toxin in microbe.toxins.items()},
+                "pop_history": add(microbe.pop_history),
+                "k_history": add(microbe.k_history),
+            }
+            for microbe in simulation.microbes
+        ],
+    }
+
+    # Offsets are relative to the start of the data, which follows the padded header
+    offset = 0
+    header["arrays"] = []
+    for values in histories:
+        header["arrays"].append({"offset": offset, "length": len(values)})
+        offset = _aligned(offset + len(values) * HISTORY_DTYPE.itemsize)
+
+    encoded = json.dumps(header).encode("utf-8")
+    encoded += b" " * (_aligned(16 + len(encoded)) - 16 - len(encoded))
+
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as file:
+        file.write(MAGIC)
+        file.write(struct.pack("<Q", len(encoded)))
+        file.write(encoded)
+
+        written = 0
+        for values, entry in zip(histories, header["arrays"]):
+            file.write(b"\0" * (entry["offset"] - written))
+            written = entry["offset"]
+            for piece in _history_pieces(values):
+                file.write(memoryview(piece).cast("B"))
+                written += piece.nbytes
+
+    os.replace(temporary, path)
+
+def read_checkpoint(path):
+    """The header of a checkpoint, with every history as a read-only memory-mapped array"""
+
+    with open(path, "rb") as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise CheckpointError(f"{path} is not a checkpoint")
+        (length,) = struct.unpack("<Q", file.read(8))
+        header = json.loads(file.read(length))
+
+    if header.get("version") != VERSION:
+        raise CheckpointError(f"{path} is a version {header.get('version')} checkpoint, expected {VERSION}")
+
+    start = len(MAGIC) + 8 + length
+    data = np.memmap(path, dtype=np.uint8, mode="r") if os.path.getsize(path) > start else np.empty(0, np.uint8)
+
+    arrays = []
+    for entry in header.pop("arrays"):
+        begin = entry["offset"]
+        end = begin + entry["length"] * HISTORY_DTYPE.itemsize
+        arrays.append(data[start + begin:start + end].view(HISTORY_DTYPE))
+
+    # Swap the array numbers for the histories themselves
+    header["resource_history"] = {res: ArrayHistory(arrays[i]) for res, i in header["resource_history"].items()}
+    for microbe in header["microbes"]:
+        microbe["pop_history"] = ArrayHistory(arrays[microbe["pop_history"]])
+        microbe["k_history"] = ArrayHistory(arrays[microbe["k_history"]])
+
+    return header
+
+def _history_pieces(values):
+    """A history as contiguous float64 arrays, without copying the parts that already are"""
+
+    if isinstance(values, ArrayHistory):
+        pieces = values.pieces()
+    elif isinstance(values, DiskHistory):
+        pieces = values.chunks()
+    else:
+        pieces = [values]
+
+    for piece in pieces:
+        yield np.ascontiguousarray(piece, dtype=HISTORY_DTYPE)
+
+def _aligned(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
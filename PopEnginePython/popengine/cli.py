@@ -0,0 +1,119 @@
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from .scenario import ScenarioError, engine_from_file
+
+#
+# --- BATCH RUNNER ---
+#
+# python -m popengine run scenario.json --steps 10000 --out results.npz
+#
+# Runs without a GUI and never imports matplotlib, so it works on cron jobs and
+# cluster nodes.
+#
+
+def run_command(args):
+    """Run one scenario and save its histories"""
+
+    engine = engine_from_file(args.scenario, args.dtype)
+    started = time.perf_counter()
+
+    # Run in chunks so progress can be reported along the way
+    chunk = args.progress or args.steps
+    equilibrium_step = None
+    orbit = None
+
+    # Like Simulation.run, stop once every resource has run out, since nothing can change after that
+    while engine.current_step < args.steps and np.any(engine.resources > 0):
+        count = min(chunk, args.steps - engine.current_step)
+        if args.fast_forward:
+            settled = engine.fast_forward(count)
+
+            # Later chunks only find the same state again, so the first find is kept
+            if equilibrium_step is None:
+                equilibrium_step = settled
+            if orbit is None:
+                orbit = engine.orbit
+        else:
+            for _ in range(count):
+                engine.step()
+                if not np.any(engine.resources > 0):
+                    break
+        report(args, engine.current_step, args.steps, started)
+
+    if args.fast_forward:
+        report_fast_forward(args, engine, equilibrium_step, orbit)
+
+    np.savez(
+        args.out,
+        microbe_names=np.array(engine.model.microbe_names, dtype=str),
+        resource_names=np.array(engine.model.resource_names, dtype=str),
+        pop_history=engine.pop_history(),
+        k_history=engine.k_history(),
+        resource_history=engine.resource_history(),
+        populations=engine.populations,
+        resources=engine.resources,
+        steps=engine.current_step,
+    )
+
+    if not args.quiet:
+        print(f"Saved {engine.current_step} steps to {args.out}", file=sys.stderr)
+
+def report(args, done, total, started):
+    """Print how far the run is, if progress reporting is on"""
+
+    if args.quiet or not args.progress:
+        return
+
+    elapsed = time.perf_counter() - started
+    rate = done / elapsed if elapsed > 0 else float("inf")
+    print(f"step {done}/{total} ({rate:.0f} steps/s)", file=sys.stderr)
+
+def report_fast_forward(args, engine, equilibrium_step, orbit):
+    """Print whether the run settled or cycled, and from which step"""
+
+    if args.quiet:
+        return
+
+    if equilibrium_step is not None:
+        print(f"Settled at step {equilibrium_step}", file=sys.stderr)
+    elif orbit is not None:
+        print(f"Cycles with period {orbit.period} from step {orbit.start_step}", file=sys.stderr)
+        for name, amplitude in zip(engine.model.microbe_names, orbit.population_amplitude):
+            print(f"  {name} population amplitude {amplitude:.6g}", file=sys.stderr)
+        for name, amplitude in zip(engine.model.resource_names, orbit.resource_amplitude):
+            print(f"  {name} amplitude {amplitude:.6g}", file=sys.stderr)
+    else:
+        print("Neither settled nor cycled, every step was computed", file=sys.stderr)
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="popengine", description="Headless Project Microbe population engine")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="run a scenario and save its histories")
+    run.add_argument("scenario", help="scenario JSON or TOML file")
+    run.add_argument("--steps", type=int, default=1000, help="number of time steps to run (default 1000)")
+    run.add_argument("--out", default="results.npz", help="output .npz file (default results.npz)")
+    run.add_argument("--dtype", choices=["float64", "float32"], default="float64", help="history precision")
+    run.add_argument("--fast-forward", action="store_true",
+                     help="skip ahead once the run settles or cycles")
+    run.add_argument("--progress", type=int, default=0, metavar="N",
+                     help="report progress every N steps")
+    run.add_argument("--quiet", action="store_true", help="print nothing")
+    run.set_defaults(handler=run_command)
+
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    try:
+        args.handler(args)
+    except (OSError, ScenarioError) as error:
+        print(f"popengine: {error}", file=sys.stderr)
+        return 1
+
+    return 0
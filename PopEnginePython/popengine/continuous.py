@@ -0,0 +1,213 @@
+import numpy as np
+
+from .engine import carry_capacities, growth, resource_usage
+
+#
+# --- RIGHT HAND SIDE ---
+#
+
+def rhs(model, populations, resources, growth_rates, refresh_rates):
+    """The model2 step written as rates of change, returning (dN/dt, dR/dt)
+
+    A unit explicit Euler step of these rates is exactly one discrete step, so the
+    continuous mode follows the same dynamics without the fixed step size.
+    """
+
+    competition_effect = populations @ model.competition_matrix().T
+    min_k = carry_capacities(model, populations, resources)
+
+    pop_rate = growth(growth_rates, populations, min_k, competition_effect)
+    resource_rate = resource_usage(model, populations, min_k) + refresh_rates
+
+    # Empty resources can only refill
+    resource_rate = np.where(resources <= 0, np.maximum(resource_rate, 0), resource_rate)
+
+    return pop_rate, resource_rate
+
+#
+# --- INTEGRATOR ---
+#
+
+# Dormand-Prince 5(4) tableau, the model has no explicit time dependence so the nodes are unused
+_A = [
+    [],
+    [1/5],
+    [3/40, 9/40],
+    [44/45, -56/15, 32/9],
+    [19372/6561, -25360/2187, 64448/6561, -212/729],
+    [9017/3168, -355/33, 46732/5247, 49/176, -5103/18656],
+    [35/384, 0, 500/1113, 125/192, -2187/6784, 11/84],
+]
+_B = np.array(_A[6] + [0])
+
+# Difference between the 5th and embedded 4th order weights
+_E = np.array([71/57600, 0, -71/16695, 71/1920, -17253/339200, 22/525, -1/40])
+
+# Rosenbrock 2(3) pair of MATLAB's ode23s (Shampine and Reichelt, 1997), which is L-stable
+_D = 1 / (2 + np.sqrt(2))
+_E32 = 6 + np.sqrt(2)
+
+# Exponent of the error in the step size update, one over the order of the error estimate
+_ERROR_EXPONENT = {"rosenbrock": 1 / 3, "dopri5": 1 / 5}
+
+class ContinuousResult:
+    def __init__(self, times, pop_history, k_history, resource_history, steps, rejected, evaluations):
+        """Output of integrate(), sampled at the requested times"""
+
+        self.times = times
+        self.pop_history = pop_history
+        self.k_history = k_history
+        self.resource_history = resource_history
+
+        # Solver statistics
+        self.steps = steps
+        self.rejected = rejected
+        self.evaluations = evaluations
+
+def integrate(model, populations, resources, times, growth_rates=None, refresh_rates=None,
+              rtol=1e-6, atol=1e-9, first_step=1.0, max_step=np.inf, min_step=1e-8, method="rosenbrock"):
+    """Integrate the continuous-time model with an adaptive error-controlled solver
+
+    Starts from the given state at time 0 and returns the state at every entry of
+    times, which must be non-negative and increasing. Step sizes are picked by an
+    embedded error estimate, so smooth stretches take long steps. Steps shorter
+    than min_step are accepted regardless of error, which lets the solver walk
+    through the kinks of the piecewise toxicity and depletion terms.
+
+    The model is stiff: near an equilibrium, and wherever a population is close to
+    dying out, an explicit method is held to steps of a few time units by stability
+    rather than accuracy. The default method="rosenbrock" is linearly implicit and
+    keeps growing its steps there. method="dopri5" is the explicit Dormand-Prince
+    5(4) pair, which takes fewer steps through fast non-stiff transients.
+    """
+
+    if method not in _ERROR_EXPONENT:
+        raise ValueError(f"Unknown method '{method}'")
+    exponent = _ERROR_EXPONENT[method]
+
+    if growth_rates is None:
+        growth_rates = model.growth_rates
+    if refresh_rates is None:
+        refresh_rates = model.refresh_rates
+
+    times = np.asarray(times, dtype=np.float64)
+    if np.any(times < 0) or np.any(np.diff(times) < 0):
+        raise ValueError("times must be non-negative and increasing")
+
+    num_microbes = model.num_microbes
+
+    def f(y):
+        pop_rate, resource_rate = rhs(model, y[:num_microbes], y[num_microbes:], growth_rates, refresh_rates)
+        return np.concatenate([pop_rate, resource_rate])
+
+    y = np.concatenate([np.asarray(populations, dtype=np.float64), np.asarray(resources, dtype=np.float64)])
+    samples = np.empty((len(times), len(y)))
+
+    t = 0.0
+    dydt = f(y)
+    h = min(first_step, max_step)
+    jacobian = None
+    steps = rejected = 0
+    evaluations = 1
+    next_sample = 0
+
+    # Samples requested at time 0
+    while next_sample < len(times) and times[next_sample] <= t:
+        samples[next_sample] = y
+        next_sample += 1
+
+    while next_sample < len(times):
+        h = min(h, max_step, times[-1] - t)
+
+        if method == "dopri5":
+            y_new, error = _dopri5_step(f, y, dydt, h)
+            evaluations += 6
+        else:
+            # Kept through rejected steps, which start from the same point
+            if jacobian is None:
+                jacobian = _jacobian(f, y, dydt)
+                evaluations += len(y)
+            y_new, error = _rosenbrock_step(f, y, dydt, h, jacobian)
+            evaluations += 2
+
+        # Error relative to the requested tolerances
+        scale = atol + rtol * np.maximum(np.abs(y), np.abs(y_new))
+        error_norm = np.sqrt(np.mean((error / scale) ** 2)) if len(y) else 0.0
+
+        if error_norm > 1 and h > min_step:
+            rejected += 1
+            h *= max(0.2, 0.9 * error_norm ** -exponent)
+            continue
+
+        # Populations and resources cannot go negative
+        y_new = np.maximum(y_new, 0)
+        t_new = t + h
+        dydt_new = f(y_new)
+        evaluations += 1
+        steps += 1
+
+        # Hermite interpolation for every requested time inside this step
+        while next_sample < len(times) and times[next_sample] <= t_new:
+            samples[next_sample] = _hermite(t, y, dydt, t_new, y_new, dydt_new, times[next_sample])
+            next_sample += 1
+
+        t, y, dydt = t_new, y_new, dydt_new
+        jacobian = None
+        h *= min(5.0, 0.9 * error_norm ** -exponent) if error_norm > 0 else 5.0
+
+    pop_history = samples[:, :num_microbes]
+    resource_history = samples[:, num_microbes:]
+    k_history = carry_capacities(model, pop_history, resource_history)
+
+    return ContinuousResult(times, pop_history, k_history, resource_history, steps, rejected, evaluations)
+
+def _dopri5_step(f, y, dydt, h):
+    """One Dormand-Prince step, returning the new state and its error estimate"""
+
+    k = np.empty((7, len(y)))
+    k[0] = dydt
+    for stage in range(1, 7):
+        k[stage] = f(y + h * (np.dot(_A[stage], k[:stage])))
+
+    return y + h * (_B @ k), h * (_E @ k)
+
+def _rosenbrock_step(f, y, dydt, h, jacobian):
+    """One step of the ode23s Rosenbrock pair, returning the new state and its error estimate
+
+    The model has no explicit time dependence, so the time derivative terms drop out.
+    """
+
+    w = np.eye(len(y)) - h * _D * jacobian
+
+    k1 = np.linalg.solve(w, dydt)
+    f1 = f(y + 0.5 * h * k1)
+    k2 = np.linalg.solve(w, f1 - k1) + k1
+    y_new = y + h * k2
+
+    f2 = f(y_new)
+    k3 = np.linalg.solve(w, f2 - _E32 * (k2 - f1) - 2 * (k1 - dydt))
+
+    return y_new, h / 6 * (k1 - 2 * k2 + k3)
+
+def _jacobian(f, y, dydt):
+    """Forward difference Jacobian of f at y, where f(y) is dydt"""
+
+    jacobian = np.empty((len(y), len(y)))
+    for j in range(len(y)):
+        delta = np.sqrt(np.finfo(np.float64).eps) * max(abs(y[j]), 1.0)
+        shifted = y.copy()
+        shifted[j] += delta
+        jacobian[:, j] = (f(shifted) - dydt) / delta
+    return jacobian
+
+def _hermite(t0, y0, dydt0, t1, y1, dydt1, t):
+    """Cubic Hermite interpolation between two accepted steps"""
+
+    h = t1 - t0
+    s = (t - t0) / h
+    h00 = 2 * s**3 - 3 * s**2 + 1
+    h10 = s**3 - 2 * s**2 + s
+    h01 = -2 * s**3 + 3 * s**2
+    h11 = s**3 - s**2
+
+    return h00 * y0 + h10 * h * dydt0 + h01 * y1 + h11 * h * dydt1
@@ -0,0 +1,94 @@
+import numpy as np
+
+#
+# --- DOWNSAMPLING ---
+#
+# A plot can not show more points than it has pixels, so long histories are thinned
+# out before they are drawn. Both methods keep the first and last point and return
+# the indices they picked, which double as the time axis.
+#
+
+def minmax_indices(values, max_points):
+    """Pick the minimum and maximum of each bucket, so spikes stay visible"""
+
+    values = np.asarray(values, dtype=np.float64)
+    length = len(values)
+    if length <= max_points:
+        return np.arange(length)
+
+    # Two points per bucket
+    buckets = max(max_points // 2, 1)
+    size = -(-length // buckets)
+    full = length // size * size
+
+    # Missing values never win a bucket, unless the whole bucket is missing
+    finite = np.isfinite(values)
+    low_values = np.where(finite, values, np.inf)
+    high_values = np.where(finite, values, -np.inf)
+
+    starts = np.arange(0, full, size)
+    lows = starts + np.argmin(low_values[:full].reshape(-1, size), axis=1)
+    highs = starts + np.argmax(high_values[:full].reshape(-1, size), axis=1)
+
+    picked = [lows, highs, [0, length - 1]]
+    if full < length:
+        picked.append([full + np.argmin(low_values[full:]), full + np.argmax(high_values[full:])])
+
+    return np.unique(np.concatenate(picked).astype(np.intp))
+
+def lttb_indices(values, max_points):
+    """Largest-Triangle-Three-Buckets, which keeps the overall shape of the line
+
+    Missing (NaN) points are skipped, so a late joining series starts where it joined.
+    """
+
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) <= max_points or max_points < 3:
+        return np.arange(len(values))
+
+    x = np.flatnonzero(np.isfinite(values))
+    y = values[x]
+    length = len(x)
+    if length <= max_points:
+        return x
+
+    # The first and last point are fixed, the rest is split into equal buckets
+    every = (length - 2) / (max_points - 2)
+    edges = (np.floor(np.arange(max_points - 1) * every) + 1).astype(np.intp)
+    edges[-1] = length - 1
+
+    picked = np.empty(max_points, dtype=np.intp)
+    picked[0] = 0
+    picked[-1] = length - 1
+    previous = 0
+
+    for i in range(max_points - 2):
+        start, end = edges[i], edges[i + 1]
+
+        # Average of the next bucket, or the last point for the final bucket
+        if i + 2 < len(edges):
+            next_x = x[end:edges[i + 2]].mean()
+            next_y = y[end:edges[i + 2]].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+
+        # Keep the point making the largest triangle with the previous pick and that average
+        area = np.abs((x[previous] - next_x) * (y[start:end] - y[previous])
+                      - (x[previous] - x[start:end]) * (next_y - y[previous]))
+
+        previous = start + int(np.argmax(area))
+        picked[i + 1] = previous
+
+    return x[picked]
+
+def downsample(values, max_points, method="minmax"):
+    """Thin a series out to about max_points, returning (x, y) ready for plotting"""
+
+    if method == "minmax":
+        indices = minmax_indices(values, max_points)
+    elif method == "lttb":
+        indices = lttb_indices(values, max_points)
+    else:
+        raise ValueError(f"Unknown downsampling method '{method}'")
+
+    return indices.astype(np.float64), np.asarray(values, dtype=np.float64)[indices]
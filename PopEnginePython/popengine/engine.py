@@ -0,0 +1,668 @@
+from collections import deque
+
+import numpy as np
+
+from .history import ColumnHistory, HistoryTable
+from .toxicity import ToxinTable
+
+#
+# --- MODEL ARRAYS ---
+#
+
+class ModelArrays:
+    def __init__(self, resource_names, microbe_names, growth_rates, required, produced, uses,
+                 toxicity, min_safe_density, max_safe_density, lethal_density, has_toxin, refresh_rates):
+        """Structure-of-arrays form of a set of microbes and the resources they live on
+
+        Species are rows and resources are columns, so every (species, resource) table
+        is an S x R array in the same order as microbe_names and resource_names.
+        """
+
+        self.resource_names = list(resource_names)
+        self.microbe_names = list(microbe_names)
+
+        # Per species
+        self.growth_rates = np.asarray(growth_rates, dtype=np.float64)
+
+        # Per species and resource
+        self.required = np.asarray(required, dtype=np.float64)
+        self.produced = np.asarray(produced, dtype=np.float64)
+        self.uses = np.asarray(uses, dtype=bool)
+
+        # Toxin thresholds, only meaningful where has_toxin is set
+        self.toxicity = np.asarray(toxicity, dtype=np.float64)
+        self.min_safe_density = np.asarray(min_safe_density, dtype=np.float64)
+        self.max_safe_density = np.asarray(max_safe_density, dtype=np.float64)
+        self.lethal_density = np.asarray(lethal_density, dtype=np.float64)
+        self.has_toxin = np.asarray(has_toxin, dtype=bool)
+
+        # Per resource
+        self.refresh_rates = np.asarray(refresh_rates, dtype=np.float64)
+
+        # Structural competition matrix and toxin table, rebuilt only when the topology changes
+        self._competition = None
+        self._toxin_table = None
+
+        # Counts the edits, so a fast forward can tell the model changed since it last ran
+        self.edits = 0
+
+    @property
+    def num_microbes(self):
+        return len(self.microbe_names)
+
+    @property
+    def num_resources(self):
+        return len(self.resource_names)
+
+    @classmethod
+    def empty(cls, resource_names, refresh_rates):
+        """Arrays for a set of resources with no species yet"""
+
+        resource_names = list(resource_names)
+        return cls(
+            resource_names=resource_names,
+            microbe_names=[],
+            growth_rates=np.zeros(0),
+            required=np.zeros((0, len(resource_names))),
+            produced=np.zeros((0, len(resource_names))),
+            uses=np.zeros((0, len(resource_names)), dtype=bool),
+            toxicity=np.zeros((0, len(resource_names))),
+            min_safe_density=np.zeros((0, len(resource_names))),
+            max_safe_density=np.zeros((0, len(resource_names))),
+            lethal_density=np.zeros((0, len(resource_names))),
+            has_toxin=np.zeros((0, len(resource_names)), dtype=bool),
+            refresh_rates=refresh_rates,
+        )
+
+    @classmethod
+    def from_objects(cls, env, microbes):
+        """Compile an Environment and a list of Microbes into arrays"""
+
+        resource_names = list(env.resources)
+        model = cls.empty(resource_names, [env.resource_refresh_rate.get(res, 0) for res in resource_names])
+
+        for microbe in microbes:
+            model.add_microbe(microbe.name, microbe.growth_rate, microbe.required_resources,
+                              microbe.produced_resources, microbe.toxins)
+
+        return model
+
+    #
+    # --- TOPOLOGY EDITS ---
+    #
+
+    def competition_matrix(self):
+        """Structural competition coefficients, cached until the topology changes"""
+
+        if self._competition is None:
+            self._competition = competition_coefficients(self)
+        return self._competition
+
+    def toxin_table(self):
+        """Toxin thresholds compressed to the toxic columns, cached until the topology changes"""
+
+        if self._toxin_table is None:
+            self._toxin_table = ToxinTable.from_model(self)
+        return self._toxin_table
+
+    def invalidate(self):
+        """Drop cached structure, needed after editing the arrays directly"""
+
+        self._competition = None
+        self._toxin_table = None
+        self.edits += 1
+
+    def add_microbe(self, name, growth_rate, required_resources, produced_resources, toxins):
+        """Append a species row and return its index"""
+
+        row = self._microbe_row(name, required_resources, produced_resources, toxins)
+
+        self.microbe_names.append(name)
+        self.growth_rates = np.append(self.growth_rates, float(growth_rate))
+        for field, values in row.items():
+            setattr(self, field, np.vstack([getattr(self, field), values]))
+
+        self.invalidate()
+        return self.num_microbes - 1
+
+    def add_resource(self, name, refresh_rate=0):
+        """Append a resource column that no species uses yet and return its index"""
+
+        if name in self.resource_names:
+            raise KeyError(f"Resource '{name}' already exists")
+
+        self.resource_names.append(name)
+        self.refresh_rates = np.append(self.refresh_rates, float(refresh_rate))
+        for field in _SPECIES_FIELDS:
+            table = getattr(self, field)
+            column = np.zeros((table.shape[0], 1), dtype=table.dtype)
+            setattr(self, field, np.hstack([table, column]))
+
+        self.invalidate()
+        return self.num_resources - 1
+
+    def remove_microbe(self, index):
+        """Delete the species row at index"""
+
+        del self.microbe_names[index]
+        self.growth_rates = np.delete(self.growth_rates, index)
+        for field in _SPECIES_FIELDS:
+            setattr(self, field, np.delete(getattr(self, field), index, axis=0))
+
+        self.invalidate()
+
+    def set_required_resources(self, index, required_resources):
+        """Replace the required resources of the species at index"""
+
+        row = self._microbe_row(self.microbe_names[index], required_resources, {}, {})
+        self.required[index] = row["required"]
+        self.uses[index] = row["uses"]
+
+        self.invalidate()
+
+    def _microbe_row(self, name, required_resources, produced_resources, toxins):
+        """Build the species x resource rows for a single microbe"""
+
+        index = {res: j for j, res in enumerate(self.resource_names)}
+        row = {field: np.zeros(self.num_resources) for field in _SPECIES_FIELDS}
+        row["uses"] = row["uses"].astype(bool)
+        row["has_toxin"] = row["has_toxin"].astype(bool)
+
+        for res, amount in required_resources.items():
+            j = _column(index, res, name)
+            row["required"][j] = amount
+            row["uses"][j] = True
+
+        for res, amount in produced_resources.items():
+            row["produced"][_column(index, res, name)] = amount
+
+        for res, toxin in toxins.items():
+            j = _column(index, res, name)
+            row["toxicity"][j] = toxin["toxicity"]
+            row["min_safe_density"][j] = toxin["min_safe_density"]
+            row["max_safe_density"][j] = toxin["max_safe_density"]
+            row["lethal_density"][j] = toxin["lethal_density"]
+            row["has_toxin"][j] = True
+
+        return row
+
+# Species x resource tables, in the order they are stored
+_SPECIES_FIELDS = ("required", "produced", "uses", "toxicity", "min_safe_density",
+                   "max_safe_density", "lethal_density", "has_toxin")
+
+def _column(index, res, name):
+    """Look up the column of a resource, failing the same way the Environment would"""
+
+    if res not in index:
+        raise KeyError(f"Microbe '{name}' references unknown resource '{res}'")
+    return index[res]
+
+#
+# --- STEP KERNELS ---
+#
+# Every kernel takes populations as (..., S) and resources as (..., R), so the same
+# equations run a single simulation or a whole ensemble stacked along leading axes.
+#
+
+def carry_capacities(model, populations, resources, total_resources=None):
+    """Vectorized Microbe.compute_carry_capacity, returning the limiting K per species"""
+
+    toxicity_mult = model.toxin_table().multipliers(resources, total_resources)
+
+    # K = num resources * toxicity multiplier / resource consumption, inf if not consumed
+    with np.errstate(divide='ignore', invalid='ignore'):
+        k_resources = np.where(
+            model.required == 0,
+            np.inf,
+            (resources[..., None, :] / model.required) * toxicity_mult[..., :, None],
+        )
+
+    # If no pop, then k = 0
+    k_resources = np.where(populations[..., :, None] == 0, 0.0, k_resources)
+
+    # Only required resources can be limiting
+    return np.min(np.where(model.uses, k_resources, np.inf), axis=-1)
+
+def competition_coefficients(model):
+    """Vectorized Microbe.add_competitor, without the population factor
+
+    Entry [i, j] is the max over shared resources of required[j] / required[i], or 0 if
+    species i and j share no required resources.
+    """
+
+    shared = model.uses[:, None, :] & model.uses[None, :, :]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratios = model.required[None, :, :] / model.required[:, None, :]
+
+    return np.max(np.where(shared, ratios, 0.0), axis=2, initial=0.0)
+
+def growth(growth_rates, populations, min_k, competition_effect):
+    """Vectorized Microbe.compute_growth"""
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        growth = growth_rates * populations * (1 - (competition_effect / min_k))
+
+    # Prevent overshooting into negative population
+    growth = np.maximum(growth, -populations)
+
+    # Depleted resources kill small populations outright and shrink the rest
+    depleted = np.where(populations <= 2, -1 * populations, growth_rates * -0.33 * populations)
+
+    return np.where(min_k == 0, depleted, growth)
+
+def resource_usage(model, populations, min_k):
+    """Vectorized Microbe.produce_consume_resources, summed over every species"""
+
+    amount = np.minimum(min_k, populations)
+    return amount @ (model.produced - model.required)
+
+def step_arrays(model, populations, resources, growth_rates, refresh_rates):
+    """One time step of the model on plain arrays
+
+    Returns (min_k, new_populations, logged_resources, new_resources), where
+    logged_resources is the amount Environment.update_resource_history records
+    (after usage, before refresh).
+    """
+
+    # Competition uses the populations from the start of the step
+    competition_effect = populations @ model.competition_matrix().T
+
+    # The resource pool is summed once per step for every species' toxicity
+    total_resources = resources.sum(axis=-1)
+
+    # Carry capacity, resource usage and growth for every microbe at once
+    min_k = carry_capacities(model, populations, resources, total_resources)
+    usage = resource_usage(model, populations, min_k)
+    pop_change = growth(growth_rates, populations, min_k, competition_effect)
+
+    new_populations = np.maximum(0, populations + pop_change)
+
+    # Apply usage, then refresh
+    logged_resources = resources + usage
+    new_resources = np.maximum(0, logged_resources + refresh_rates)
+
+    return min_k, new_populations, logged_resources, new_resources
+
+#
+# --- ENGINE ---
+#
+
+class PeriodicOrbit:
+    def __init__(self, start_step, period, population_amplitude, resource_amplitude):
+        """A repeating cycle found by VectorEngine.fast_forward
+
+        The amplitudes are the peak to peak range of every population and resource
+        over one period.
+        """
+
+        self.start_step = start_step
+        self.period = period
+        self.population_amplitude = population_amplitude
+        self.resource_amplitude = resource_amplitude
+
+class VectorEngine:
+    def __init__(self, model, populations, resources, history_dtype=np.float64, pyramid=False):
+        """Create an engine that advances a ModelArrays one time step at a time
+
+        Histories are kept in HistoryBuffers of history_dtype, float32 halves their
+        memory for very long runs. pyramid=True also keeps min/max/mean summaries for
+        fast zoomed out views, see history_summary().
+        """
+
+        self.model = model
+        self.populations = np.array(populations, dtype=np.float64)
+        self.resources = np.array(resources, dtype=np.float64)
+        self.current_step = 0
+
+        # Histories are stored one row per step
+        self.pop_store = HistoryTable(model.num_microbes, history_dtype, pyramid=pyramid)
+        self.k_store = HistoryTable(model.num_microbes, history_dtype, pyramid=pyramid)
+        self.resource_store = HistoryTable(model.num_resources, history_dtype, pyramid=pyramid)
+
+        # Steps already copied back into Microbe/Environment objects
+        self.synced_steps = 0
+
+        # Steps the objects had logged before their histories were bound to this engine
+        self.history_offset = None
+
+        # Step the last fast_forward settled at, and the cycle it found, if any
+        self.equilibrium_step = None
+        self.orbit = None
+
+        # What the last fast_forward had seen, for the next one to carry on from
+        self._detector = None
+
+    @classmethod
+    def from_objects(cls, env, microbes):
+        """Build an engine with the same state as an Environment and its Microbes"""
+
+        model = ModelArrays.from_objects(env, microbes)
+        populations = [microbe.population for microbe in microbes]
+        resources = [env.resources[res] for res in model.resource_names]
+        return cls(model, populations, resources)
+
+    def step(self):
+        """Advance the simulation by one time step"""
+
+        model = self.model
+        populations = self.populations
+
+        min_k, self.populations, logged_resources, self.resources = step_arrays(
+            model, populations, self.resources, model.growth_rates, model.refresh_rates)
+
+        # Log histories
+        self.pop_store.append(populations)
+        self.k_store.append(min_k)
+        self.resource_store.append(logged_resources)
+
+        self.current_step += 1
+
+    def run(self, steps):
+        """Advance the simulation by a number of time steps"""
+
+        for _ in range(steps):
+            self.step()
+
+    def fast_forward(self, steps, rtol=1e-9, atol=1e-12, window=10, detect_cycles=True,
+                     max_period=1000, cycle_decimals=6):
+        """Run up to steps time steps, skipping work once the state settles or cycles
+
+        The state counts as settled when every population and resource has changed by
+        less than rtol (relative) plus atol (absolute) for window steps in a row. The
+        remaining steps are then filled with the settled state instead of computed.
+
+        With detect_cycles, states are hashed after rounding to cycle_decimals. When a
+        state repeats within max_period steps and the last two periods agree within the
+        tolerance, the run jumps ahead by whole periods by tiling the detected cycle.
+
+        Returns the step the equilibrium was reached at, or None if it never settled.
+        A detected cycle is stored in self.orbit.
+
+        A fast forward carries on from the last one when nothing was stepped or edited
+        in between and the settings are the same. So a long run split into calls, like
+        the website's jobs, still finds equilibria and cycles that span the calls, and
+        skips at once if the last call had found one. equilibrium_step and orbit then
+        keep the step they were first found at.
+        """
+
+        settings = (rtol, atol, window, detect_cycles, max_period, cycle_decimals)
+        detector = self._detector
+        if detector is None or detector["resume"] != self._resume_key(settings):
+            self.equilibrium_step = None
+            self.orbit = None
+
+            # Steps in a row the state barely changed, and recently seen state keys with the step they were seen at
+            detector = self._detector = {"stable_steps": 0, "seen": {}, "seen_order": deque()}
+
+        stable_steps = detector["stable_steps"]
+        seen = detector["seen"]
+        seen_order = detector["seen_order"]
+
+        remaining = steps
+
+        # Settled or cycling when the last call ended
+        if self.equilibrium_step is not None:
+            self._fill_constant(remaining)
+            remaining = 0
+        elif self.orbit is not None:
+            jump = remaining // self.orbit.period * self.orbit.period
+            self._tile_orbit(self.orbit.period, jump)
+            remaining -= jump
+
+        while remaining > 0:
+            populations = self.populations
+            resources = self.resources
+            self.step()
+            remaining -= 1
+
+            if _settled(populations, self.populations, rtol, atol) and _settled(resources, self.resources, rtol, atol):
+                stable_steps += 1
+            else:
+                stable_steps = 0
+
+            if stable_steps >= window:
+                self.equilibrium_step = self.current_step - window
+                self._fill_constant(remaining)
+                break
+
+            if not detect_cycles or self.orbit is not None:
+                continue
+
+            key = np.round(np.concatenate([self.populations, self.resources]), cycle_decimals).tobytes()
+            previous = seen.get(key)
+            seen[key] = self.current_step
+            seen_order.append((key, self.current_step))
+
+            # Forget states too old to start a cycle
+            if len(seen_order) > max_period:
+                old_key, old_step = seen_order.popleft()
+                if seen.get(old_key) == old_step:
+                    del seen[old_key]
+
+            if previous is None:
+                continue
+
+            # A period of one is a steady state, which the window check above handles
+            period = self.current_step - previous
+            if period > 1 and self._confirm_orbit(period, rtol, atol):
+                self.orbit = self._measure_orbit(period)
+                jump = remaining // period * period
+                self._tile_orbit(period, jump)
+                remaining -= jump
+
+        detector["stable_steps"] = stable_steps
+        detector["resume"] = self._resume_key(settings)
+        return self.equilibrium_step
+
+    def _resume_key(self, settings):
+        """Everything that has to stay the same for a fast forward to carry on from the last one"""
+
+        model = self.model
+        return (settings, self.current_step, model, model.edits, self.populations.tobytes(),
+                self.resources.tobytes(), model.growth_rates.tobytes(), model.refresh_rates.tobytes())
+
+    def _confirm_orbit(self, period, rtol, atol):
+        """True if the last two periods of history match and the state has returned to its start"""
+
+        if len(self.pop_store) < 2 * period:
+            return False
+
+        pop_history = self.pop_store.tail(2 * period)
+        resource_history = self.resource_store.tail(2 * period)
+
+        if not _settled(pop_history[-period], self.populations, rtol, atol):
+            return False
+
+        return (_settled(pop_history[-2 * period:-period], pop_history[-period:], rtol, atol)
+                and _settled(resource_history[-2 * period:-period], resource_history[-period:], rtol, atol))
+
+    def _measure_orbit(self, period):
+        """Describe the cycle made of the last period steps"""
+
+        pop_cycle = self.pop_store.tail(period)
+        resource_cycle = self.resource_store.tail(period)
+
+        return PeriodicOrbit(
+            start_step=self.current_step - period,
+            period=period,
+            population_amplitude=np.ptp(pop_cycle, axis=0),
+            resource_amplitude=np.ptp(resource_cycle, axis=0),
+        )
+
+    def _tile_orbit(self, period, steps):
+        """Log steps worth of history by repeating the last period, which must divide steps"""
+
+        if steps <= 0:
+            return
+
+        repeats = steps // period
+        self.pop_store.repeat_tail(period, repeats)
+        self.k_store.repeat_tail(period, repeats)
+        self.resource_store.repeat_tail(period, repeats)
+
+        # Whole periods bring the state back to where it is now
+        self.current_step += steps
+
+    def _fill_constant(self, steps):
+        """Log steps copies of the current state without computing them
+
+        The tables store the state once, so this costs the same however many steps.
+        """
+
+        if steps <= 0:
+            return
+
+        self.pop_store.fill(self.populations, steps)
+        self.k_store.fill(self.k_store.row(-1), steps)
+        self.resource_store.fill(self.resource_store.row(-1), steps)
+
+        self.current_step += steps
+
+    #
+    # --- TOPOLOGY EDITS ---
+    #
+
+    def add_microbe(self, name, initial_population, growth_rate, required_resources, produced_resources, toxins):
+        """Add a microbe mid-run, its history before joining reads as NaN
+
+        The earlier history is not padded until it is read, so this costs the same
+        however long the run has been going.
+        """
+
+        self.model.add_microbe(name, growth_rate, required_resources, produced_resources, toxins)
+        self.populations = np.append(self.populations, float(initial_population))
+
+        self.pop_store.add_column()
+        self.k_store.add_column()
+
+    def add_resource(self, name, amount=0, refresh_rate=0):
+        """Add a resource mid-run, its history before it was added reads as 0"""
+
+        self.model.add_resource(name, refresh_rate)
+        self.resources = np.append(self.resources, float(amount))
+        self.resource_store.add_column(fill_value=0.0)
+
+    def remove_microbe(self, name):
+        """Remove a microbe and its history"""
+
+        self.remove_microbe_at(self.model.microbe_names.index(name))
+
+    def remove_microbe_at(self, i):
+        """Remove the microbe in column i and its history, for when names are not unique"""
+
+        self.model.remove_microbe(i)
+        self.populations = np.delete(self.populations, i)
+
+        self.pop_store.delete_column(i)
+        self.k_store.delete_column(i)
+
+    def set_required_resources(self, name, required_resources):
+        """Change what a microbe requires, which rebuilds the competition matrix on the next step"""
+
+        self.model.set_required_resources(self.model.microbe_names.index(name), required_resources)
+
+    #
+    # --- HISTORY ---
+    #
+
+    def pop_history(self):
+        """Population history as (steps, species), zero-copy unless a microbe joined late"""
+        return self.pop_store.view()
+
+    def k_history(self):
+        """Carrying capacity history as (steps, species), zero-copy unless a microbe joined late"""
+        return self.k_store.view()
+
+    def resource_history(self):
+        """Resource history as (steps, resources), zero-copy unless a resource joined late"""
+        return self.resource_store.view()
+
+    def history_summary(self, history, start=0, stop=None, points=1000):
+        """Min/max/mean of "pop", "k" or "resources" over steps start..stop in about points buckets
+
+        Needs an engine made with pyramid=True. Returns (steps, mins, maxs, means).
+        """
+
+        stores = {"pop": self.pop_store, "k": self.k_store, "resources": self.resource_store}
+        if history not in stores:
+            raise KeyError(f"Unknown history '{history}'")
+        return stores[history].summary(start, stop, points)
+
+    def bind(self, env, microbes):
+        """Make the histories of env and microbes views of this engine's history tables
+
+        Whatever each of them logged before is kept in front as a read-only array.
+        From then on every step is stored once, in the engine, and write_back has no
+        history left to copy for them. Histories already bound stay as they are, so
+        this can be called again after adding microbes or resources.
+
+        The first call takes the longest history as the number of steps logged before
+        the engine. Shorter ones are padded in front, microbes with NaN and resources
+        with 0 like the columns added mid-run, without storing the padding.
+        """
+
+        if self.history_offset is None:
+            histories = [microbe.pop_history for microbe in microbes] + list(env.resource_history.values())
+            logged = max((len(values) for values in histories), default=0)
+            self.history_offset = max(logged - self.current_step, 0)
+
+        for i, microbe in enumerate(microbes):
+            microbe.pop_history = self._bound(microbe.pop_history, self.pop_store, i, np.nan)
+            microbe.k_history = self._bound(microbe.k_history, self.k_store, i, np.nan)
+
+        for j, res in enumerate(self.model.resource_names):
+            env.resource_history[res] = self._bound(env.resource_history.get(res, []), self.resource_store, j, 0.0)
+
+    def write_back(self, env, microbes):
+        """Copy state, and new history, into the Environment and Microbes the engine was built from
+
+        Histories bound to this engine already hold every step. The others, such as
+        plain lists or DiskHistory, get the rows logged since the last write back.
+        """
+
+        start = self.synced_steps
+
+        for i, microbe in enumerate(microbes):
+            microbe.population = float(self.populations[i])
+            self._append_new(microbe.pop_history, self.pop_store, i, start)
+            self._append_new(microbe.k_history, self.k_store, i, start)
+
+        for j, res in enumerate(self.model.resource_names):
+            env.resources[res] = float(self.resources[j])
+            self._append_new(env.resource_history.setdefault(res, []), self.resource_store, j, start)
+
+        self.synced_steps = self.current_step
+
+    def _bound(self, values, table, index, fill_value):
+        """values as a ColumnHistory of column index of table"""
+
+        key = table.key_of(index)
+        if isinstance(values, ColumnHistory) and values.table is table and values.key is key:
+            return values
+
+        # Anything past the offset is in the table already, padded if it joined late
+        steps = self.history_offset
+        if not len(values):
+            base = np.broadcast_to(np.asarray(fill_value, dtype=table.dtype), (steps,))
+        else:
+            base = np.asarray(values[:steps], dtype=table.dtype)
+            if len(base) < steps:
+                base = np.concatenate([np.full(steps - len(base), fill_value, dtype=table.dtype), base])
+        return ColumnHistory(base, table, key)
+
+    def _append_new(self, values, table, index, start):
+        """Append the rows of a column from start on to a history that is not a view of table"""
+
+        if isinstance(values, ColumnHistory) and values.table is table:
+            return
+
+        new = table.values(index, start)
+        if isinstance(values, list):
+            values.extend(new.tolist())
+        else:
+            values.extend(new)
+
+def _settled(old, new, rtol, atol):
+    """True if every entry changed by less than the tolerance"""
+
+    return np.all(np.abs(new - old) <= rtol * np.abs(old) + atol)
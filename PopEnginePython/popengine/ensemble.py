@@ -0,0 +1,160 @@
+import os
+
+import numpy as np
+
+from .engine import ModelArrays, step_arrays
+
+#
+# --- ENSEMBLE ---
+#
+
+# Names of the history files of a run kept on disk
+HISTORY_NAMES = ("pop_history", "k_history", "resource_history")
+
+class Trajectories:
+    def __init__(self, pop_history, k_history, resource_history):
+        """Stacked histories of an ensemble run
+
+        pop_history and k_history are (steps, ensemble, species), resource_history is
+        (steps, ensemble, resources).
+        """
+
+        self.pop_history = pop_history
+        self.k_history = k_history
+        self.resource_history = resource_history
+
+    @classmethod
+    def load(cls, directory):
+        """Memory-map the histories an Ensemble.run with a history_dir wrote"""
+
+        return cls(*(np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r") for name in HISTORY_NAMES))
+
+class Ensemble:
+    def __init__(self, model, populations, resources, growth_rates=None, refresh_rates=None):
+        """Many variants of one community advanced together as (ensemble x species) arrays
+
+        Every argument may be given per variant (a leading ensemble axis) or once for the
+        whole ensemble, in which case it is broadcast. growth_rates and refresh_rates
+        default to the ones stored in the model.
+        """
+
+        self.model = model
+
+        if growth_rates is None:
+            growth_rates = model.growth_rates
+        if refresh_rates is None:
+            refresh_rates = model.refresh_rates
+
+        populations = np.asarray(populations, dtype=np.float64)
+        resources = np.asarray(resources, dtype=np.float64)
+        growth_rates = np.asarray(growth_rates, dtype=np.float64)
+        refresh_rates = np.asarray(refresh_rates, dtype=np.float64)
+
+        # Number of variants is whatever the per-variant arguments agree on
+        size = np.broadcast_shapes(populations.shape[:-1], resources.shape[:-1],
+                                   growth_rates.shape[:-1], refresh_rates.shape[:-1])
+        if len(size) > 1:
+            raise ValueError("Ensemble arguments may have at most one leading axis")
+        self.size = size[0] if size else 1
+
+        species = (self.size, model.num_microbes)
+        pool = (self.size, model.num_resources)
+        self.populations = np.broadcast_to(populations, species).copy()
+        self.resources = np.broadcast_to(resources, pool).copy()
+        self.growth_rates = np.broadcast_to(growth_rates, species).copy()
+        self.refresh_rates = np.broadcast_to(refresh_rates, pool).copy()
+
+        self.current_step = 0
+
+    @classmethod
+    def from_scenarios(cls, env, microbes, scenarios):
+        """Build an ensemble from an Environment, its Microbes and a list of overrides
+
+        Each scenario is a dict that may contain "growth_rate", "initial_population",
+        "resources" and "resource_refresh_rate" entries, each mapping a microbe or
+        resource name to the value used by that variant.
+        """
+
+        model = ModelArrays.from_objects(env, microbes)
+        size = len(scenarios)
+
+        populations = np.tile([microbe.population for microbe in microbes], (size, 1))
+        growth_rates = np.tile(model.growth_rates, (size, 1))
+        resources = np.tile([env.resources[res] for res in model.resource_names], (size, 1))
+        refresh_rates = np.tile(model.refresh_rates, (size, 1))
+
+        microbe_index = {name: i for i, name in enumerate(model.microbe_names)}
+        resource_index = {res: j for j, res in enumerate(model.resource_names)}
+
+        overrides = {
+            "initial_population": (populations, microbe_index),
+            "growth_rate": (growth_rates, microbe_index),
+            "resources": (resources, resource_index),
+            "resource_refresh_rate": (refresh_rates, resource_index),
+        }
+
+        for e, scenario in enumerate(scenarios):
+            for key, values in scenario.items():
+                if key not in overrides:
+                    raise KeyError(f"Unknown scenario override '{key}'")
+
+                table, index = overrides[key]
+                for name, value in values.items():
+                    table[e, index[name]] = value
+
+        return cls(model, populations, resources, growth_rates, refresh_rates)
+
+    def step(self):
+        """Advance every variant by one time step, returning (min_k, logged_resources)"""
+
+        populations = self.populations
+        min_k, self.populations, logged_resources, self.resources = step_arrays(
+            self.model, populations, self.resources, self.growth_rates, self.refresh_rates)
+
+        self.current_step += 1
+        return min_k, logged_resources
+
+    def run(self, steps, history_dir=None, chunk=4096):
+        """Advance every variant by a number of time steps and return their Trajectories
+
+        With history_dir, the histories are written to .npy files there instead of being
+        held in memory. Steps are gathered chunk at a time and then written out, and the
+        Trajectories returned memory-map the files.
+        """
+
+        if history_dir is None:
+            pop_history = np.empty((steps, self.size, self.model.num_microbes))
+            k_history = np.empty((steps, self.size, self.model.num_microbes))
+            resource_history = np.empty((steps, self.size, self.model.num_resources))
+
+            for t in range(steps):
+                pop_history[t] = self.populations
+                k_history[t], resource_history[t] = self.step()
+
+            return Trajectories(pop_history, k_history, resource_history)
+
+        os.makedirs(history_dir, exist_ok=True)
+        shapes = {
+            "pop_history": (self.size, self.model.num_microbes),
+            "k_history": (self.size, self.model.num_microbes),
+            "resource_history": (self.size, self.model.num_resources),
+        }
+        files = {
+            name: np.lib.format.open_memmap(os.path.join(history_dir, f"{name}.npy"), mode="w+",
+                                            dtype=np.float64, shape=(steps,) + shapes[name])
+            for name in HISTORY_NAMES
+        }
+        blocks = {name: np.empty((min(chunk, steps),) + shapes[name]) for name in HISTORY_NAMES}
+
+        for start in range(0, steps, chunk):
+            count = min(chunk, steps - start)
+            for t in range(count):
+                blocks["pop_history"][t] = self.populations
+                blocks["k_history"][t], blocks["resource_history"][t] = self.step()
+
+            for name in HISTORY_NAMES:
+                files[name][start:start + count] = blocks[name][:count]
+                files[name].flush()
+
+        del files
+        return Trajectories.load(history_dir)
@@ -0,0 +1,223 @@
+import json
+import os
+import re
+import time
+
+import numpy as np
+
+#
+# --- STREAMING EXPORT ---
+#
+# An exporter attached to a Simulation writes every step to a columnar file while
+# the run goes on. There is one row per step and one column for the step number,
+# every microbe population ("pop.<name>"), every carrying capacity ("k.<name>")
+# and every resource ("resource.<name>").
+#
+# Formats:
+#   csv      one text file with a header row
+#   columns  a folder holding one raw little endian float64 file per column and a
+#            schema.json naming them and counting the rows written so far, so
+#            readers can memory-map each column with read_columns while the run
+#            is still going
+#
+# When microbes or resources are added or removed the columns change, and the
+# exporter carries on in a new part next to the first: results.1.csv,
+# results.2.csv and so on.
+#
+
+FORMATS = ("csv", "columns")
+
+COLUMN_DTYPE = np.dtype("<f8")
+
+class StreamExporter:
+    def __init__(self, path, format=None, buffer_steps=4096, flush_interval=None):
+        """Stream the histories of a Simulation to path as it runs
+
+        At most buffer_steps rows are held in memory before they are written out, and
+        with flush_interval they are also written once that many seconds have passed
+        since the last write. The format is guessed from the extension of path if it
+        is not given, .csv for csv and anything else for columns.
+        """
+
+        if format is None:
+            format = "csv" if str(path).lower().endswith(".csv") else "columns"
+        if format not in FORMATS:
+            raise ValueError(f"Unknown export format '{format}', expected one of {', '.join(FORMATS)}")
+
+        self.path = path
+        self.format = format
+        self.buffer_steps = buffer_steps
+        self.flush_interval = flush_interval
+
+        # The step the next row will be for, set when attached
+        self.exported_step = None
+
+        self.parts = []
+        self.columns = None
+        self._buffer = []
+        self._buffered = 0
+        self._last_flush = time.monotonic()
+        self._file = None
+        self._column_files = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def start(self, simulation):
+        """Export from the current step of simulation onwards"""
+
+        self._end_part()
+        self.exported_step = simulation.current_step
+
+    def collect(self, simulation):
+        """Buffer the steps simulation took since the last call, writing them out when due"""
+
+        if self.exported_step is None or simulation.current_step < self.exported_step:
+            # Not started yet, or the simulation was reset or rewound
+            self.start(simulation)
+            return
+
+        new = simulation.current_step - self.exported_step
+        if new == 0:
+            return
+
+        columns, block = history_block(simulation, self.exported_step)
+        if columns != self.columns:
+            self._end_part()
+            root, extension = os.path.splitext(str(self.path))
+            self.parts.append(str(self.path) if not self.parts else f"{root}.{len(self.parts)}{extension}")
+            self.columns = columns
+
+        self._buffer.append(block)
+        self._buffered += new
+        self.exported_step = simulation.current_step
+
+        due = self.flush_interval is not None and time.monotonic() - self._last_flush >= self.flush_interval
+        if self._buffered >= self.buffer_steps or due:
+            self.flush()
+
+    def flush(self):
+        """Write out every buffered row"""
+
+        self._last_flush = time.monotonic()
+        if not self._buffer:
+            return
+
+        rows = np.concatenate(self._buffer)
+        self._buffer = []
+        self._buffered = 0
+
+        if self.format == "csv":
+            self._write_csv(rows)
+        else:
+            self._write_columns(rows)
+
+    def close(self):
+        """Write out what is left and close the files"""
+
+        self._end_part()
+
+    def _write_csv(self, rows):
+        if self._file is None:
+            self._file = open(self.parts[-1], "w", newline="")
+            self._file.write(",".join(self.columns) + "\n")
+
+        np.savetxt(self._file, rows, delimiter=",", fmt=["%d"] + ["%.17g"] * (len(self.columns) - 1))
+        self._file.flush()
+
+    def _write_columns(self, rows):
+        folder = self.parts[-1]
+        if self._column_files is None:
+            os.makedirs(folder, exist_ok=True)
+            self._schema = {"columns": [], "rows": 0}
+            self._column_files = []
+            for i, name in enumerate(self.columns):
+                filename = f"{i:04d}_{re.sub(r'[^A-Za-z0-9_.-]', '_', name)}.f64"
+                self._schema["columns"].append({"name": name, "file": filename})
+                self._column_files.append(open(os.path.join(folder, filename), "wb"))
+
+        for i, file in enumerate(self._column_files):
+            file.write(np.ascontiguousarray(rows[:, i]).tobytes())
+            file.flush()
+
+        # The schema is replaced in one go, so readers never see a half written one
+        self._schema["rows"] += len(rows)
+        temporary = os.path.join(folder, "schema.json.tmp")
+        with open(temporary, "w") as file:
+            json.dump(self._schema, file)
+        os.replace(temporary, os.path.join(folder, "schema.json"))
+
+    def _end_part(self):
+        """Write out and close the current part, the next rows start a new one"""
+
+        self.flush()
+        self.columns = None
+
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._column_files is not None:
+            for file in self._column_files:
+                file.close()
+            self._column_files = None
+
+def read_columns(path):
+    """The columns an exporter wrote to a columns folder so far, as memory-mapped arrays"""
+
+    with open(os.path.join(path, "schema.json")) as file:
+        schema = json.load(file)
+
+    columns = {}
+    for column in schema["columns"]:
+        if schema["rows"] == 0:
+            columns[column["name"]] = np.empty(0, dtype=COLUMN_DTYPE)
+            continue
+        columns[column["name"]] = np.memmap(os.path.join(path, column["file"]), dtype=COLUMN_DTYPE, mode="r",
+                                            shape=(schema["rows"],))
+    return columns
+
+def history_block(simulation, start, dtype=COLUMN_DTYPE):
+    """Column names and a (steps, columns) array of every step from start on
+
+    The first column is the step number. Histories that started after start, such
+    as microbes added mid-run, read as NaN before they began.
+    """
+
+    columns, histories = _columns_of(simulation)
+    count = max(simulation.current_step - start, 0)
+
+    block = np.empty((count, len(columns)), dtype=dtype)
+    block[:, 0] = np.arange(start, start + count)
+    for i, values in enumerate(histories, start=1):
+        block[:, i] = _last(values, count)
+
+    return columns, block
+
+def _columns_of(simulation):
+    """Column names and the history behind each, after the step column"""
+
+    columns = ["step"]
+    histories = []
+
+    for microbe in simulation.microbes:
+        columns.append(f"pop.{microbe.name}")
+        histories.append(microbe.pop_history)
+    for microbe in simulation.microbes:
+        columns.append(f"k.{microbe.name}")
+        histories.append(microbe.k_history)
+    for res, values in simulation.env.resource_history.items():
+        columns.append(f"resource.{res}")
+        histories.append(values)
+
+    return columns, histories
+
+def _last(values, count):
+    """The last count values of a history, NaN before it started"""
+
+    tail = np.asarray(values[max(len(values) - count, 0):], dtype=COLUMN_DTYPE)
+    if len(tail) < count:
+        tail = np.concatenate([np.full(count - len(tail), np.nan), tail])
+    return tail
@@ -0,0 +1,969 @@
+import os
+import threading
+import weakref
+
+import numpy as np
+
+#
+# --- HISTORY BUFFER ---
+#
+
+class HistoryBuffer:
+    def __init__(self, columns, dtype=np.float64, capacity=1024):
+        """Append-only (steps, columns) history stored in one contiguous array
+
+        The array doubles in size when it runs out of room, so appending is amortized
+        O(1) per step. view() and column() return zero-copy views of the filled part,
+        which stay valid until the next append that has to grow the array.
+        """
+
+        self.dtype = np.dtype(dtype)
+        self._data = np.empty((max(capacity, 1), columns), dtype=self.dtype)
+        self._length = 0
+
+    def __len__(self):
+        return self._length
+
+    @property
+    def columns(self):
+        return self._data.shape[1]
+
+    @property
+    def capacity(self):
+        return self._data.shape[0]
+
+    def view(self):
+        """The whole history as a (steps, columns) view"""
+        return self._data[:self._length]
+
+    def column(self, index):
+        """The history of one column as a view"""
+        return self._data[:self._length, index]
+
+    def rows(self, start=0, stop=None):
+        """Rows start..stop as a (steps, columns) view"""
+        return self.view()[start:stop]
+
+    def row(self, step):
+        """The row logged at step, negative steps count from the end"""
+        return self.view()[step]
+
+    def append(self, row):
+        """Log one row"""
+
+        self._reserve(self._length + 1)
+        self._data[self._length] = row
+        self._length += 1
+
+    def extend(self, rows):
+        """Log a (steps, columns) block of rows"""
+
+        rows = np.asarray(rows)
+        self._reserve(self._length + len(rows))
+        self._data[self._length:self._length + len(rows)] = rows
+        self._length += len(rows)
+
+    def fill(self, row, steps):
+        """Log the same row steps times"""
+
+        if steps <= 0:
+            return
+
+        self._reserve(self._length + steps)
+        self._data[self._length:self._length + steps] = row
+        self._length += steps
+
+    def repeat_tail(self, period, repeats):
+        """Log the last period rows again, repeats times over"""
+
+        if period <= 0 or repeats <= 0:
+            return
+        if period > self._length:
+            raise ValueError(f"can not repeat the last {period} rows of a history with {self._length}")
+
+        total = period * repeats
+        self._reserve(self._length + total)
+
+        # Everything from start onwards repeats with the period, so each copy can
+        # double the amount that is copied next
+        start = self._length - period
+        written = 0
+        while written < total:
+            count = min(period + written, total - written)
+            end = self._length + written
+            self._data[end:end + count] = self._data[start:start + count]
+            written += count
+
+        self._length += total
+
+    def add_column(self, fill_value=np.nan):
+        """Add a column at the end, reading as fill_value for every logged row"""
+
+        data = np.empty((self.capacity, self.columns + 1), dtype=self.dtype)
+        data[:, :-1] = self._data
+        data[:, -1] = fill_value
+        self._data = data
+
+    def delete_column(self, index):
+        """Remove a column and its history"""
+
+        self._data = np.delete(self._data, index, axis=1)
+
+    def _reserve(self, length):
+        """Grow the array by doubling until length rows fit"""
+
+        if length <= self.capacity:
+            return
+
+        capacity = self.capacity
+        while capacity < length:
+            capacity *= 2
+
+        data = np.empty((capacity, self.columns), dtype=self.dtype)
+        data[:self._length] = self._data[:self._length]
+        self._data = data
+
+#
+# --- HISTORY TABLE ---
+#
+
+class HistoryTable:
+    def __init__(self, columns, dtype=np.float64, capacity=1024, pyramid=False):
+        """A history whose columns can join part way through a run
+
+        Columns are stored in groups, each a HistoryBuffer that starts at the step its
+        columns were added. Adding a column never touches the rows logged before it,
+        and the missing start of its history is only padded in when it is read.
+
+        fill() stores its row once and records the rest as a run of copies, which is
+        also only expanded when it is read. A settled run logs the same state for
+        millions of steps, and this keeps that at the memory of one row.
+
+        With pyramid=True a HistoryPyramid is built over the table for summary()
+        queries. It does not copy the rows, but its levels take about four times the
+        memory of the table again, see HistoryPyramid.
+        """
+
+        self.dtype = np.dtype(dtype)
+        self.capacity = capacity
+        self._length = 0
+
+        # Rows actually stored, and [start, count] of every run of steps that repeat
+        # the stored row logged just before start
+        self._stored = 0
+        self._runs = []
+
+        # Groups in column order, each a dict with start, offset, buffer and fill_value.
+        # offset is the stored row the buffer starts at
+        self._groups = []
+        if columns:
+            self._groups.append(self._new_group(columns, np.nan))
+
+        # One key per column in column order, which stays with its column when others are deleted
+        self._keys = [object() for _ in range(columns)]
+
+        self.pyramid = HistoryPyramid(columns, dtype, capacity, values=self) if pyramid else None
+
+    def __len__(self):
+        return self._length
+
+    @property
+    def columns(self):
+        return sum(group["buffer"].columns for group in self._groups)
+
+    def append(self, row):
+        """Log one row, ordered like the columns"""
+
+        for group, part in zip(self._groups, self._split(row)):
+            group["buffer"].append(part)
+        self._length += 1
+        self._stored += 1
+
+        if self.pyramid is not None:
+            self.pyramid.catch_up()
+
+    def fill(self, row, steps):
+        """Log the same row steps times, storing it only once"""
+
+        if steps <= 0:
+            return
+
+        # Carry on the last run if it ends here with the same row
+        run = self._runs[-1] if self._runs else None
+        if (run is not None and run[0] + run[1] == self._length
+                and all(group["offset"] < self._stored for group in self._groups)
+                and np.array_equal(np.asarray(row, dtype=self.dtype), self.row(-1), equal_nan=True)):
+            run[1] += steps
+        else:
+            for group, part in zip(self._groups, self._split(row)):
+                group["buffer"].append(part)
+            self._stored += 1
+            if steps > 1:
+                self._runs.append([self._length + 1, steps - 1])
+
+        self._length += steps
+
+        if self.pyramid is not None:
+            self.pyramid.catch_up()
+
+    def repeat_tail(self, period, repeats):
+        """Log the last period rows again, repeats times over"""
+
+        if period <= 0 or repeats <= 0:
+            return
+        if period > self._length:
+            raise ValueError(f"can not repeat the last {period} rows of a history with {self._length}")
+
+        # Part of a run, so the repeated rows are not stored in one piece
+        if self._runs and sum(self._runs[-1]) > self._length - period:
+            cycle = self.tail(period)
+            for group, part in zip(self._groups, self._split(cycle.T)):
+                group["buffer"].extend(part.T)
+                group["buffer"].repeat_tail(period, repeats - 1)
+            self._length += period * repeats
+            self._stored += period * repeats
+            if self.pyramid is not None:
+                self.pyramid.catch_up()
+            return
+
+        for group in self._groups:
+            buffer = group["buffer"]
+            if len(buffer) >= period:
+                buffer.repeat_tail(period, repeats)
+                continue
+
+            # Joined less than a period ago, so the repeated rows start with padding.
+            # Log the first repeat with it, after which the last period rows of the
+            # buffer are the whole repeat and the rest can be copied in bulk
+            rows = np.full((period, buffer.columns), group["fill_value"], dtype=self.dtype)
+            rows[period - len(buffer):] = buffer.view()
+            buffer.extend(rows)
+            buffer.repeat_tail(period, repeats - 1)
+        self._length += period * repeats
+        self._stored += period * repeats
+
+        if self.pyramid is not None:
+            self.pyramid.catch_up()
+
+    def add_column(self, fill_value=np.nan):
+        """Add a column at the end that starts now, reading as fill_value before it joined
+
+        Returns the key of the new column.
+        """
+
+        if self.pyramid is not None:
+            self.pyramid.add_column(fill_value)
+
+        self._keys.append(object())
+
+        # Columns added on the same step share a group
+        last = self._groups[-1] if self._groups else None
+        if last is not None and last["start"] == self._length and _same_value(last["fill_value"], fill_value):
+            last["buffer"].add_column()
+        else:
+            self._groups.append(self._new_group(1, fill_value))
+
+        return self._keys[-1]
+
+    def delete_column(self, index):
+        """Remove a column and its history"""
+
+        if self.pyramid is not None:
+            self.pyramid.delete_column(index)
+
+        group, local = self._locate(index)
+        del self._keys[index]
+        if group["buffer"].columns == 1:
+            self._groups.remove(group)
+        else:
+            group["buffer"].delete_column(local)
+
+    def key_of(self, index):
+        """The key of a column, which keeps naming it when columns before it are deleted"""
+
+        return self._keys[index]
+
+    def index_of(self, key):
+        """The current index of the column with key"""
+
+        for index, other in enumerate(self._keys):
+            if other is key:
+                return index
+        raise KeyError("history column was deleted")
+
+    def start_of(self, index):
+        """The step a column joined at"""
+
+        group, _ = self._locate(index)
+        return group["start"]
+
+    def column(self, index):
+        """The history of one column, padded before it joined
+
+        This is a zero-copy view for columns that have been there since step 0.
+        """
+
+        return self.values(index)
+
+    def values(self, index, start=0, stop=None):
+        """Steps start..stop of one column, only padding the part from before it joined
+
+        A zero-copy view when the whole range is from after the column joined.
+        """
+
+        stop = self._length if stop is None else min(stop, self._length)
+        start = min(max(start, 0), stop)
+
+        group, local = self._locate(index)
+        data = group["buffer"].column(local)
+        joined = group["start"]
+        if start >= joined:
+            return data[self._stored_rows(group, start, stop)]
+
+        padded = np.full(stop - start, group["fill_value"], dtype=self.dtype)
+        if stop > joined:
+            padded[joined - start:] = data[self._stored_rows(group, joined, stop)]
+        return padded
+
+    def view(self):
+        """The whole history as (steps, columns), a zero-copy view if nothing joined late or was filled"""
+
+        return self.rows()
+
+    def tail(self, steps):
+        """The last steps rows as (steps, columns), padded for columns that joined since"""
+
+        return self.rows(self._length - min(steps, self._length))
+
+    def rows(self, start=0, stop=None):
+        """Rows start..stop as (steps, columns), padded for columns that joined since start
+
+        A zero-copy view if nothing joined late and no run of filled rows is in range.
+        """
+
+        stop = self._length if stop is None else min(stop, self._length)
+        start = min(max(start, 0), stop)
+        if len(self._groups) == 1 and self._groups[0]["start"] == 0:
+            return self._groups[0]["buffer"].view()[self._stored_rows(self._groups[0], start, stop)]
+
+        rows = np.empty((stop - start, self.columns), dtype=self.dtype)
+
+        col = 0
+        for group in self._groups:
+            buffer = group["buffer"]
+            width = buffer.columns
+            joined = group["start"]
+            first = min(max(start, joined), stop)
+            rows[:first - start, col:col + width] = group["fill_value"]
+            rows[first - start:, col:col + width] = buffer.view()[self._stored_rows(group, first, stop)]
+            col += width
+
+        return rows
+
+    def row(self, step):
+        """The row logged at step, negative steps count from the end"""
+
+        if step < 0:
+            step += self._length
+        if not 0 <= step < self._length:
+            raise IndexError("history step out of range")
+        return self.rows(step, step + 1)[0]
+
+    def summary(self, start=0, stop=None, points=1000):
+        """Min/max/mean of steps start..stop in about points buckets, see HistoryPyramid.summary"""
+
+        if self.pyramid is None:
+            raise ValueError("this history was created without pyramid=True")
+        return self.pyramid.summary(start, stop, points)
+
+    def _new_group(self, columns, fill_value):
+        return {
+            "start": self._length,
+            "offset": self._stored,
+            "buffer": HistoryBuffer(columns, self.dtype, self.capacity),
+            "fill_value": fill_value,
+        }
+
+    def _stored_rows(self, group, start, stop):
+        """Where a group's buffer holds steps start..stop, which are all after it joined
+
+        A slice if they are stored in one piece, otherwise an index array that repeats
+        the stored row of each run.
+        """
+
+        offset = group["offset"]
+        if start >= stop:
+            return slice(0, 0)
+
+        # Runs that end by start only shift the range, runs from stop on do not matter
+        shift = 0
+        runs = []
+        for run_start, count in self._runs:
+            if run_start + count <= start:
+                shift += count
+            elif run_start < stop:
+                runs.append((run_start, count))
+        if not runs:
+            return slice(start - shift - offset, stop - shift - offset)
+
+        steps = np.arange(start, stop)
+        stored = steps - shift - offset
+        for run_start, count in runs:
+            # Inside the run every step reads the row stored before it, after it
+            # every step is count rows further back
+            inside = (steps >= run_start) & (steps < run_start + count)
+            stored[inside] -= steps[inside] - run_start + 1
+            stored[steps >= run_start + count] -= count
+        return stored
+
+    def _split(self, row):
+        """Cut a full row into the parts stored by each group"""
+
+        parts = []
+        col = 0
+        for group in self._groups:
+            width = group["buffer"].columns
+            parts.append(row[col:col + width])
+            col += width
+        return parts
+
+    def _locate(self, index):
+        """Find the group holding a column and its index inside that group"""
+
+        if index < 0:
+            index += self.columns
+
+        for group in self._groups:
+            width = group["buffer"].columns
+            if index < width:
+                return group, index
+            index -= width
+
+        raise IndexError("history column out of range")
+
+def _same_value(a, b):
+    """Equality that treats NaN as equal to itself"""
+
+    return a == b or (a != a and b != b)
+
+#
+# --- HISTORY PYRAMID ---
+#
+
+class HistoryPyramid:
+    def __init__(self, columns, dtype=np.float64, capacity=1024, values=None):
+        """Min/max/mean summaries of every 2, 4, 8, ... steps of a history
+
+        Level k holds one bucket per 2^k steps, built from pairs of level k-1 buckets
+        as soon as both are complete. Logging stays amortized O(1) per step, and
+        summary() can describe any range of steps with a handful of buckets no
+        matter how long the run is. NaN values count as missing.
+
+        Without values the pyramid keeps its own history, logged through append,
+        extend, fill and repeat_tail. With values the levels are built over that
+        history instead of a copy of it: a HistoryBuffer, HistoryTable, ArrayHistory,
+        list or array that rows are only ever added to. Whoever logs to it calls
+        catch_up() afterwards, or track() with the newest array when the history is
+        handed over as a new array every time.
+
+        Level k has one row per 2^k steps, so all of them together have about as many
+        rows as the history. With a min, a max, a float64 sum and a count in each, the
+        levels take about four times the memory of a float64 history, on top of it.
+        """
+
+        self.dtype = np.dtype(dtype)
+        self.capacity = capacity
+        self._columns = columns
+
+        # Only a history of its own can be logged to through the pyramid
+        self._owned = values is None
+        self.values = HistoryBuffer(columns, self.dtype, capacity) if values is None else values
+
+        # Levels 1 and up, each a dict of min, max, sum and count HistoryBuffers
+        self.levels = []
+
+    def __len__(self):
+        return len(self.values)
+
+    @property
+    def columns(self):
+        return self._columns
+
+    def append(self, row):
+        """Log one row"""
+
+        self._own_values().append(row)
+        self._build()
+
+    def extend(self, rows):
+        """Log a (steps, columns) block of rows"""
+
+        self._own_values().extend(rows)
+        self._build()
+
+    def fill(self, row, steps):
+        """Log the same row steps times"""
+
+        self._own_values().fill(row, steps)
+        self._build()
+
+    def repeat_tail(self, period, repeats):
+        """Log the last period rows again, repeats times over"""
+
+        self._own_values().repeat_tail(period, repeats)
+        self._build()
+
+    def catch_up(self):
+        """Fold the rows the history gained since the last call into the levels
+
+        If the history got shorter it was replaced, and the levels are built again.
+        """
+
+        if self.levels and len(self.values) < 2 * len(self.levels[0]["min"]):
+            self.levels = []
+        self._build()
+
+    def track(self, values):
+        """Summarise values from now on, the same history as before with rows added"""
+
+        self.values = values
+        self.catch_up()
+
+    def add_column(self, fill_value=np.nan):
+        """Add a column at the end, reading as fill_value for every logged row
+
+        A pyramid over another history only adds the column to its levels, the
+        history gets it from its owner.
+        """
+
+        if self._owned:
+            self.values.add_column(fill_value)
+        self._columns += 1
+
+        missing = fill_value != fill_value
+        for k, level in enumerate(self.levels, start=1):
+            size = 2 ** k
+            level["min"].add_column(fill_value)
+            level["max"].add_column(fill_value)
+            level["sum"].add_column(0.0 if missing else fill_value * size)
+            level["count"].add_column(0.0 if missing else size)
+
+    def delete_column(self, index):
+        """Remove a column and its history"""
+
+        if self._owned:
+            self.values.delete_column(index)
+        self._columns -= 1
+
+        for level in self.levels:
+            for buffer in level.values():
+                buffer.delete_column(index)
+
+    def summary(self, start=0, stop=None, points=1000):
+        """Describe steps start..stop with at most about points buckets
+
+        Picks the finest level that needs no more than points buckets, so the cost
+        only depends on points. Returns (steps, mins, maxs, means), where steps is
+        the first step of each bucket and the others are (buckets, columns). The first
+        and last bucket may reach a little outside the range, to stay aligned.
+        """
+
+        length = len(self)
+        stop = length if stop is None else min(stop, length)
+        start = max(start, 0)
+        if stop <= start:
+            empty = np.empty((0, self.columns))
+            return np.empty(0), empty, empty, empty
+
+        # Finest level whose buckets fit the range into points
+        span = stop - start
+        k = 0
+        while k < len(self.levels) and -(-span // 2 ** k) > max(points, 1):
+            k += 1
+        size = 2 ** k
+
+        first = start // size
+        complete = length // size
+        last = min(-(-stop // size), complete)
+        low, high, total, count = self._stats(k, first, last)
+
+        # The unfinished bucket at the end is put together from the lower levels
+        if stop > complete * size:
+            partial = [self._stats(j, (length >> j) - 1, length >> j)
+                       for j in range(k - 1, -1, -1) if length >> j & 1]
+            low = np.concatenate([low, np.fmin.reduce([p[0] for p in partial])])
+            high = np.concatenate([high, np.fmax.reduce([p[1] for p in partial])])
+            total = np.concatenate([total, np.sum([p[2] for p in partial], axis=0)])
+            count = np.concatenate([count, np.sum([p[3] for p in partial], axis=0)])
+
+        steps = np.arange(first, first + len(low), dtype=np.float64) * size
+        means = np.divide(total, count, out=np.full(total.shape, np.nan), where=count > 0)
+        return steps, low, high, means
+
+    def envelope(self, column=0, start=0, stop=None, points=1000):
+        """The min and max of one column as a single line, ready for plotting
+
+        Each bucket becomes a vertical stroke from its min to its max, so spikes stay
+        visible. Returns (x, y) with about points values.
+        """
+
+        steps, low, high, _ = self.summary(start, stop, max(points // 2, 1))
+        if not len(steps):
+            return np.empty(0), np.empty(0)
+
+        size = steps[1] - steps[0] if len(steps) > 1 else 1
+        x = np.repeat(steps + (size - 1) / 2, 2)
+        y = np.column_stack([low[:, column], high[:, column]]).ravel()
+        return x, y
+
+    def _stats(self, k, first, last):
+        """(min, max, sum, count) of buckets first..last on level k"""
+
+        if k == 0:
+            values = self._rows(first, last)
+            present = ~np.isnan(values)
+            return values, values, np.where(present, values, 0.0), present.astype(np.float64)
+
+        level = self.levels[k - 1]
+        return tuple(level[name].view()[first:last] for name in ("min", "max", "sum", "count"))
+
+    def _own_values(self):
+        if not self._owned:
+            raise TypeError("this pyramid summarises another history, log to that history and call catch_up()")
+        return self.values
+
+    def _rows(self, first, last):
+        """Rows first..last of the history as (steps, columns)"""
+
+        values = self.values
+        if isinstance(values, (HistoryBuffer, HistoryTable)):
+            return values.rows(first, last)
+
+        rows = np.asarray(values[first:last], dtype=self.dtype)
+        return rows.reshape(len(rows), self._columns)
+
+    def _build(self):
+        """Fold newly completed pairs of buckets into the level above"""
+
+        k = 1
+        while True:
+            below = len(self.values) if k == 1 else len(self.levels[k - 2]["min"])
+            if below < 2:
+                return
+
+            if k > len(self.levels):
+                self.levels.append({
+                    "min": HistoryBuffer(self.columns, self.dtype, max(self.capacity >> k, 1)),
+                    "max": HistoryBuffer(self.columns, self.dtype, max(self.capacity >> k, 1)),
+                    "sum": HistoryBuffer(self.columns, np.float64, max(self.capacity >> k, 1)),
+                    "count": HistoryBuffer(self.columns, np.float64, max(self.capacity >> k, 1)),
+                })
+
+            level = self.levels[k - 1]
+            have = len(level["min"])
+            ready = below // 2
+            if ready == have:
+                # Nothing new here, so nothing new above either
+                return
+
+            low, high, total, count = self._stats(k - 1, 2 * have, 2 * ready)
+            shape = (ready - have, 2, self.columns)
+            low, high = low.reshape(shape), high.reshape(shape)
+            total, count = total.reshape(shape), count.reshape(shape)
+
+            level["min"].extend(np.fmin(low[:, 0], low[:, 1]))
+            level["max"].extend(np.fmax(high[:, 0], high[:, 1]))
+            level["sum"].extend(total[:, 0] + total[:, 1])
+            level["count"].extend(count[:, 0] + count[:, 1])
+            k += 1
+
+# One pyramid per history, for everything that summarises the same history
+_shared_pyramids = weakref.WeakKeyDictionary()
+_shared_lock = threading.Lock()
+
+def shared_pyramid(history):
+    """The HistoryPyramid of an ArrayHistory, HistoryBuffer or HistoryTable, caught up with its latest rows
+
+    Every caller gets the same pyramid, built over the history without copying it,
+    and it goes away with the history.
+    """
+
+    if isinstance(history, HistoryTable) and history.pyramid is not None:
+        pyramid = history.pyramid
+    else:
+        if not isinstance(history, (ArrayHistory, HistoryBuffer, HistoryTable)):
+            raise TypeError(f"can not share a pyramid of a {type(history).__name__}")
+
+        with _shared_lock:
+            pyramid = _shared_pyramids.get(history)
+            if pyramid is None:
+                columns = history.columns if isinstance(history, (HistoryBuffer, HistoryTable)) else 1
+                pyramid = _shared_pyramids[history] = HistoryPyramid(columns, values=history)
+
+    pyramid.catch_up()
+    return pyramid
+
+#
+# --- ARRAY HISTORY ---
+#
+
+class ArrayHistory:
+    def __init__(self, base, dtype=np.float64):
+        """A history list that starts from an existing array, such as a memory-mapped checkpoint
+
+        It can stand in for the pop_history, k_history and resource_history lists.
+        The base array is never copied or written to; new values are appended to a
+        HistoryBuffer after it. Slices and np.asarray return NumPy arrays, which are
+        zero-copy views as long as they fall entirely inside the base or the new values.
+        """
+
+        self.base = base
+        self.tail = HistoryBuffer(1, dtype)
+
+    def __len__(self):
+        return len(self.base) + self._new_length()
+
+    def __getitem__(self, key):
+        split = len(self.base)
+
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step == 1 and stop <= split:
+                return self.base[start:stop]
+            if step == 1 and start >= split:
+                return self._new_values(start - split, stop - split)
+            return self.view()[key]
+
+        index = key + len(self) if key < 0 else key
+        if not 0 <= index < len(self):
+            raise IndexError("history index out of range")
+        if index < split:
+            return float(self.base[index])
+        return float(self._new_values(index - split, index - split + 1)[0])
+
+    def __iter__(self):
+        return iter(self.view())
+
+    def __array__(self, dtype=None, copy=None):
+        values = self.view()
+        return values if dtype is None else values.astype(dtype, copy=False)
+
+    def append(self, value):
+        self.tail.append(value)
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=self.tail.dtype)
+        if len(values):
+            self.tail.extend(values[:, None])
+
+    def view(self):
+        """The whole history as one array, only copied when it has both a base and new values"""
+
+        if not self._new_length():
+            return self.base
+
+        new = self._new_values(0, self._new_length())
+        if not len(self.base):
+            return new
+        return np.concatenate([self.base, new])
+
+    def pieces(self):
+        """The history as the base and the new values, two arrays that are not copied"""
+
+        return [self.base, self._new_values(0, self._new_length())]
+
+    def copy(self):
+        """Another history sharing the same base"""
+
+        history = ArrayHistory(self.base, self.tail.dtype)
+        history.extend(self._new_values(0, self._new_length()))
+        return history
+
+    def _new_length(self):
+        return len(self.tail)
+
+    def _new_values(self, start, stop):
+        return self.tail.column(0)[start:stop]
+
+class ColumnHistory(ArrayHistory):
+    def __init__(self, base, table, key):
+        """A history whose new values are a column of a HistoryTable, such as a VectorEngine's
+
+        Reads like ArrayHistory, with the column in place of the appended values, so
+        every step is stored once, in the table, and plotting or exporting reads it
+        without a copy. Only the table's owner adds steps, appending to this raises.
+        """
+
+        self.base = base
+        self.table = table
+        self.key = key
+
+    def append(self, value):
+        raise TypeError("this history is a view of an engine's history table and only grows with the engine")
+
+    def extend(self, values):
+        raise TypeError("this history is a view of an engine's history table and only grows with the engine")
+
+    def copy(self):
+        """A history of its own with the same values, sharing only the base"""
+
+        history = ArrayHistory(self.base, self.table.dtype)
+        history.extend(self._new_values(0, self._new_length()))
+        return history
+
+    def _new_length(self):
+        return len(self.table)
+
+    def _new_values(self, start, stop):
+        return self.table.values(self.table.index_of(self.key), start, stop)
+
+def padded_history(fill_value, steps, dtype=np.float64):
+    """An ArrayHistory that reads fill_value for its first steps, without storing them
+
+    Used for microbes and resources added mid-run, so joining late costs the same
+    however long the run has been going.
+    """
+
+    return ArrayHistory(np.broadcast_to(np.asarray(fill_value, dtype=dtype), (steps,)), dtype)
+
+#
+# --- DISK HISTORY ---
+#
+
+class DiskHistory:
+    def __init__(self, path, dtype=np.float64, chunk=1 << 20, retain=None):
+        """A history list kept in memory-mapped files on disk, for runs larger than RAM
+
+        Values are written into fixed size chunk files named path.0, path.1 and so on,
+        chunk values each. Only the chunk being written is mapped while appending, and
+        reads map the chunks they touch, so a slice inside one chunk is a zero-copy
+        view of the file. It can stand in for the history lists like ArrayHistory.
+
+        With retain set, chunk files that only hold steps older than the last retain
+        steps are deleted. Steps keep their numbers, the dropped ones read as NaN.
+        """
+
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.chunk = chunk
+        self.retain = retain
+
+        self._length = 0
+        self._dropped = 0
+
+        # The chunk being filled, mapped writable
+        self._writing = None
+        self._writing_index = -1
+
+    def __len__(self):
+        return self._length
+
+    @property
+    def first(self):
+        """The oldest step still on disk"""
+        return self._dropped * self.chunk
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step == 1:
+                return self.read(start, stop)
+            return self.view()[key]
+
+        index = key + len(self) if key < 0 else key
+        if not 0 <= index < len(self):
+            raise IndexError("history index out of range")
+        return float(self.read(index, index + 1)[0])
+
+    def __iter__(self):
+        for start in range(0, len(self), self.chunk):
+            yield from self.read(start, min(start + self.chunk, len(self)))
+
+    def __array__(self, dtype=None, copy=None):
+        values = self.view()
+        return values if dtype is None else values.astype(dtype, copy=False)
+
+    def append(self, value):
+        self.extend((value,))
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=self.dtype).reshape(-1)
+
+        written = 0
+        while written < len(values):
+            index, offset = divmod(self._length, self.chunk)
+            if offset == 0:
+                self._start_chunk(index)
+
+            count = min(self.chunk - offset, len(values) - written)
+            self._writing[offset:offset + count] = values[written:written + count]
+            self._length += count
+            written += count
+
+        self._drop_old()
+
+    def read(self, start, stop):
+        """Steps start to stop as an array, a view of the file when they are in one chunk"""
+
+        stop = max(stop, start)
+        pieces = []
+        position = start
+        while position < stop:
+            index, offset = divmod(position, self.chunk)
+            count = min(self.chunk - offset, stop - position)
+            pieces.append(self._chunk(index)[offset:offset + count])
+            position += count
+
+        if len(pieces) == 1:
+            return pieces[0]
+        if not pieces:
+            return np.empty(0, dtype=self.dtype)
+        return np.concatenate(pieces)
+
+    def chunks(self):
+        """Every chunk in order as arrays, so the whole history can be walked through a chunk at a time"""
+
+        for start in range(0, len(self), self.chunk):
+            yield self.read(start, min(start + self.chunk, len(self)))
+
+    def view(self):
+        """The whole history as one array, which is read into memory unless it fits in one chunk"""
+        return self.read(0, len(self))
+
+    def flush(self):
+        """Write the chunk being filled out to its file"""
+
+        if self._writing is not None:
+            self._writing.flush()
+
+    def _chunk(self, index):
+        """The values of one chunk, memory-mapped from its file or NaN if it was dropped"""
+
+        if index < self._dropped:
+            return np.full(self.chunk, np.nan, dtype=self.dtype)
+        if index == self._writing_index:
+            return self._writing
+
+        return np.memmap(self._chunk_path(index), dtype=self.dtype, mode="r", shape=(self.chunk,))
+
+    def _start_chunk(self, index):
+        """Finish the chunk being written and start the next file"""
+
+        self.flush()
+        self._writing = np.memmap(self._chunk_path(index), dtype=self.dtype, mode="w+", shape=(self.chunk,))
+        self._writing_index = index
+
+    def _drop_old(self):
+        """Delete the chunk files that are older than the retained steps"""
+
+        if self.retain is None:
+            return
+
+        # The chunk being written is always kept
+        keep_from = min((self._length - self.retain) // self.chunk, self._writing_index)
+        while self._dropped < keep_from:
+            os.remove(self._chunk_path(self._dropped))
+            self._dropped += 1
+
+    def _chunk_path(self, index):
+        return f"{self.path}.{index}"
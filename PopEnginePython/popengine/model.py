@@ -0,0 +1,247 @@
+# The Microbe and Environment classes every front end used to keep its own copy of.
+# They are the pure-Python reference the vector engine is checked against, and the
+# objects front ends edit and plot from.
+
+from .history import padded_history
+
+#
+# --- MICROBE CLASS
+#
+
+class Microbe:
+    def __init__(self, name, initial_population, growth_rate, required_resources, produced_resources, toxins):
+        """Create a new Microbe population with given properties"""
+
+        # Basics required for growth equation
+        self.name = name
+        self.population = initial_population
+        self.growth_rate = growth_rate
+        self.competitors = {}
+
+        # Resources and toxins
+        self.required_resources = required_resources
+        self.produced_resources = produced_resources
+        self.toxins = toxins
+
+        # Carry capacity
+        self.k_resources = {}
+
+        # Set up arrays to keep track of history (for graphing :3)
+        self.pop_history = []
+        self.k_history = []
+
+    def compute_growth(self):
+        """Compute growth using the Lotka-Volterra model"""
+
+        # Determine the limiting resource
+        min_k = min(self.k_resources[res] for res in self.required_resources)
+
+        # Avoid division by zero if resources are depleted
+        if min_k == 0:
+            if(self.population <= 2):
+                return -1 * self.population # Kill population if small enough
+            return self.growth_rate * -0.33 * self.population  # Extinction effect
+
+        # Compute competition effect
+        competition_effect = sum(self.competitors[m] for m in self.competitors)
+
+        # Compute the growth
+        growth = self.growth_rate * self.population * (1 - (competition_effect / min_k))
+
+        # Prevent overshooting into negative population
+        return max(growth, -self.population)
+    
+    def calculate_toxicity_multiplier(self, env_resources):
+        """Calculate the impact of toxins on microbial growth"""
+
+        # Find total resources 
+        total_resources = sum(env_resources.values())
+
+        if(total_resources == 0):
+            return 0.0
+
+        min_toxicity = 1.0
+
+        for res in self.toxins:
+            # Find weighted density of the current toxin
+            cur_toxin = self.toxins[res]
+            max_safe_density = cur_toxin["max_safe_density"]
+            min_safe_density = cur_toxin["min_safe_density"]
+            lethal_density = cur_toxin["lethal_density"]
+            toxin_weighted_density = (cur_toxin["toxicity"] * env_resources[res]) / total_resources
+
+            # If the density is in the safe range, continue to next toxin
+            if (toxin_weighted_density <= max_safe_density and toxin_weighted_density >= min_safe_density):
+                continue
+            
+            # If the density is lethal, return 0
+            if(toxin_weighted_density >= lethal_density):
+                return 0.0
+            
+            # If the density is between lethal and max safe density, then normalize the toxicity between the two
+            if (toxin_weighted_density >= max_safe_density and toxin_weighted_density <= lethal_density):
+                cur_toxicity = (toxin_weighted_density - lethal_density) / (max_safe_density - lethal_density)
+            
+            # If the density is less than the minimum that is safe, 
+            if(toxin_weighted_density <= min_safe_density):
+                cur_toxicity = (toxin_weighted_density) / (min_safe_density)
+            
+            # Keep track of the most toxic thing (least multiple because it acts as a multiplier)
+            min_toxicity = min(min_toxicity, cur_toxicity)
+
+        return min_toxicity
+
+    def update_population(self, new_pop):
+        """Update the population of a microbe and track the history"""
+
+        self.pop_history.append(self.population)
+        self.population = max(0, self.population + new_pop)
+
+    def add_competitor(self, other_microbe):
+        """Calculate the competition coefficient for another microbe based on shared resources"""
+
+        # Reset competition coefficients to be empty
+        competition_coefficients = []
+
+        # Find the shared resources
+        shared_resources = set(self.required_resources.keys()).intersection(set(other_microbe.required_resources.keys()))
+
+        # Calculate competition coefficient
+        for res in shared_resources:
+            competition_coefficients.append(other_microbe.required_resources[res] / self.required_resources[res])
+
+        # If no competition coefficients, the master competition coefficient is determined to be zero
+        if not competition_coefficients:
+            self.competitors[other_microbe] = 0
+
+        # Otherwise, it's the max of the competition coefficients
+        else:
+            self.competitors[other_microbe] = other_microbe.population * max(competition_coefficients)
+    
+    def produce_consume_resources(self):
+        """Calculate net resource change per time step"""
+
+        # Dict to keep track of the resource changes
+        resource_change = {}
+
+        # Determine the limiting resource
+        min_k = min(self.k_resources[res] for res in self.required_resources)
+
+        # Add the consumed resources
+        for res in self.required_resources:
+            resource_change[res] = self.required_resources[res] * min(min_k, self.population) * -1
+
+        # Add the produced resources, adding to dict if necessary
+        for res in self.produced_resources:
+            if res in resource_change:
+                resource_change[res] += self.produced_resources[res] * min(min_k, self.population)
+            else:
+                resource_change[res] = self.produced_resources[res] * min(min_k, self.population)
+
+        return resource_change
+    
+    def compute_carry_capacity(self, env_resources):
+        """Calculate the carrying capacity based on environmental resources and their toxicity"""
+
+        # Find minimum toxicity multiplier
+        toxicity_mult = self.calculate_toxicity_multiplier(env_resources)
+
+        # Find the carry capacity
+        for res in env_resources:
+            resource_consumption = self.required_resources.get(res, 0)  # Per microbe consumption
+
+            # If no pop, then k = 0
+            if(self.population == 0):
+                self.k_resources[res] = 0
+
+            # Microbe doesn't use this resource, so no limit
+            elif resource_consumption == 0:
+                self.k_resources[res] = float('inf')
+
+            # K = num resouces * toxicity multiplier / resource_consumption
+            else:
+                self.k_resources[res] = (env_resources[res] / resource_consumption) * toxicity_mult
+        
+        # Append the minimum to the history
+        min_k = min(self.k_resources[res] for res in self.required_resources)
+        self.k_history.append(min_k)
+
+#
+# --- ENVIRONMENT CLASS ---
+#
+
+class Environment:
+    def __init__(self, initial_resources, resource_refresh_rate):
+        """Initialize the environment with resources and refresh rates"""
+
+        self.resources = initial_resources
+        self.resource_refresh_rate = resource_refresh_rate
+        self.resource_history = {res: [] for res in initial_resources}
+
+    def update_resource_history(self):
+        """Log and refresh resources over time"""
+
+        # Steps logged so far, used to backlog resources added since
+        hist_len = max((len(history) for history in self.resource_history.values()), default=0)
+
+        # For all resources
+        for res in self.resources:
+            # Add new resource
+            if res not in self.resource_history:
+                # Backlog history as 0, read as 0 without being stored
+                self.resource_history[res] = padded_history(0.0, hist_len)
+
+            # Add current resource amount to history
+            self.resource_history[res].append(self.resources[res])
+
+            # Get resources from refresh rate
+            self.resources[res] += self.resource_refresh_rate[res]
+            if(self.resources[res] < 0):
+                self.resources[res] = 0
+
+    def add_resources(self, added_resources):
+        """Add resources that come from outside sources (i.e. Microbes)"""
+
+        for res in added_resources:
+            self.resources[res] += added_resources[res]
+
+#
+# --- SIMULATION STEP ---
+#
+
+def advance(env, microbes):
+    """Advance an Environment and its Microbes by one time step"""
+
+    # Calculate competition coefficients at every time step because population is part of the calculations
+    for m1 in microbes:
+        m1.competitors = {}
+        for m2 in microbes:
+            m1.add_competitor(m2)
+
+    total_resource_usage = {}
+
+    # Process each microbe
+    for microbe in microbes:
+        # Get carry capacity of microbe
+        microbe.compute_carry_capacity(env.resources)
+
+        # Get resource changes due to microbe
+        net_resource_usage = microbe.produce_consume_resources()
+        for resource in net_resource_usage:
+            if resource in total_resource_usage:
+                total_resource_usage[resource] += net_resource_usage[resource]
+            else:
+                total_resource_usage[resource] = net_resource_usage[resource]
+
+        # Calculate new microbe population
+        pop_change = microbe.compute_growth()
+        microbe.update_population(pop_change)
+
+    # Log resource history
+    env.add_resources(total_resource_usage)
+    env.update_resource_history()
+
+def can_advance(env):
+    """False once there is nothing left to simulate, because every resource has run out"""
+
+    return any(amount > 0 for amount in env.resources.values())
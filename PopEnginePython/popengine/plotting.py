@@ -0,0 +1,253 @@
+import numpy as np
+
+from .downsample import downsample
+from .history import ArrayHistory, HistoryBuffer, HistoryPyramid, HistoryTable, shared_pyramid
+
+#
+# --- LIVE PLOT ---
+#
+# Kept out of popengine/__init__.py so the engine can be used without matplotlib.
+#
+
+# Title and y label of the three model2 panels, matching graph_info
+MODEL2_PANELS = [
+    ("Smoothed Microbial Growth Over Time", "Population"),
+    ("Smoothed Carrying Capacity Over Time", "Carrying Capacity"),
+    ("Resource Levels Over Time", "Resource Level"),
+]
+
+class LivePlot:
+    def __init__(self, canvas, axes, panels=MODEL2_PANELS, headroom=1.25, blit=True,
+                 max_points=None, downsample_method="minmax"):
+        """Keeps one Line2D per series and updates it in place as histories grow
+
+        Axis limits are grown with some headroom, so most updates leave the axes
+        untouched. Those updates only redraw the lines, blitting them over a saved
+        background when the canvas supports it. Anything that changes the axes (new
+        series, new labels, data outside the limits) falls back to a full draw.
+
+        Pass blit=False for canvases that are saved to files rather than shown, since
+        blitted lines are not part of a normal figure draw.
+
+        Series longer than max_points (by default the width of the axes in pixels)
+        are downsampled before drawing, so the cost of a draw stops growing with the
+        length of the run. With the default "minmax" method each line is drawn from
+        a HistoryPyramid built over its history, so both the whole run and a zoomed
+        in range (show_range) come from a few hundred precomputed buckets. Engine and
+        checkpoint histories share one pyramid with everything else that plots them.
+        """
+
+        self.canvas = canvas
+        self.axes = list(axes)
+        self.panels = panels
+        self.headroom = headroom
+        self.blit = blit and getattr(canvas, "supports_blit", False)
+        self.max_points = max_points
+        self.downsample_method = downsample_method
+
+        # Steps shown on the x axis, None follows the data
+        self.view = None
+
+        self.backgrounds = None
+        canvas.mpl_connect("draw_event", self._on_draw)
+
+        self.reset()
+
+    def reset(self):
+        """Drop every line and go back to empty axes"""
+
+        for ax, (title, ylabel) in zip(self.axes, self.panels):
+            ax.clear()
+            ax.set_xlabel("Time")
+            ax.set_ylabel(ylabel)
+            ax.set_title(title)
+            ax.grid()
+            ax.set_xlim(0, 1)
+            ax.set_ylim(0, 1)
+
+        # Lines per panel, (length, min, max) of the data each line has shown and its pyramid
+        self.lines = [[] for _ in self.axes]
+        self.extents = [[] for _ in self.axes]
+        self.pyramids = [[] for _ in self.axes]
+
+        # Shared x values, grown by doubling and handed out as views
+        self.x = np.arange(1024, dtype=np.float64)
+
+        self.canvas.draw()
+
+    def update(self, panels):
+        """Show new data, given as one list of (label, values) pairs per panel
+
+        Histories only ever grow, so each update only needs to look at the points
+        added since the last one to know whether the axes have to change.
+        """
+
+        full_draw = False
+        for p, (ax, series) in enumerate(zip(self.axes, panels)):
+            if self._update_panel(p, ax, series):
+                full_draw = True
+
+        if full_draw or not self.blit or self.backgrounds is None:
+            self.canvas.draw()
+            return
+
+        # Only the lines changed, so paint them over the saved backgrounds
+        for ax, background, lines in zip(self.axes, self.backgrounds, self.lines):
+            self.canvas.restore_region(background)
+            for line in lines:
+                ax.draw_artist(line)
+            self.canvas.blit(ax.bbox)
+
+        self.canvas.flush_events()
+
+    def show_range(self, start=None, stop=None):
+        """Zoom the x axis to steps start..stop, or back to the whole run with no arguments
+
+        Takes effect on the next update().
+        """
+
+        if start is None and stop is None:
+            self.view = None
+        else:
+            self.view = (max(start or 0, 0), stop)
+
+        # Force the limits to be worked out again
+        for ax in self.axes:
+            ax.set_xlim(0, 1)
+
+    def _update_panel(self, p, ax, series):
+        """Update the lines of one panel, returning True if the axes need a full draw"""
+
+        lines = self.lines[p]
+        extents = self.extents[p]
+        pyramids = self.pyramids[p]
+        changed = False
+
+        # Match the number of lines to the number of series
+        while len(lines) < len(series):
+            line, = ax.plot([], [], animated=self.blit)
+            lines.append(line)
+            extents.append((0, np.inf, -np.inf))
+            pyramids.append(None)
+            changed = True
+
+        while len(lines) > len(series):
+            lines.pop().remove()
+            extents.pop()
+            pyramids.pop()
+            changed = True
+
+        # Never draw many more points than the axes has pixels
+        limit = self.max_points or max(int(ax.bbox.width), 2)
+
+        for i, (line, (label, values)) in enumerate(zip(lines, series)):
+            line.set_data(*self._visible_data(p, i, values, limit))
+
+            if line.get_label() != label:
+                line.set_label(label)
+                changed = True
+
+            extents[i] = _grow_extent(extents[i], values)
+
+        if changed:
+            if lines:
+                ax.legend()
+            elif ax.get_legend() is not None:
+                ax.get_legend().remove()
+
+        return self._fit_limits(ax, extents) or changed
+
+    def _fit_limits(self, ax, extents):
+        """Grow the axis limits if the data no longer fits, returning True if they moved"""
+
+        length = max((extent[0] for extent in extents), default=0)
+        low = min((extent[1] for extent in extents), default=np.inf)
+        high = max((extent[2] for extent in extents), default=-np.inf)
+        moved = False
+
+        x_low, x_high = ax.get_xlim()
+        if self.view is not None:
+            start, stop = self.view
+            view = (start, max(stop if stop is not None else length, start + 1))
+            if (x_low, x_high) != view:
+                ax.set_xlim(*view)
+                moved = True
+        elif length > x_high:
+            ax.set_xlim(0, max(length * self.headroom, 1))
+            moved = True
+
+        y_low, y_high = ax.get_ylim()
+        if low < y_low or high > y_high:
+            margin = (max(high, y_high) - min(low, y_low)) * (self.headroom - 1) or 1
+            ax.set_ylim(low - margin if low < y_low else y_low, high + margin if high > y_high else y_high)
+            moved = True
+
+        return moved
+
+    def _visible_data(self, p, i, values, limit):
+        """The (x, y) a line should show, downsampled to limit points if needed"""
+
+        start, stop = self.view if self.view is not None else (0, None)
+        stop = len(values) if stop is None else min(stop, len(values))
+        start = min(start, stop)
+
+        if self.downsample_method == "minmax":
+            if stop - start > limit:
+                return self._pyramid(p, i, values).envelope(0, start, stop, limit)
+        elif stop - start > limit:
+            x, y = downsample(np.asarray(values[start:stop], dtype=np.float64), limit, self.downsample_method)
+            return x + start, y
+
+        return self._x_for(stop)[start:], np.asarray(values[start:stop], dtype=np.float64)
+
+    def _pyramid(self, p, i, values):
+        """The pyramid of a line, caught up with the points added since the last update"""
+
+        if isinstance(values, (ArrayHistory, HistoryBuffer, HistoryTable)):
+            return shared_pyramid(values)
+
+        # Lists and arrays get a pyramid of the line's own, built over them
+        pyramid = self.pyramids[p][i]
+        if pyramid is None:
+            pyramid = self.pyramids[p][i] = HistoryPyramid(1, values=values)
+        pyramid.track(values)
+        return pyramid
+
+    def _x_for(self, length):
+        """A view of the shared x values of the given length"""
+
+        if length > len(self.x):
+            size = len(self.x)
+            while size < length:
+                size *= 2
+            self.x = np.arange(size, dtype=np.float64)
+        return self.x[:length]
+
+    def _on_draw(self, event):
+        """Save the freshly drawn backgrounds and put the animated lines back on top"""
+
+        if not self.blit:
+            return
+
+        self.backgrounds = [self.canvas.copy_from_bbox(ax.bbox) for ax in self.axes]
+        for ax, lines in zip(self.axes, self.lines):
+            for line in lines:
+                ax.draw_artist(line)
+
+def _grow_extent(extent, values):
+    """Fold the points added since the last update into (length, min, max)
+
+    If the series got shorter it was replaced, so the extent is rebuilt from scratch.
+    """
+
+    length, low, high = extent
+    if len(values) < length:
+        length, low, high = 0, np.inf, -np.inf
+
+    new = np.asarray(values[length:], dtype=np.float64)
+    new = new[np.isfinite(new)]
+    if len(new):
+        low = min(low, new.min())
+        high = max(high, new.max())
+
+    return len(values), low, high
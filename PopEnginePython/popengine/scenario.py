@@ -0,0 +1,335 @@
+import copy
+import hashlib
+import json
+import math
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from .engine import ModelArrays, VectorEngine
+
+try:
+    import tomllib
+except ImportError:
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+#
+# --- SCENARIOS ---
+#
+# A scenario is the starting state of a simulation as plain data, using the same
+# names as the Environment and Microbe constructors. JSON and TOML files are read.
+#
+# {
+#     "title": "Basic Symbiosis",
+#     "resources": {"Oxygen": 10, "Glucose": 10},
+#     "resource_refresh_rate": {"Oxygen": 0, "Glucose": 0},
+#     "microbes": [
+#         {
+#             "name": "OxygenEater",
+#             "initial_population": 1,
+#             "growth_rate": 1.2,
+#             "required_resources": {"Oxygen": 1},
+#             "produced_resources": {"Glucose": 1},
+#             "toxins": {
+#                 "Lead": {"toxicity": 1.0, "min_safe_density": 0.0, "max_safe_density": 0.4, "lethal_density": 0.6}
+#             }
+#         }
+#     ]
+# }
+#
+
+# Built in presets, one file per scenario
+PRESET_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scenarios")
+
+SCENARIO_KEYS = {"title", "description", "resources", "resource_refresh_rate", "microbes"}
+MICROBE_KEYS = {"name", "initial_population", "growth_rate", "required_resources", "produced_resources", "toxins"}
+TOXIN_KEYS = ("toxicity", "min_safe_density", "max_safe_density", "lethal_density")
+
+class ScenarioError(ValueError):
+    def __init__(self, problems, source=None):
+        """Raised when a scenario does not follow the schema, listing every problem found"""
+
+        self.problems = list(problems)
+        self.source = source
+
+        where = f" in {source}" if source else ""
+        super().__init__(f"Invalid scenario{where}:\n  " + "\n  ".join(self.problems))
+
+#
+# --- VALIDATION ---
+#
+
+def validate_scenario(scenario, source=None):
+    """Check a scenario against the schema and return a normalized copy
+
+    Missing optional entries are filled in (refresh rates of 0, no produced
+    resources, no toxins) and every number becomes a float. Raises ScenarioError
+    with every problem found, not just the first.
+    """
+
+    problems = []
+
+    if not isinstance(scenario, dict):
+        raise ScenarioError(["a scenario must be an object"], source)
+
+    for key in scenario:
+        if key not in SCENARIO_KEYS:
+            problems.append(f"unknown entry '{key}'")
+
+    # Resources and refresh rates
+    resources = _number_table(scenario.get("resources", {}), "resources", problems, minimum=0)
+    refresh_rates = _number_table(scenario.get("resource_refresh_rate", {}), "resource_refresh_rate", problems)
+
+    for res in refresh_rates:
+        if res not in resources:
+            problems.append(f"resource_refresh_rate.{res}: not one of the resources")
+
+    normalized = {
+        "title": str(scenario.get("title", "")),
+        "resources": resources,
+        "resource_refresh_rate": {res: refresh_rates.get(res, 0.0) for res in resources},
+        "microbes": [],
+    }
+    if "description" in scenario:
+        normalized["description"] = str(scenario["description"])
+
+    # Microbes
+    microbes = scenario.get("microbes", [])
+    if not isinstance(microbes, list):
+        problems.append("microbes: must be a list")
+        microbes = []
+
+    names = set()
+    for i, microbe in enumerate(microbes):
+        normalized["microbes"].append(_validate_microbe(microbe, f"microbes[{i}]", resources, names, problems))
+
+    if problems:
+        raise ScenarioError(problems, source)
+
+    return normalized
+
+def _validate_microbe(microbe, path, resources, names, problems):
+    """Check one microbe entry and return its normalized form"""
+
+    if not isinstance(microbe, dict):
+        problems.append(f"{path}: must be an object")
+        return {}
+
+    for key in microbe:
+        if key not in MICROBE_KEYS:
+            problems.append(f"{path}: unknown entry '{key}'")
+
+    name = microbe.get("name")
+    if not isinstance(name, str) or not name:
+        problems.append(f"{path}.name: must be a non-empty string")
+    elif name in names:
+        problems.append(f"{path}.name: '{name}' is used by more than one microbe")
+    else:
+        names.add(name)
+        path = f"{path} ({name})"
+
+    normalized = {
+        "name": name,
+        "initial_population": _number(microbe.get("initial_population"), f"{path}.initial_population", problems, minimum=0),
+        "growth_rate": _number(microbe.get("growth_rate"), f"{path}.growth_rate", problems),
+        "required_resources": _number_table(microbe.get("required_resources", {}), f"{path}.required_resources",
+                                            problems, minimum=0, known=resources),
+        "produced_resources": _number_table(microbe.get("produced_resources", {}), f"{path}.produced_resources",
+                                            problems, minimum=0, known=resources),
+        "toxins": {},
+    }
+
+    # Carrying capacity is the minimum over the required resources, so there has to be one
+    if isinstance(microbe.get("required_resources", {}), dict) and not normalized["required_resources"]:
+        problems.append(f"{path}.required_resources: must require at least one resource")
+
+    toxins = microbe.get("toxins", {})
+    if not isinstance(toxins, dict):
+        problems.append(f"{path}.toxins: must be an object")
+        toxins = {}
+
+    for res, thresholds in toxins.items():
+        toxin_path = f"{path}.toxins.{res}"
+        if res not in resources:
+            problems.append(f"{toxin_path}: not one of the resources")
+        if not isinstance(thresholds, dict):
+            problems.append(f"{toxin_path}: must be an object")
+            continue
+
+        for key in thresholds:
+            if key not in TOXIN_KEYS:
+                problems.append(f"{toxin_path}: unknown entry '{key}'")
+
+        toxin = {key: _number(thresholds.get(key), f"{toxin_path}.{key}", problems) for key in TOXIN_KEYS}
+        if None not in toxin.values():
+            if not toxin["min_safe_density"] <= toxin["max_safe_density"] <= toxin["lethal_density"]:
+                problems.append(f"{toxin_path}: needs min_safe_density <= max_safe_density <= lethal_density")
+        normalized["toxins"][res] = toxin
+
+    return normalized
+
+def _number(value, path, problems, minimum=None):
+    """A finite number as a float, or None after logging the problem"""
+
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        problems.append(f"{path}: must be a number" if value is not None else f"{path}: missing")
+        return None
+
+    if minimum is not None and value < minimum:
+        problems.append(f"{path}: must be at least {minimum}")
+        return None
+
+    return float(value)
+
+def _number_table(table, path, problems, minimum=None, known=None):
+    """A name to number object, checking the names against known if given"""
+
+    if not isinstance(table, dict):
+        problems.append(f"{path}: must be an object")
+        return {}
+
+    numbers = {}
+    for name, value in table.items():
+        if known is not None and name not in known:
+            problems.append(f"{path}.{name}: not one of the resources")
+        numbers[name] = _number(value, f"{path}.{name}", problems, minimum)
+
+    return numbers
+
+#
+# --- LOADING ---
+#
+
+def parse_scenario(data, fmt="json", source=None):
+    """Read and validate a scenario from the bytes of a JSON or TOML file"""
+
+    if fmt == "toml" and tomllib is None:
+        raise ScenarioError(["reading TOML needs Python 3.11 or the tomli package"], source)
+
+    try:
+        if fmt == "toml":
+            scenario = tomllib.loads(data.decode("utf-8"))
+        else:
+            scenario = json.loads(data)
+    except ValueError as error:
+        raise ScenarioError([f"could not be parsed: {error}"], source) from error
+
+    return validate_scenario(scenario, source)
+
+def load_scenario(path):
+    """Read and validate a scenario file, .toml files are read as TOML and anything else as JSON
+
+    The validated scenario is cached by the hash of the file like compile_file,
+    and every call returns its own copy.
+    """
+
+    data, key = _read(path)
+    return copy.deepcopy(_cached(_loaded, key, lambda: parse_scenario(data, key[1], path)))
+
+def preset_names():
+    """Names of the built in presets"""
+
+    return sorted(name[:-len(".json")] for name in os.listdir(PRESET_DIR) if name.endswith(".json"))
+
+def preset_path(name):
+    """File of a built in preset"""
+
+    path = os.path.join(PRESET_DIR, name + ".json")
+    if not os.path.exists(path):
+        raise KeyError(f"Unknown preset '{name}'")
+    return path
+
+def load_preset(name):
+    """Read one of the built in presets"""
+
+    return load_scenario(preset_path(name))
+
+#
+# --- COMPILING ---
+#
+
+# Validated and compiled scenarios by the SHA-256 and format of the file they
+# came from, at most CACHE_SIZE of each, the most recently used last
+CACHE_SIZE = 64
+_loaded = OrderedDict()
+_compiled = OrderedDict()
+_cache_lock = threading.Lock()
+
+def compile_scenario(scenario):
+    """Turn a validated scenario into (ModelArrays, populations, resources)"""
+
+    resources = scenario.get("resources", {})
+    refresh_rates = scenario.get("resource_refresh_rate", {})
+    resource_names = list(resources)
+
+    model = ModelArrays.empty(resource_names, [refresh_rates.get(res, 0) for res in resource_names])
+    for microbe in scenario.get("microbes", []):
+        model.add_microbe(microbe["name"], microbe["growth_rate"], microbe.get("required_resources", {}),
+                          microbe.get("produced_resources", {}), microbe.get("toxins", {}))
+
+    # Build the cached structure now, so copies of a compiled model start with it
+    model.competition_matrix()
+    model.toxin_table()
+
+    populations = np.array([microbe["initial_population"] for microbe in scenario.get("microbes", [])], dtype=np.float64)
+    amounts = np.array([resources[res] for res in resource_names], dtype=np.float64)
+    return model, populations, amounts
+
+def compile_file(path):
+    """Load, validate and compile a scenario file, reusing earlier work on the same content
+
+    The compiled form is cached by the hash of the file, so loading an unchanged file
+    again skips parsing, validation and compiling. Every call returns its own copy,
+    since engines edit their model when microbes are added or removed.
+    """
+
+    data, key = _read(path)
+    scenario = _cached(_loaded, key, lambda: parse_scenario(data, key[1], path))
+    model, populations, resources = _cached(_compiled, key, lambda: compile_scenario(scenario))
+    return copy.deepcopy(model), populations.copy(), resources.copy()
+
+def clear_compiled_cache():
+    """Forget every validated and compiled scenario"""
+
+    with _cache_lock:
+        _loaded.clear()
+        _compiled.clear()
+
+def engine_from_scenario(scenario, history_dtype=np.float64):
+    """Build a VectorEngine at the starting state of a scenario dict"""
+
+    model, populations, resources = compile_scenario(validate_scenario(scenario))
+    return VectorEngine(model, populations, resources, history_dtype)
+
+def engine_from_file(path, history_dtype=np.float64):
+    """Build a VectorEngine at the starting state of a scenario file"""
+
+    model, populations, resources = compile_file(path)
+    return VectorEngine(model, populations, resources, history_dtype)
+
+def _read(path):
+    """The bytes of a scenario file and the key they are cached by"""
+
+    with open(path, "rb") as file:
+        data = file.read()
+    return data, (hashlib.sha256(data).hexdigest(), _format_of(path))
+
+def _cached(cache, key, make):
+    """cache[key], calling make() for it first if needed, and dropping the least recently used past CACHE_SIZE"""
+
+    with _cache_lock:
+        value = cache.get(key)
+        if value is None:
+            value = cache[key] = make()
+            while len(cache) > CACHE_SIZE:
+                cache.popitem(last=False)
+        cache.move_to_end(key)
+        return value
+
+def _format_of(path):
+    return "toml" if str(path).lower().endswith(".toml") else "json"
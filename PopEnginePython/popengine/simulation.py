@@ -0,0 +1,530 @@
+import multiprocessing
+import os
+import re
+
+import numpy as np
+
+from .checkpoint import read_checkpoint, save_checkpoint
+from .engine import ModelArrays, PeriodicOrbit, VectorEngine
+from .history import ArrayHistory, ColumnHistory, DiskHistory, padded_history
+from .model import Environment, Microbe, advance, can_advance
+from .scenario import load_preset, validate_scenario
+
+#
+# --- SIMULATION ---
+#
+
+# Ways a Simulation can compute its steps
+BACKENDS = ("vector", "reference")
+
+class Simulation:
+    def __init__(self, env=None, microbes=None, backend="vector"):
+        """An Environment and its Microbes, advanced by a selectable backend
+
+        The objects stay the source of truth. Front ends can edit populations,
+        resources, refresh rates, growth rates and the list of microbes between steps,
+        and read every history straight from the objects.
+
+        The "reference" backend steps the objects in pure Python. The "vector" backend
+        runs a VectorEngine and copies the new state back after each call. The
+        histories of the objects are views of the engine's history tables, so they
+        are never copied. Microbes and resources added or removed between steps are
+        added to or removed from the engine, which is only rebuilt when microbes were
+        reordered or resources removed.
+
+        Every simulation keeps its own state, so any number of them can run side by
+        side in one process, or in a pool with run_many.
+        """
+
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend '{backend}', expected one of {', '.join(BACKENDS)}")
+
+        self.backend = backend
+
+        # Where histories are kept on disk, set by store_history
+        self._disk = None
+        self._disk_files = 0
+
+        # Exporters streaming every step, see add_exporter
+        self._exporters = []
+
+        # Counts the resets, so clients holding old history can tell it was replaced
+        self.generation = -1
+
+        self.reset(env, microbes)
+
+    @classmethod
+    def from_scenario(cls, scenario, backend="vector"):
+        """Start a simulation from a scenario dict"""
+
+        return cls._from_validated(validate_scenario(scenario), backend)
+
+    @classmethod
+    def from_preset(cls, name, backend="vector"):
+        """Start a simulation from one of the built in presets"""
+
+        # Presets come out of load_preset validated already
+        return cls._from_validated(load_preset(name), backend)
+
+    @classmethod
+    def _from_validated(cls, scenario, backend="vector"):
+        env = Environment(
+            initial_resources=scenario["resources"],
+            resource_refresh_rate=scenario["resource_refresh_rate"]
+        )
+        microbes = [Microbe(**microbe) for microbe in scenario["microbes"]]
+        return cls(env, microbes, backend)
+
+    @classmethod
+    def from_snapshot(cls, snapshot, backend="vector"):
+        """Rebuild a simulation from the dict snapshot() returned"""
+
+        env = Environment(
+            initial_resources=dict(snapshot["resources"]),
+            resource_refresh_rate=dict(snapshot["resource_refresh_rate"])
+        )
+        env.resource_history = {res: _copy_history(values) for res, values in snapshot["resource_history"].items()}
+
+        microbes = []
+        for state in snapshot["microbes"]:
+            microbe = Microbe(
+                name=state["name"],
+                initial_population=state["population"],
+                growth_rate=state["growth_rate"],
+                required_resources=dict(state["required_resources"]),
+                produced_resources=dict(state["produced_resources"]),
+                toxins={res: dict(toxin) for res, toxin in state["toxins"].items()}
+            )
+            microbe.pop_history = _copy_history(state["pop_history"])
+            microbe.k_history = _copy_history(state["k_history"])
+            microbes.append(microbe)
+
+        simulation = cls(backend=backend)
+        simulation.reset(env, microbes, snapshot["step"])
+        return simulation
+
+    @classmethod
+    def load_checkpoint(cls, path, backend=None):
+        """Resume a simulation saved with save_checkpoint
+
+        The histories stay memory-mapped from the file and only the steps run after
+        loading are kept in memory. Saving to the same path again is safe, since the
+        new file replaces the old one instead of being written into it.
+        """
+
+        state = read_checkpoint(path)
+        return cls.from_snapshot(state, backend or state["backend"])
+
+    def resume(self, path):
+        """Continue from a checkpoint in place of the current state"""
+
+        loaded = Simulation.load_checkpoint(path, self.backend)
+        self.reset(loaded.env, loaded.microbes, loaded.current_step)
+
+    def save_checkpoint(self, path):
+        """Write the whole state and every history to a binary checkpoint file"""
+
+        save_checkpoint(self, path)
+
+    def reset(self, env=None, microbes=None, current_step=0):
+        """Start over with another Environment and Microbes, or an empty simulation if none are given"""
+
+        if env is None:
+            env = Environment(initial_resources={}, resource_refresh_rate={})
+
+        self.env = env
+        self.microbes = microbes if microbes is not None else []
+        self.current_step = current_step
+        self.generation += 1
+
+        # Where the last fast forward settled or started cycling, see fast_forward
+        self.equilibrium_step = None
+        self.orbit = None
+
+        # Vector backend state, the structure it was built for and the microbes of its columns
+        self._engine = None
+        self._structure = None
+        self._engine_microbes = []
+
+        # Exporters carry on from the new state in a new part
+        for exporter in self._exporters:
+            exporter.start(self)
+
+    @property
+    def version(self):
+        """Changes with every step and every reset, so it names the state of the histories
+
+        Microbes and resources added or removed between steps do not change it.
+        """
+
+        return (self.generation, self.current_step)
+
+    def load_scenario(self, scenario):
+        """Start over from a scenario dict"""
+
+        loaded = Simulation.from_scenario(scenario)
+        self.reset(loaded.env, loaded.microbes)
+
+    def load_preset(self, name):
+        """Start over from one of the built in presets"""
+
+        loaded = Simulation._from_validated(load_preset(name))
+        self.reset(loaded.env, loaded.microbes)
+
+    def snapshot(self, as_arrays=False):
+        """The whole state and history as plain lists and dicts
+
+        The snapshot shares nothing with the simulation, so it can be kept while the
+        simulation runs on, pickled to another process or written out as JSON. With
+        as_arrays, every history is a float64 array instead of a list, which is far
+        quicker to take and pickles far smaller.
+        """
+
+        copy = _history_array if as_arrays else _history_list
+        return {
+            "step": self.current_step,
+            "resources": dict(self.env.resources),
+            "resource_refresh_rate": dict(self.env.resource_refresh_rate),
+            "resource_history": {res: copy(values) for res, values in self.env.resource_history.items()},
+            "microbes": [
+                {
+                    "name": microbe.name,
+                    "population": microbe.population,
+                    "growth_rate": microbe.growth_rate,
+                    "required_resources": dict(microbe.required_resources),
+                    "produced_resources": dict(microbe.produced_resources),
+                    "toxins": {res: dict(toxin) for res, toxin in microbe.toxins.items()},
+                    "pop_history": copy(microbe.pop_history),
+                    "k_history": copy(microbe.k_history),
+                }
+                for microbe in self.microbes
+            ],
+        }
+
+    def store_history(self, directory, retain=None, chunk=1 << 20):
+        """Keep every history in memory-mapped files under directory from now on
+
+        The histories become DiskHistory objects, written chunk values at a time, and
+        the vector backend hands its history over every chunk steps so it never holds
+        more than that in memory. With retain, only the last retain steps are kept on
+        disk. Files of microbes that are removed are left in the directory.
+        """
+
+        os.makedirs(directory, exist_ok=True)
+        self._disk = {"directory": directory, "retain": retain, "chunk": chunk}
+        self._spill_histories()
+
+        # The objects hold the history now, the next engine only keeps a chunk of it
+        self._engine = None
+
+    def add_microbe(self, microbe):
+        """Add a microbe mid-run, its history reads NaN until the current step"""
+
+        self.microbes.append(microbe)
+        self._pad_new_histories()
+
+    def step(self):
+        """Advance one time step, returning 1 if it was taken or 0 if every resource has run out"""
+
+        return self.run(1)
+
+    def run(self, steps):
+        """Advance up to steps time steps, returning how many were taken
+
+        Like the website always has, the simulation stops once every resource has
+        run out, since nothing can change after that.
+        """
+
+        taken = 0
+        block = self._block_steps()
+        self._pad_new_histories()
+
+        if self.backend == "reference":
+            while taken < steps and can_advance(self.env):
+                advance(self.env, self.microbes)
+                taken += 1
+                self.current_step += 1
+
+                if block is not None and taken % block == 0:
+                    self._finish_block()
+        else:
+            engine = self._sync_engine()
+            while taken < steps and np.any(engine.resources > 0):
+                engine.step()
+                taken += 1
+                self.current_step += 1
+
+                # Hand each block over to disk histories and exporters as it fills up
+                if block is not None and engine.current_step - engine.synced_steps >= block:
+                    engine = self._hand_over(engine)
+
+            engine.write_back(self.env, self.microbes)
+
+        self._finish_block()
+        return taken
+
+    def fast_forward(self, steps):
+        """Run steps time steps, skipping ahead once the state settles or cycles
+
+        Only the vector backend can skip, the reference backend simply runs the steps.
+        Returns the step the state settled at, also kept in equilibrium_step, or None
+        if it never settled. current_step tells how many steps were taken. A cycle it
+        found is kept in orbit, a PeriodicOrbit whose amplitudes follow the order of
+        microbes and env.resources.
+        """
+
+        self.equilibrium_step = None
+        self.orbit = None
+        if self.backend == "reference" or not can_advance(self.env):
+            self.run(steps)
+            return None
+
+        # Split into blocks like run, when histories are kept on disk or exported
+        block = self._block_steps() or steps
+
+        self._pad_new_histories()
+        engine = self._sync_engine()
+        taken = 0
+        while taken < steps:
+            start = engine.current_step
+            settled = engine.fast_forward(min(block, steps - taken))
+
+            if engine.current_step == start:
+                break
+
+            # Later blocks only find the same state again, so the first find is kept.
+            # The engine counts from where it was built, the simulation from its start
+            if self.equilibrium_step is None and settled is not None:
+                self.equilibrium_step = self.current_step + settled - start
+            if self.orbit is None and engine.orbit is not None:
+                orbit = engine.orbit
+                self.orbit = PeriodicOrbit(self.current_step + orbit.start_step - start, orbit.period,
+                                           orbit.population_amplitude, orbit.resource_amplitude)
+
+            taken += engine.current_step - start
+            self.current_step += engine.current_step - start
+
+            engine = self._hand_over(engine)
+
+        return self.equilibrium_step
+
+    def add_exporter(self, exporter):
+        """Stream every step from now on to a StreamExporter, returning it"""
+
+        exporter.start(self)
+        self._exporters.append(exporter)
+        return exporter
+
+    def remove_exporter(self, exporter):
+        """Stop streaming to an exporter, writing out and closing it"""
+
+        self._exporters.remove(exporter)
+        exporter.collect(self)
+        exporter.close()
+
+    def _block_steps(self):
+        """Steps the engine may run before handing its history over, None for no limit"""
+
+        sizes = [exporter.buffer_steps for exporter in self._exporters]
+        if self._disk is not None:
+            sizes.append(self._disk["chunk"])
+        return min(sizes, default=None)
+
+    def _hand_over(self, engine):
+        """Copy the engine's state to the objects, and its history too if it is kept on disk
+
+        With disk histories a fresh engine is started, so it never holds more than a block.
+        """
+
+        engine.write_back(self.env, self.microbes)
+        self._finish_block()
+
+        if self._disk is None:
+            return engine
+
+        # The objects hold the history now, so the engine can start again without it
+        self._engine = None
+        return self._sync_engine()
+
+    def _finish_block(self):
+        """Move new history to disk and hand new steps to the exporters"""
+
+        self._spill_histories()
+        for exporter in self._exporters:
+            exporter.collect(self)
+
+    def _spill_histories(self):
+        """Move any history still held in memory into a DiskHistory, if histories are kept on disk"""
+
+        if self._disk is None:
+            return
+
+        for microbe in self.microbes:
+            microbe.pop_history = self._disk_history(microbe.pop_history, "pop", microbe.name)
+            microbe.k_history = self._disk_history(microbe.k_history, "k", microbe.name)
+
+        history = self.env.resource_history
+        for res in history:
+            history[res] = self._disk_history(history[res], "resource", res)
+
+    def _disk_history(self, values, kind, name):
+        """values as a DiskHistory, in a new file unless it already is one"""
+
+        if isinstance(values, DiskHistory):
+            return values
+
+        # A counter keeps files apart, the name is only there to tell them apart by eye
+        self._disk_files += 1
+        filename = f"{self._disk_files:04d}_{kind}_{re.sub(r'[^A-Za-z0-9_-]', '_', str(name))}"
+
+        history = DiskHistory(os.path.join(self._disk["directory"], filename), chunk=self._disk["chunk"],
+                              retain=self._disk["retain"])
+        history.extend(np.asarray(values, dtype=np.float64))
+        return history
+
+    def _pad_new_histories(self):
+        """Start the histories of microbes and resources added since the last step at the current step
+
+        Before they joined, microbes read NaN and resources 0, like the columns of the
+        vector engine. The padding is not stored, so adding one costs the same however
+        long the run has been going.
+        """
+
+        history = self.env.resource_history
+        logged = max([len(values) for values in history.values()]
+                     + [len(microbe.pop_history) for microbe in self.microbes], default=0)
+        if not logged:
+            return
+
+        for microbe in self.microbes:
+            if not len(microbe.pop_history):
+                microbe.pop_history = padded_history(np.nan, logged)
+            if not len(microbe.k_history):
+                microbe.k_history = padded_history(np.nan, logged)
+
+        for res in self.env.resources:
+            if res not in history:
+                history[res] = padded_history(0.0, logged)
+
+    def _sync_engine(self):
+        """The vector engine, built or updated with whatever was edited since the last call"""
+
+        structure = self._structure_key()
+        if self._engine is None or (structure != self._structure and not self._edit_engine(structure)):
+            self._engine = VectorEngine.from_objects(self.env, self.microbes)
+        self._structure = structure
+        self._engine_microbes = list(self.microbes)
+
+        # Disk histories are handed the steps in blocks instead
+        if self._disk is None:
+            self._engine.bind(self.env, self.microbes)
+
+        # Values that can be edited without changing the structure
+        engine = self._engine
+        resource_names = engine.model.resource_names
+        engine.populations = np.array([microbe.population for microbe in self.microbes], dtype=np.float64)
+        engine.resources = np.array([self.env.resources[res] for res in resource_names], dtype=np.float64)
+        engine.model.growth_rates = np.array([microbe.growth_rate for microbe in self.microbes], dtype=np.float64)
+        engine.model.refresh_rates = np.array([self.env.resource_refresh_rate.get(res, 0) for res in resource_names],
+                                              dtype=np.float64)
+        return engine
+
+    def _edit_engine(self, structure):
+        """Add and remove the engine's microbes and resources to match the objects
+
+        Returns False when that is not possible, because resources were removed or
+        microbes reordered, and the engine has to be rebuilt.
+        """
+
+        engine = self._engine
+        resources = list(self.env.resources)
+        known = engine.model.resource_names
+        if resources[:len(known)] != known:
+            return False
+
+        # Microbes can be removed anywhere, but only added at the end
+        present = set(map(id, self.microbes))
+        kept = [microbe for microbe in self._engine_microbes if id(microbe) in present]
+        if any(a is not b for a, b in zip(kept, self.microbes)):
+            return False
+
+        for i in reversed(range(len(self._engine_microbes))):
+            microbe = self._engine_microbes[i]
+            if id(microbe) in present:
+                continue
+
+            # Keep what a removed microbe logged, its column is about to go
+            for field in ("pop_history", "k_history"):
+                values = getattr(microbe, field)
+                if isinstance(values, ColumnHistory):
+                    setattr(microbe, field, values.copy())
+            engine.remove_microbe_at(i)
+
+        for res in resources[len(known):]:
+            engine.add_resource(res, self.env.resources[res], self.env.resource_refresh_rate.get(res, 0))
+
+        for microbe in self.microbes[len(kept):]:
+            engine.add_microbe(microbe.name, microbe.population, microbe.growth_rate, microbe.required_resources,
+                               microbe.produced_resources, microbe.toxins)
+
+        # Microbes that were kept but now require, produce or are poisoned by something else
+        before = dict(zip(map(id, self._engine_microbes), self._structure[1]))
+        if any(before[id(microbe)] != part for microbe, part in zip(kept, structure[1])):
+            engine.model = ModelArrays.from_objects(self.env, self.microbes)
+
+        return True
+
+    def _structure_key(self):
+        """Everything that needs a new ModelArrays when it changes"""
+
+        return (
+            tuple(self.env.resources),
+            tuple(
+                (
+                    microbe.name,
+                    tuple(microbe.required_resources.items()),
+                    tuple(microbe.produced_resources.items()),
+                    tuple((res, tuple(toxin.items())) for res, toxin in microbe.toxins.items()),
+                )
+                for microbe in self.microbes
+            ),
+        )
+
+def _copy_history(values):
+    """A copy of a history for another simulation, sharing the memory-mapped part of loaded histories"""
+
+    if isinstance(values, ArrayHistory):
+        return values.copy()
+    return list(values)
+
+def _history_list(values):
+    """A history as a list of floats"""
+
+    if isinstance(values, list):
+        return list(values)
+    return np.asarray(values, dtype=np.float64).tolist()
+
+def _history_array(values):
+    """A history as a float64 array of its own"""
+
+    return np.array(values, dtype=np.float64)
+
+#
+# --- POOLS ---
+#
+
+def run_scenario(scenario, steps, backend="vector"):
+    """Run a scenario dict for steps time steps and return the snapshot of the result
+
+    A plain function so it can be handed to a process pool.
+    """
+
+    simulation = Simulation.from_scenario(scenario, backend)
+    simulation.run(steps)
+    return simulation.snapshot()
+
+def run_many(scenarios, steps, processes=None, backend="vector"):
+    """Run every scenario in its own process, returning their snapshots in order"""
+
+    with multiprocessing.Pool(processes) as pool:
+        return pool.starmap(run_scenario, [(scenario, steps, backend) for scenario in scenarios])
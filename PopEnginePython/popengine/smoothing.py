@@ -0,0 +1,72 @@
+import numpy as np
+
+from .history import HistoryBuffer
+
+#
+# --- STREAMING MOVING AVERAGE ---
+#
+
+class StreamingSmoother:
+    def __init__(self, window_sizes=(3,), dtype=np.float64):
+        """Moving averages of one growing series, for one or more window sizes
+
+        Gives the same values as np.convolve(data, np.ones(w)/w, mode='valid') on the
+        whole series, but each update only smooths the points added since the last
+        one. Only the last few raw points are kept between updates.
+        """
+
+        self.window_sizes = tuple(window_sizes)
+        self.kernels = {w: np.ones(w) / w for w in self.window_sizes}
+        self.outputs = {w: HistoryBuffer(1, dtype) for w in self.window_sizes}
+
+        # Raw points seen so far, and the last few needed to finish the next windows
+        self.consumed = 0
+        self.tail = np.empty(0)
+
+    def update(self, data):
+        """Smooth whatever data has gained since the last update
+
+        data is the full series so far. Returns a dict of window size to the newly
+        smoothed points.
+        """
+
+        if len(data) < self.consumed:
+            # The series was replaced rather than extended
+            self.reset()
+
+        new = np.asarray(data[self.consumed:], dtype=np.float64)
+        self.consumed += len(new)
+
+        points = np.concatenate([self.tail, new])
+        emitted = {}
+
+        for w in self.window_sizes:
+            # Windows that end in the new points, each computed the same way as convolve
+            start = max(len(self.tail) - (w - 1), 0)
+            window_points = points[start:]
+            if len(window_points) >= w and len(new):
+                smoothed = np.convolve(window_points, self.kernels[w], mode='valid')
+                smoothed = smoothed[max(len(smoothed) - len(new), 0):]
+            else:
+                smoothed = np.empty(0)
+
+            self.outputs[w].extend(smoothed[:, None])
+            emitted[w] = smoothed
+
+        keep = max(self.window_sizes, default=1) - 1
+        self.tail = points[max(len(points) - keep, 0):]
+        return emitted
+
+    def values(self, window_size=None):
+        """Every smoothed point so far for a window size, as a zero-copy view"""
+
+        if window_size is None:
+            window_size = self.window_sizes[0]
+        return self.outputs[window_size].column(0)
+
+    def reset(self):
+        """Forget the series and everything smoothed from it"""
+
+        self.outputs = {w: HistoryBuffer(1, self.outputs[w].dtype) for w in self.window_sizes}
+        self.consumed = 0
+        self.tail = np.empty(0)
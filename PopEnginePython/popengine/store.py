@@ -0,0 +1,273 @@
+import gzip
+import hashlib
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from .history import ArrayHistory
+from .simulation import Simulation
+
+#
+# --- SIMULATION STORE ---
+#
+# Holds one Simulation per key, such as a website session, with at most capacity
+# of them in memory. The least recently used ones, and any left alone for
+# idle_seconds, are evicted to a gzipped snapshot in directory and loaded again
+# the next time their key is asked for, so memory use depends on the capacity
+# and not on how many keys there are.
+#
+# Keys are checked out while they are used and checked in afterwards. A checked
+# out simulation is never evicted, and its lock lets one thread step it while
+# others wait their turn.
+#
+
+# Fast, the histories compress well anyway
+COMPRESS_LEVEL = 1
+
+class TurnLock:
+    """A lock handed out in the order it was asked for, so one busy thread can not starve the rest"""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._next = 0
+        self._serving = 0
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+    def acquire(self):
+        with self._condition:
+            ticket = self._next
+            self._next += 1
+            self._condition.wait_for(lambda: self._serving == ticket)
+
+    def release(self):
+        with self._condition:
+            self._serving += 1
+            self._condition.notify_all()
+
+class StoredSimulation:
+    """A simulation held by a SimulationStore, with the lock to hold while using it"""
+
+    def __init__(self, simulation):
+        self.simulation = simulation
+        self.lock = TurnLock()
+        self.users = 0
+        self.last_used = time.monotonic()
+
+        # Set once simulation is there, it is still being loaded until then
+        self.ready = threading.Event()
+        if simulation is not None:
+            self.ready.set()
+
+class SimulationStore:
+    def __init__(self, directory, factory, capacity=100, idle_seconds=600):
+        """Simulations by key, at most capacity of them in memory
+
+        factory() makes the simulation for a key that was never seen before.
+        """
+
+        self.directory = directory
+        self.factory = factory
+        self.capacity = capacity
+        self.idle_seconds = idle_seconds
+
+        os.makedirs(directory, exist_ok=True)
+
+        # Most recently used last
+        self._entries = OrderedDict()
+        # Evicted but not yet on disk, first as the StoredSimulation and then as its snapshot
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries or key in self._pending or os.path.exists(self._path(key))
+
+    def checkout(self, key):
+        """The StoredSimulation of key, loaded or made if needed, kept in memory until checked in
+
+        A key that is not in memory gets an entry that is still loading, so the store
+        lock is only held to decide what to load. Reading and rebuilding the simulation
+        happen after it is let go, and anyone else asking for the key waits for them.
+        """
+
+        with self._lock:
+            entry = self._entries.get(key)
+            source = None
+            if entry is None:
+                entry, source = self._start_load(key)
+                self._entries[key] = entry
+            self._entries.move_to_end(key)
+
+            entry.users += 1
+            entry.last_used = time.monotonic()
+
+            evicted = self._choose_evictions()
+
+        self._write(evicted)
+
+        if source is not None:
+            self._finish_load(key, entry, source)
+        else:
+            entry.ready.wait()
+            if entry.simulation is None:
+                raise RuntimeError(f"Loading the simulation of '{key}' failed")
+        return entry
+
+    def checkin(self, key):
+        """Done with key for now, it may be evicted once idle"""
+
+        with self._lock:
+            entry = self._entries[key]
+            entry.users -= 1
+            entry.last_used = time.monotonic()
+
+            evicted = self._choose_evictions()
+
+        self._write(evicted)
+
+    def evict_idle(self):
+        """Evict every simulation left alone for idle_seconds, returning how many were"""
+
+        with self._lock:
+            evicted = self._choose_evictions()
+
+        self._write(evicted)
+        return len(evicted)
+
+    def discard(self, key):
+        """Forget key entirely, in memory and on disk"""
+
+        with self._lock:
+            self._entries.pop(key, None)
+            self._pending.pop(key, None)
+            if os.path.exists(self._path(key)):
+                os.remove(self._path(key))
+
+    def _choose_evictions(self):
+        """Take the simulations to evict out of memory, returning their keys and entries
+
+        Called with the store lock held, so it only decides. Taking the snapshots,
+        compressing and writing them happen in _write after the lock is let go.
+        """
+
+        now = time.monotonic()
+        idle = [key for key, entry in self._entries.items()
+                if entry.users == 0 and now - entry.last_used >= self.idle_seconds]
+
+        # Least recently used first, skipping the ones in use
+        excess = len(self._entries) - len(idle) - self.capacity
+        for key, entry in self._entries.items():
+            if excess <= 0:
+                break
+            if entry.users == 0 and key not in idle:
+                idle.append(key)
+                excess -= 1
+
+        evicted = []
+        for key in idle:
+            entry = self._pending[key] = self._entries.pop(key)
+            evicted.append((key, entry))
+        return evicted
+
+    def _write(self, evicted):
+        for key, entry in evicted:
+            # Nobody has it checked out, but a job that just checked it in may still be finishing
+            with entry.lock:
+                snapshot = entry.simulation.snapshot(as_arrays=True)
+            snapshot["backend"] = entry.simulation.backend
+            snapshot["generation"] = entry.simulation.generation
+
+            with self._lock:
+                # Checked out again while the snapshot was taken
+                if self._pending.get(key) is not entry:
+                    continue
+                self._pending[key] = snapshot
+
+            path = self._path(key)
+            temporary = f"{path}.{id(snapshot)}.tmp"
+            with gzip.open(temporary, "wb", compresslevel=COMPRESS_LEVEL) as file:
+                pickle.dump(snapshot, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+            with self._lock:
+                # Unless the key was loaded again, or evicted again with a newer snapshot, meanwhile
+                if self._pending.get(key) is snapshot:
+                    del self._pending[key]
+                    os.replace(temporary, path)
+                else:
+                    os.remove(temporary)
+
+    def _start_load(self, key):
+        """The entry for a key that is not in memory, and where to load it from
+
+        Called with the store lock held. An entry evicted so recently that it was not
+        even snapshotted yet is simply taken back, with nothing to load.
+        """
+
+        pending = self._pending.pop(key, None)
+        if isinstance(pending, StoredSimulation):
+            return pending, None
+
+        if pending is not None:
+            source = ("snapshot", pending)
+        elif os.path.exists(self._path(key)):
+            source = ("file", self._path(key))
+        else:
+            source = ("new", None)
+        return StoredSimulation(None), source
+
+    def _finish_load(self, key, entry, source):
+        """Load the simulation of an entry from _start_load, without the store lock"""
+
+        try:
+            entry.simulation = self._load(*source)
+        except BaseException:
+            # Nobody can use the entry, drop it so the next checkout tries again
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+            raise
+        finally:
+            entry.ready.set()
+
+    def _load(self, kind, source):
+        """A simulation from a pending snapshot, a snapshot file or the factory"""
+
+        if kind == "new":
+            return self.factory()
+
+        if kind == "file":
+            with gzip.open(source, "rb") as file:
+                snapshot = pickle.load(file)
+            os.remove(source)
+        else:
+            snapshot = source
+
+        # Histories come back as arrays that new steps are added after. A pending
+        # snapshot may still be being written, so it is copied rather than changed
+        snapshot = dict(
+            snapshot,
+            resource_history={res: ArrayHistory(values) for res, values in snapshot["resource_history"].items()},
+            microbes=[
+                dict(microbe, pop_history=ArrayHistory(microbe["pop_history"]), k_history=ArrayHistory(microbe["k_history"]))
+                for microbe in snapshot["microbes"]
+            ],
+        )
+        simulation = Simulation.from_snapshot(snapshot, snapshot["backend"])
+
+        # Still the same histories, so clients holding them need not start over
+        simulation.generation = snapshot["generation"]
+        return simulation
+
+    def _path(self, key):
+        # Hashed, so any key makes a safe file name
+        return os.path.join(self.directory, hashlib.sha256(key.encode("utf-8")).hexdigest() + ".pkl.gz")
@@ -0,0 +1,87 @@
+import numpy as np
+
+#
+# --- TOXICITY KERNEL ---
+#
+
+def toxicity_multipliers(resources, toxicity, min_safe_density, max_safe_density, lethal_density,
+                         has_toxin=None, total_resources=None):
+    """Batched Microbe.calculate_toxicity_multiplier
+
+    The threshold tables are species x resource arrays. resources may have any number
+    of leading batch dimensions (..., R), and the result is (..., S). total_resources can
+    be passed in when the caller already has the per-step resource sum.
+    """
+
+    resources = np.asarray(resources, dtype=np.float64)
+    if has_toxin is None:
+        has_toxin = np.ones(np.shape(toxicity), dtype=bool)
+
+    # Sum the resource pool once for every species
+    if total_resources is None:
+        total_resources = resources.sum(axis=-1)
+    total_resources = np.asarray(total_resources, dtype=np.float64)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Weighted density of every toxin for every species, shape (..., S, R)
+        density = (toxicity * resources[..., None, :]) / total_resources[..., None, None]
+
+        safe = (density <= max_safe_density) & (density >= min_safe_density)
+        lethal = density >= lethal_density
+        below_min = density <= min_safe_density
+
+        # Same precedence as the scalar version: safe, lethal, below minimum, above maximum
+        cur_toxicity = np.select(
+            [~has_toxin | safe, lethal, below_min],
+            [1.0, 0.0, density / min_safe_density],
+            (density - lethal_density) / (max_safe_density - lethal_density),
+        )
+
+    # Most toxic resource wins, and an empty environment supports nothing
+    multipliers = np.min(cur_toxicity, axis=-1, initial=1.0)
+    return np.where(total_resources[..., None] == 0, 0.0, multipliers)
+
+#
+# --- TOXIN TABLE ---
+#
+
+class ToxinTable:
+    def __init__(self, toxicity, min_safe_density, max_safe_density, lethal_density, has_toxin):
+        """Toxin thresholds restricted to the resource columns that are toxic to someone
+
+        Most resources are not a toxin for any species, so the kernel only evaluates the
+        columns listed in self.columns.
+        """
+
+        has_toxin = np.asarray(has_toxin, dtype=bool)
+        self.columns = np.flatnonzero(has_toxin.any(axis=0))
+
+        self.has_toxin = has_toxin[:, self.columns]
+        self.toxicity = np.asarray(toxicity, dtype=np.float64)[:, self.columns]
+        self.min_safe_density = np.asarray(min_safe_density, dtype=np.float64)[:, self.columns]
+        self.max_safe_density = np.asarray(max_safe_density, dtype=np.float64)[:, self.columns]
+        self.lethal_density = np.asarray(lethal_density, dtype=np.float64)[:, self.columns]
+
+    @classmethod
+    def from_model(cls, model):
+        """Build the table from a ModelArrays"""
+
+        return cls(model.toxicity, model.min_safe_density, model.max_safe_density,
+                   model.lethal_density, model.has_toxin)
+
+    def multipliers(self, resources, total_resources=None):
+        """Toxicity multiplier for every species, with the same batching as toxicity_multipliers"""
+
+        resources = np.asarray(resources, dtype=np.float64)
+        if total_resources is None:
+            total_resources = resources.sum(axis=-1)
+
+        return toxicity_multipliers(
+            resources[..., self.columns],
+            self.toxicity,
+            self.min_safe_density,
+            self.max_safe_density,
+            self.lethal_density,
+            has_toxin=self.has_toxin,
+            total_resources=total_resources,
+        )
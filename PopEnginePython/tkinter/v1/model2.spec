@@ -3,7 +3,7 @@
 
 a = Analysis(
     ['model2.py'],
-    pathex=[],
+    pathex=['../..'],
     binaries=[],
     datas=[],
     hiddenimports=['PIL._tkinter_finder'],
@@ -4,310 +4,344 @@ import matplotlib.pyplot as plt
 import numpy as np
 import tkinter as tk
 from tkinter import ttk
-from flask import Flask, render_template, request, redirect, url_for
+from flask import Flask, render_template, request, redirect, url_for, jsonify, Response, g
+from werkzeug.local import LocalProxy
+import base64
+import hashlib
+import io
+import json
 import logging
 import os
+import queue
+import re
+import secrets
+import sys
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# The shared popengine package lives three folders up
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", ".."))
+from popengine.downsample import downsample
+from popengine.export import history_block
+from popengine.history import ArrayHistory, HistoryPyramid, shared_pyramid
+from popengine.model import Microbe
+from popengine.simulation import Simulation
+from popengine.store import SimulationStore
 
 #
-# --- MICROBE CLASS
+# --- GRAPHING ---
 #
 
-class Microbe:
-    def __init__(self, name, initial_population, growth_rate, required_resources, produced_resources, toxins):
-        """Create a new Microbe population with given properties"""
+# Smoothing on graphical representation
+def moving_average(data, window_size):
+    # Microbes added since the last step have nothing to smooth yet
+    if(len(data) < window_size):
+        return np.empty(0)
+    return np.convolve(data, np.ones(window_size)/window_size, mode='valid')
 
-        # Basics required for growth equation
-        self.name = name
-        self.population = initial_population
-        self.growth_rate = growth_rate
-        self.competitors = {}
+# Most points a line is drawn with, about the pixel width of one panel
+MAX_PLOT_POINTS = 600
 
-        # Resources and toxins
-        self.required_resources = required_resources
-        self.produced_resources = produced_resources
-        self.toxins = toxins
+# Min/max/mean pyramids of every history, per simulation and then keyed by the
+# object the history belongs to. They go away with their simulation
+session_pyramids = weakref.WeakKeyDictionary()
 
-        # Carry capacity
-        self.k_resources = {}
+def synced_pyramid(pyramids, key, values):
+    """The pyramid of one history, caught up with the points added since the last call
 
-        # Set up arrays to keep track of history (for graphing :3)
-        self.pop_history = []
-        self.k_history = []
+    Engine and checkpoint histories share one pyramid with everything else that
+    plots them. Other histories get one of their own, built over the list.
+    """
 
-    def compute_growth(self):
-        """Compute growth using the Lotka-Volterra model"""
+    if isinstance(values, ArrayHistory):
+        return shared_pyramid(values)
 
-        # Determine the limiting resource
-        min_k = min(self.k_resources[res] for res in self.required_resources)
+    pyramid = pyramids.get(key)
+    if pyramid is None:
+        pyramid = pyramids[key] = HistoryPyramid(1, values=values)
+    pyramid.track(values)
+    return pyramid
 
-        # Avoid division by zero if resources are depleted
-        if min_k == 0:
-            if(self.population <= 2):
-                return -1 * self.population # Kill population if small enough
-            return self.growth_rate * -0.33 * self.population  # Extinction effect
+def json_values(values):
+    """Floats for JSON, with inf and NaN sent as null"""
+    return [float(v) if np.isfinite(v) else None for v in values]
 
-        # Compute competition effect
-        competition_effect = sum(self.competitors[m] for m in self.competitors)
+#
+# -- SETUP ---
+#
 
-        # Compute the growth
-        growth = self.growth_rate * self.population * (1 - (competition_effect / min_k))
+# Every visitor gets their own simulation, found by a session cookie
+SESSION_COOKIE = "popsim_session"
+SESSION_ID = re.compile(r"[A-Za-z0-9_-]{22}")
 
-        # Prevent overshooting into negative population
-        return max(growth, -self.population)
-    
-    def calculate_toxicity_multiplier(self, env_resources):
-        """Calculate the impact of toxins on microbial growth"""
-
-        # Find total resources 
-        total_resources = sum(env_resources.values())
-
-        if(total_resources == 0):
-            return 0.0
-
-        min_toxicity = 1.0
-
-        for res in self.toxins:
-            # Find weighted density of the current toxin
-            cur_toxin = self.toxins[res]
-            max_safe_density = cur_toxin["max_safe_density"]
-            min_safe_density = cur_toxin["min_safe_density"]
-            lethal_density = cur_toxin["lethal_density"]
-            toxin_weighted_density = (cur_toxin["toxicity"] * env_resources[res]) / total_resources
-
-            # If the density is in the safe range, continue to next toxin
-            if (toxin_weighted_density <= max_safe_density and toxin_weighted_density >= min_safe_density):
-                continue
-            
-            # If the density is lethal, return 0
-            if(toxin_weighted_density >= lethal_density):
-                return 0.0
-            
-            # If the density is between lethal and max safe density, then normalize the toxicity between the two
-            if (toxin_weighted_density >= max_safe_density and toxin_weighted_density <= lethal_density):
-                cur_toxicity = (toxin_weighted_density - lethal_density) / (max_safe_density - lethal_density)
-            
-            # If the density is less than the minimum that is safe, 
-            if(toxin_weighted_density <= min_safe_density):
-                cur_toxicity = (toxin_weighted_density) / (min_safe_density)
-            
-            # Keep track of the most toxic thing (least multiple because it acts as a multiplier)
-            min_toxicity = min(min_toxicity, cur_toxicity)
-
-        return min_toxicity
-
-    def update_population(self, new_pop):
-        """Update the population of a microbe and track the history"""
-
-        self.pop_history.append(self.population)
-        self.population = max(0, self.population + new_pop)
-
-    def add_competitor(self, other_microbe):
-        """Calculate the competition coefficient for another microbe based on shared resources"""
-
-        # Reset competition coefficients to be empty
-        competition_coefficients = []
-
-        # Find the shared resources
-        shared_resources = set(self.required_resources.keys()).intersection(set(other_microbe.required_resources.keys()))
-
-        # Calculate competition coefficient
-        for res in shared_resources:
-            competition_coefficients.append(other_microbe.required_resources[res] / self.required_resources[res])
-
-        # If no competition coefficients, the master competition coefficient is determined to be zero
-        if not competition_coefficients:
-            self.competitors[other_microbe] = 0
-
-        # Otherwise, it's the max of the competition coefficients
-        else:
-            self.competitors[other_microbe] = other_microbe.population * max(competition_coefficients)
-    
-    def produce_consume_resources(self):
-        """Calculate net resource change per time step"""
+# At most this many simulations are kept in memory. The least recently used, and
+# any idle for SESSION_IDLE_SECONDS, are put away in SESSION_DIR until used again
+SESSION_CAPACITY = 100
+SESSION_IDLE_SECONDS = 600
+SESSION_DIR = "./sessions"
 
-        # Dict to keep track of the resource changes
-        resource_change = {}
+store = SimulationStore(SESSION_DIR, lambda: Simulation.from_preset("demo_stable_with_toxins"),
+                        capacity=SESSION_CAPACITY, idle_seconds=SESSION_IDLE_SECONDS)
 
-        # Determine the limiting resource
-        min_k = min(self.k_resources[res] for res in self.required_resources)
+# The simulation of the session the current request belongs to
+simulation = LocalProxy(lambda: g.simulation)
 
-        # Add the consumed resources
-        for res in self.required_resources:
-            resource_change[res] = self.required_resources[res] * min(min_k, self.population) * -1
+# Where the save and load checkpoint buttons keep each session's simulation
+CHECKPOINT_DIR = "./checkpoints"
 
-        # Add the produced resources, adding to dict if necessary
-        for res in self.produced_resources:
-            if res in resource_change:
-                resource_change[res] += self.produced_resources[res] * min(min_k, self.population)
-            else:
-                resource_change[res] = self.produced_resources[res] * min(min_k, self.population)
+def checkpoint_path():
+    return os.path.join(CHECKPOINT_DIR, f"{g.session_id}.popckpt")
 
-        return resource_change
-    
-    def compute_carry_capacity(self, env_resources):
-        """Calculate the carrying capacity based on environmental resources and their toxicity"""
+#
+# --- SIMULATION ---
+#
 
-        # Find minimum toxicity multiplier
-        toxicity_mult = self.calculate_toxicity_multiplier(env_resources)
+def advance_simulation(steps=1):
+    # The shared engine stops on its own once every resource has run out
+    simulation.run(steps)
 
-        # Find the carry capacity
-        for res in env_resources:
-            resource_consumption = self.required_resources.get(res, 0)  # Per microbe consumption
+def history_delta(simulation, since, generation, dtype=np.float64):
+    """What a client holding every step before since of generation is missing
 
-            # If no pop, then k = 0
-            if(self.population == 0):
-                self.k_resources[res] = 0
+    Returns the meta data the client needs and a (steps, columns) array of the new
+    values. After a reset or a new preset the client's samples are stale, so
+    everything is sent again with reset set.
+    """
 
-            # Microbe doesn't use this resource, so no limit
-            elif resource_consumption == 0:
-                self.k_resources[res] = float('inf')
+    reset = generation != simulation.generation or not 0 <= since <= simulation.current_step
+    if(reset):
+        since = 0
 
-            # K = num resouces * toxicity multiplier / resource_consumption
-            else:
-                self.k_resources[res] = (env_resources[res] / resource_consumption) * toxicity_mult
-        
-        # Append the minimum to the history
-        min_k = min(self.k_resources[res] for res in self.required_resources)
-        self.k_history.append(min_k)
+    # Every column but the step number, one row per new step
+    columns, block = history_block(simulation, since, dtype)
+
+    meta = {
+        "generation": simulation.generation,
+        "since": since,
+        "step": simulation.current_step,
+        "reset": reset,
+        "columns": columns[1:],
+    }
+    return meta, block[:, 1:]
 
 #
-# --- ENVIRONMENT CLASS ---
+# --- JOBS ---
 #
 
-class Environment:
-    def __init__(self, initial_resources, resource_refresh_rate):
-        """Initialize the environment with resources and refresh rates"""
+# Fast forwards run on this many worker threads, the rest wait their turn
+JOB_WORKERS = 4
 
-        self.resources = initial_resources
-        self.resource_refresh_rate = resource_refresh_rate
-        self.resource_history = {res: [] for res in initial_resources}
+# Steps a job runs at a time while holding its session, so other requests for
+# the session get answered in between
+JOB_CHUNK = 200
 
-    def update_resource_history(self):
-        """Log and refresh resources over time"""
+# How long a finished job can still be asked about
+JOB_KEEP_SECONDS = 600
 
-        # For all resources
-        for res in self.resources:
-            # Add new resource
-            if res not in self.resource_history:
-                # Create entry
-                self.resource_history[res] = []
+# Most steps one fast forward can ask for, larger amounts are cut down to it
+MAX_FAST_FORWARD = 1000000
 
-                # Backlog history as 0
-                for x in range(hist_len):
-                    self.resource_history[res].append(0)
+job_pool = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="fast-forward")
 
-            hist_len = len(self.resource_history[res])
+# Every job that is queued, running or recently finished, by id
+jobs = {}
+jobs_lock = threading.Lock()
 
-            # Add current resource amount to history
-            self.resource_history[res].append(self.resources[res])
+class FastForwardJob:
+    """A fast forward of one session's simulation, run in chunks on the worker pool"""
 
-            # Get resources from refresh rate
-            self.resources[res] += self.resource_refresh_rate[res]
-            if(self.resources[res] < 0):
-                self.resources[res] = 0
+    def __init__(self, session_id, steps, after_chunk=None):
+        self.id = secrets.token_urlsafe(8)
+        self.session_id = session_id
+        self.steps = steps
+        self.done = 0
+        self.state = "queued"
 
-    def add_resources(self, added_resources):
-        """Add resources that come from outside sources (i.e. Microbes)"""
+        # The step the simulation settled at, or the cycle it fell into, once it has
+        self.equilibrium_step = None
+        self.orbit = None
 
-        for res in added_resources:
-            self.resources[res] += added_resources[res]
+        # Called with the simulation after every chunk, while the session is held
+        self.after_chunk = after_chunk
 
-#
-# --- GRAPHING ---
-#
-
-# Smoothing on graphical representation
-def moving_average(data, window_size):
-    return np.convolve(data, np.ones(window_size)/window_size, mode='valid')
+        self.finished = threading.Event()
+        self.ended = None
+        self._cancelled = threading.Event()
 
-#
-# -- SETUP ---
-#
+    def cancel(self):
+        """Stop after the current chunk, or before the first if it has not started"""
+        self._cancelled.set()
 
-env = Environment(
-    initial_resources={"Oxygen": 2, "Glucose": 2, "Lead": 1},
-    resource_refresh_rate={"Oxygen": 0, "Glucose": 0, "Lead": 1}
-)
-
-microbes = [
-    Microbe(
-        name="O2Eater",
-        initial_population=1,
-        growth_rate=1.2,
-        required_resources={"Oxygen": 1},
-        produced_resources={"Glucose": 1},
-        toxins={
-            "Lead": {"toxicity": 1.0, "min_safe_density": 0.0, "max_safe_density": 0.4, "lethal_density": 0.6}
+    def progress(self):
+        return {
+            "id": self.id,
+            "state": self.state,
+            "steps": self.steps,
+            "done": self.done,
+            "progress": self.done / self.steps if self.steps > 0 else 1.0,
+            "equilibrium_step": self.equilibrium_step,
+            "orbit": self.orbit,
         }
-    ),
-    Microbe(
-        name="GlucoseEater",
-        initial_population=1,
-        growth_rate=1.2,
-        required_resources={"Glucose": 1},
-        produced_resources={"Oxygen": 1},
-        toxins={}
-    ),
-    Microbe(
-        name="LeadEater",
-        initial_population=1,
-        growth_rate=1.2,
-        required_resources={"Lead": 1},
-        produced_resources={},
-        toxins={}
-    ),
-]
+
+    def run(self):
+        stored = store.checkout(self.session_id)
+        try:
+            self.state = "running"
+            while self.done < self.steps and not self._cancelled.is_set():
+                with stored.lock:
+                    simulation = stored.simulation
+                    start = simulation.current_step
+                    settled = simulation.fast_forward(min(JOB_CHUNK, self.steps - self.done))
+                    taken = simulation.current_step - start
+                    self.done += taken
+
+                    # Later chunks only settle, or cycle, where the first one did
+                    if(self.equilibrium_step is None):
+                        self.equilibrium_step = settled
+                    if(self.orbit is None and simulation.orbit is not None):
+                        self.orbit = orbit_json(simulation)
+
+                    if(self.after_chunk is not None):
+                        self.after_chunk(simulation)
+
+                # Every resource has run out
+                if(taken == 0):
+                    break
+
+            self.state = "cancelled" if self._cancelled.is_set() else "finished"
+        except Exception:
+            self.state = "failed"
+            app.logger.exception("Fast forward job %s failed", self.id)
+        finally:
+            store.checkin(self.session_id)
+            self.ended = time.monotonic()
+            self.finished.set()
+
+def orbit_json(simulation):
+    """The cycle the last fast forward found, with every amplitude by name"""
+
+    orbit = simulation.orbit
+    return {
+        "start_step": orbit.start_step,
+        "period": orbit.period,
+        "population_amplitude": dict(zip([microbe.name for microbe in simulation.microbes],
+                                         orbit.population_amplitude.tolist())),
+        "resource_amplitude": dict(zip(simulation.env.resources, orbit.resource_amplitude.tolist())),
+    }
+
+def fast_forward_amount(steps):
+    """The steps a fast forward asked for, at most MAX_FAST_FORWARD, or None if it asked for none"""
+
+    if(steps is None or steps <= 0):
+        return None
+    return min(steps, MAX_FAST_FORWARD)
+
+def submit_job(job):
+    """Queue a job, unless its session already has one queued or running. Returns whether it was queued"""
+
+    with jobs_lock:
+        # Forget jobs that finished a while ago
+        now = time.monotonic()
+        for job_id in [job_id for job_id, old in jobs.items() if old.ended is not None and now - old.ended > JOB_KEEP_SECONDS]:
+            del jobs[job_id]
+
+        # One at a time per session, so no visitor can take every worker
+        if(any(old.session_id == job.session_id and not old.finished.is_set() for old in jobs.values())):
+            return False
+
+        jobs[job.id] = job
+    job_pool.submit(job.run)
+    return True
+
+def session_job(job_id):
+    """The job with job_id if it belongs to the current session"""
+
+    job = jobs.get(job_id)
+    if(job is None or job.session_id != g.session_id):
+        return None
+    return job
 
 #
-# --- SIMULATION ---
+# --- STREAMING ---
 #
 
-def advance_simulation():
-    global current_step
-
-    if(len(env.resources) == 0):
-        return
-
-    resCounter = 0
-    for res in env.resources:
-        if env.resources[res] > 0:
-            resCounter += 1
-    
-    if(resCounter == 0):
-        return
-
-    # Begin the simulation
-    if(len(microbes) != 0):
-        # Calculate competition coefficients at every time step because population is part of the calculations
-        for m1 in microbes:
-            m1.competitors = {}
-            for m2 in microbes:
-                m1.add_competitor(m2)
-
-        total_resource_usage = {}
-
-        # Process each microbe
-        for microbe in microbes:
-            # Get carry capacity of microbe
-            microbe.compute_carry_capacity(env.resources)
-
-            # Get resource changes due to microbe
-            net_resource_usage = microbe.produce_consume_resources()
-            for resource in net_resource_usage:
-                if resource in total_resource_usage:
-                    total_resource_usage[resource] += net_resource_usage[resource]
-                else:
-                    total_resource_usage[resource] = net_resource_usage[resource]
-
-            # Calculate new microbe population
-            pop_change = microbe.compute_growth()
-            microbe.update_population(pop_change)
-
-    # Log resource history
-    env.add_resources(total_resource_usage)
-    env.update_resource_history()
-
-    current_step += 1
+# Most frames a second a step stream sends, unless the client asks for fewer
+STREAM_FPS = 20
+
+class StepStream:
+    """A fast forward job, sent as Server-Sent Events while it runs
+
+    The simulation never waits on the client. At most fps times a second the steps
+    taken since the last frame are handed over as one frame, so a slow client just
+    gets fewer, larger frames.
+    """
+
+    def __init__(self, session_id, steps, since=0, generation=-1, fps=STREAM_FPS):
+        self.session_id = session_id
+        self.since = since
+        self.generation = generation
+        self.fps = fps
+        self.job = FastForwardJob(session_id, steps, after_chunk=self._after_chunk)
+
+        self._wanted = threading.Event()
+        self._frames = queue.Queue(maxsize=1)
+
+    def events(self):
+        """The event stream: a history event per frame, then a done event with the job's progress
+
+        The job has to have been submitted already.
+        """
+
+        # Keep the simulation in memory while the stream runs
+        self._stored = store.checkout(self.session_id)
+        try:
+            while not self.job.finished.wait(1 / self.fps):
+                self._wanted.set()
+                frame = self._next_frame()
+                if(frame is not None):
+                    yield frame
+
+            # The job is done, so the rest can be read here
+            with self._stored.lock:
+                frame = self._frame(self._stored.simulation)
+            yield frame
+            yield f"event: done\ndata: {json.dumps(self.job.progress())}\n\n"
+        finally:
+            # Stops the job early if the client went away
+            self.job.cancel()
+            self.job.finished.wait()
+            store.checkin(self.session_id)
+
+    def _after_chunk(self, simulation):
+        # The histories are only read between chunks, on the job's thread
+        if(self._wanted.is_set()):
+            self._wanted.clear()
+            self._frames.put(self._frame(simulation))
+
+    def _next_frame(self):
+        while True:
+            try:
+                return self._frames.get(timeout=0.05)
+            except queue.Empty:
+                if(self.job.finished.is_set()):
+                    # A frame may have been put just before the job finished
+                    try:
+                        return self._frames.get_nowait()
+                    except queue.Empty:
+                        return None
+
+    def _frame(self, simulation):
+        """One history event with every step since the last one, as base64 float32 columns"""
+
+        meta, values = history_delta(simulation, self.since, self.generation, np.float32)
+        self.since = meta["step"]
+        self.generation = meta["generation"]
+
+        meta["values"] = base64.b64encode(np.ascontiguousarray(values.T).tobytes()).decode("ascii")
+        return f"event: history\ndata: {json.dumps(meta)}\n\n"
 
 #
 # --- GRAPHING ---
@@ -315,21 +349,36 @@ def advance_simulation():
 
 # Create the plot
 fig, ax = plt.subplots(1, 3, figsize=(18, 5))
-current_step = 0
+plot_lock = threading.Lock()
+
+# What the figure looks like besides the histories drawn on it
+PLOT_LAYOUT = {"figsize": list(fig.get_size_inches()), "dpi": fig.dpi, "panels": ["pop", "k", "resource"]}
 
-def reset_graph():
-    global current_step
-    current_step = 0
-    plt.cla()
+# Rendered figures by plot_key, most recently used last
+PLOT_CACHE_SIZE = 32
+plot_cache = OrderedDict()
+
+def plot_key(window_size):
+    """A hash of everything the current session's figure is drawn from"""
+
+    state = [
+        g.session_id,
+        list(simulation.version),
+        [microbe.name for microbe in simulation.microbes],
+        list(simulation.env.resource_history),
+        window_size,
+        PLOT_LAYOUT,
+    ]
+    return hashlib.sha256(json.dumps(state).encode("utf-8")).hexdigest()
 
 def graph_info(ax, window_size):
     for a in ax:
         a.clear()  # Clear previous plots
 
     # Microbes
-    for microbe in microbes:
+    for microbe in simulation.microbes:
         smoothed_pop = moving_average(microbe.pop_history, window_size)
-        ax[0].plot(range(len(smoothed_pop)), smoothed_pop, label=microbe.name)
+        ax[0].plot(*downsample(smoothed_pop, MAX_PLOT_POINTS), label=microbe.name)
 
     ax[0].set_xlabel("Time")
     ax[0].set_ylabel("Population")
@@ -338,9 +387,9 @@ def graph_info(ax, window_size):
     ax[0].grid()
 
     # Carrying capacity
-    for microbe in microbes:
+    for microbe in simulation.microbes:
         smoothed_k = moving_average(microbe.k_history, window_size)
-        ax[1].plot(range(len(smoothed_k)), smoothed_k, label=microbe.name)
+        ax[1].plot(*downsample(smoothed_k, MAX_PLOT_POINTS), label=microbe.name)
 
     ax[1].set_xlabel("Time")
     ax[1].set_ylabel("Carrying Capacity")
@@ -349,16 +398,19 @@ def graph_info(ax, window_size):
     ax[1].grid()
 
     # Resource Levels Over Time
-    for resource, values in env.resource_history.items():
-        ax[2].plot(range(len(values)), values, label=resource)
+    for resource, values in simulation.env.resource_history.items():
+        ax[2].plot(*downsample(values, MAX_PLOT_POINTS), label=resource)
 
     ax[2].set_xlabel("Time")
     ax[2].set_ylabel("Resource Level")
     ax[2].set_title("Resource Levels Over Time")
     ax[2].legend()
     ax[2].grid()
-    
-    plt.savefig('./static/images/plot.png')
+
+    # Only drawn when /plot.png is asked for, the page charts /history itself
+    image = io.BytesIO()
+    plt.savefig(image, format="png")
+    return image.getvalue()
 
 #
 # --- WEBSITE ---
@@ -366,31 +418,179 @@ def graph_info(ax, window_size):
 
 app = Flask(__name__)
 
+#
+# --- SESSIONS ---
+#
+
+@app.before_request
+def open_session():
+    # Static files do not need a simulation
+    if(request.endpoint == "static"):
+        return
+
+    session_id = request.cookies.get(SESSION_COOKIE, "")
+    g.new_session = SESSION_ID.fullmatch(session_id) is None
+    if(g.new_session):
+        session_id = secrets.token_urlsafe(16)
+
+    # One request at a time steps or edits a session's simulation
+    g.session_id = session_id
+    g.stored = store.checkout(session_id)
+    g.stored.lock.acquire()
+    g.simulation = g.stored.simulation
+
+@app.after_request
+def set_session_cookie(response):
+    if(g.get("new_session")):
+        response.set_cookie(SESSION_COOKIE, g.session_id, httponly=True, samesite="Lax")
+    return response
+
+@app.teardown_request
+def close_session(error):
+    if("stored" in g):
+        g.stored.lock.release()
+        store.checkin(g.session_id)
+
+#
+# --- ROUTES ---
+#
+
 @app.route("/")
 def init():
     advance_simulation()
-    graph_info(ax, 3)
     return render_template("index.html")
 
 @app.route("/nextTimeStep", methods=['POST'])
 def next_time_step():
-    if(len(env.resources) > 0):
+    if(len(simulation.env.resources) > 0):
         advance_simulation()
-        graph_info(ax, 3)
     return '', 204
 
 @app.route("/fastForward", methods=["POST"])
 def fast_forward():
-    if(len(env.resources) <= 0):
+    if(len(simulation.env.resources) <= 0):
         return '', 204
 
-    ff_amount = request.form.get("ffAmount")
-    for x in range(int(ff_amount)):
-        advance_simulation()
-    print("Saving plot")
-    graph_info(ax, 3)
-    print("Returning")
-    return '', 204
+    steps = fast_forward_amount(request.form.get("ffAmount", None, type=int))
+    if(steps is None):
+        return '', 400
+
+    # Runs on the worker pool, follow it at the Location returned
+    job = FastForwardJob(g.session_id, steps)
+    if(not submit_job(job)):
+        return '', 409
+
+    response = jsonify(job.progress())
+    response.status_code = 202
+    response.headers["Location"] = url_for("job_progress", job_id=job.id)
+    return response
+
+@app.route("/jobs/<job_id>")
+def job_progress(job_id):
+    job = session_job(job_id)
+    if(job is None):
+        return '', 404
+    return jsonify(job.progress())
+
+@app.route("/jobs/<job_id>/cancel", methods=["POST"])
+def cancel_job(job_id):
+    job = session_job(job_id)
+    if(job is None):
+        return '', 404
+
+    job.cancel()
+    return jsonify(job.progress())
+
+@app.route("/history")
+def history():
+    since = request.args.get("since", 0, type=int)
+    generation = request.args.get("generation", -1, type=int)
+    binary = request.args.get("format") == "f32"
+
+    meta, values = history_delta(simulation, since, generation, np.float32 if binary else np.float64)
+
+    # Raw float32, one run of new values per column, with the rest in a header
+    if(binary):
+        response = Response(np.ascontiguousarray(values.T).tobytes(), mimetype="application/octet-stream")
+        response.headers["X-History"] = json.dumps(meta)
+        return response
+
+    meta["values"] = [json_values(values[:, i]) for i in range(len(meta["columns"]))]
+    return jsonify(meta)
+
+@app.route("/fastForwardStream")
+def fast_forward_stream():
+    steps = fast_forward_amount(request.args.get("ffAmount", None, type=int))
+    if(steps is None):
+        return '', 400
+
+    since = request.args.get("since", 0, type=int)
+    generation = request.args.get("generation", -1, type=int)
+    fps = min(max(request.args.get("fps", STREAM_FPS, type=float), 1), STREAM_FPS)
+
+    stream = StepStream(g.session_id, steps, since, generation, fps)
+    if(not submit_job(stream.job)):
+        return '', 409
+    return Response(stream.events(), mimetype="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.route("/plot.png")
+def plot_png():
+    window_size = min(max(request.args.get("window", 3, type=int), 1), 1000)
+    key = plot_key(window_size)
+
+    # The browser already has this figure
+    if(request.if_none_match.contains(key)):
+        response = Response(status=304)
+    else:
+        # Every session draws on the same figure
+        with plot_lock:
+            image = plot_cache.get(key)
+            if(image is None):
+                image = plot_cache[key] = graph_info(ax, window_size)
+                if(len(plot_cache) > PLOT_CACHE_SIZE):
+                    plot_cache.popitem(last=False)
+            plot_cache.move_to_end(key)
+        response = Response(image, mimetype="image/png")
+
+    # Always ask again, the ETag changes with every step
+    response.set_etag(key)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+@app.route("/history_range")
+def history_range():
+    start = request.args.get("start", 0, type=int)
+    stop = request.args.get("stop", None, type=int)
+    points = min(request.args.get("points", MAX_PLOT_POINTS, type=int), 10000)
+
+    # Every history that is currently shown
+    histories = {"pop": {}, "k": {}, "resources": {}}
+    for microbe in simulation.microbes:
+        histories["pop"][microbe.name] = (("pop", microbe), microbe.pop_history)
+        histories["k"][microbe.name] = (("k", microbe), microbe.k_history)
+    for resource, values in simulation.env.resource_history.items():
+        histories["resources"][resource] = (("resources", simulation.env, resource), values)
+
+    # Forget pyramids of removed microbes and old environments
+    pyramids = session_pyramids.setdefault(g.simulation, {})
+    live = {key for group in histories.values() for key, _ in group.values()}
+    for key in list(pyramids):
+        if key not in live:
+            del pyramids[key]
+
+    response = {}
+    for group, series in histories.items():
+        response[group] = {}
+        for name, (key, values) in series.items():
+            steps, low, high, mean = synced_pyramid(pyramids, key, values).summary(start, stop, points)
+            response[group][name] = {
+                "steps": steps.astype(int).tolist(),
+                "min": json_values(low[:, 0]),
+                "max": json_values(high[:, 0]),
+                "mean": json_values(mean[:, 0]),
+            }
+
+    return jsonify(response)
 
 @app.route("/envOptions", methods=["POST", "GET"])
 def env_options():
@@ -409,8 +609,8 @@ def add_resource():
     if(new_resource_name == ""):
         return '', 204
     
-    env.resources[new_resource_name] = 0
-    env.resource_refresh_rate[new_resource_name] = 0
+    simulation.env.resources[new_resource_name] = 0
+    simulation.env.resource_refresh_rate[new_resource_name] = 0
 
     # Return so flask doesnt get mad
     return '', 204
@@ -419,10 +619,10 @@ def add_resource():
 def edit_env():
     # Handle visible web page
     if(request.method == 'GET'):
-        return render_template("edit_env.html", resources=env.resources, refresh=env.resource_refresh_rate)
+        return render_template("edit_env.html", resources=simulation.env.resources, refresh=simulation.env.resource_refresh_rate)
 
     # Handle backend POST
-    for res in env.resources:
+    for res in simulation.env.resources:
         # Get the keys
         amount_key = f"{res}_amount"
         rate_key = f"{res}_rate"
@@ -433,8 +633,8 @@ def edit_env():
         
         # Insert vals into dicts
         if(amount is not None and rate is not None):
-            env.resources[res] = amount
-            env.resource_refresh_rate[res] = rate
+            simulation.env.resources[res] = amount
+            simulation.env.resource_refresh_rate[res] = rate
 
     return '', 204
 
@@ -445,7 +645,7 @@ def microbe_options():
 @app.route("/create_microbe", methods=["POST", "GET"])
 def create_microbe():
     if(request.method == 'GET'):
-        return render_template("create_microbe.html", resources=env.resources)
+        return render_template("create_microbe.html", resources=simulation.env.resources)
     
     # Handle POST
     new_microbe_name = request.form.get("microbe_name")
@@ -457,7 +657,7 @@ def create_microbe():
     toxins = {}
 
     # Get REquired resources
-    for res in env.resources:
+    for res in simulation.env.resources:
         req_res_key = f"{res}_required_amount"
         req_res_amt = float(request.form.get(req_res_key))
 
@@ -469,7 +669,7 @@ def create_microbe():
         req_resources[res] = req_res_amt
 
     # Get produced resources
-    for res in env.resources:
+    for res in simulation.env.resources:
         prod_res_key = f"{res}_produced_amount"
         prod_res_amt = float(request.form.get(prod_res_key))
 
@@ -480,7 +680,7 @@ def create_microbe():
         # Add it to the dict
         prod_resources[res] = prod_res_amt
 
-    for res in env.resources:
+    for res in simulation.env.resources:
         toxicity_key = f"{res}_toxicity"
         min_safe_toxicity_key = f"{res}_min_safe_toxicity"
         max_safe_toxicity_key = f"{res}_max_safe_toxicity"
@@ -512,17 +712,17 @@ def create_microbe():
     )
 
     # Append it
-    microbes.append(new_microbe)
+    simulation.add_microbe(new_microbe)
 
     return '', 204
 
 @app.route("/edit_microbes", methods=['GET', 'POST'])
 def edit_microbes():
     if(request.method == 'GET'):
-        return render_template("edit_microbes.html", microbes=microbes)
+        return render_template("edit_microbes.html", microbes=simulation.microbes)
     
     # Handle POST
-    for microbe in microbes:
+    for microbe in simulation.microbes:
         pop_key = f"{microbe}_population"
 
         pop_amt = request.form.get(pop_key)
@@ -536,12 +736,12 @@ def edit_microbes():
 @app.route("/delete_microbes", methods=['GET', 'POST'])
 def delete_microbes():
     if(request.method == 'GET'):
-        return render_template("delete_microbes.html", microbes=microbes)
+        return render_template("delete_microbes.html", microbes=simulation.microbes)
     
     delete_list = []
     
     # handle POST
-    for microbe in microbes:
+    for microbe in simulation.microbes:
         checkbox_key = f"{microbe}_checkbox"
         checkbox_value = request.form.get(checkbox_key)
 
@@ -549,7 +749,7 @@ def delete_microbes():
             delete_list.append(microbe)
 
     for microbe in delete_list:
-        microbes.remove(microbe)
+        simulation.microbes.remove(microbe)
 
     return '', 204
 
@@ -558,130 +758,45 @@ def presets():
     if(request.method == 'GET'):
         return render_template("presets.html")
     
-@app.route("/reset", methods=['POST'])
-def reset():
-    global microbes
-    global env
+def load_preset_scenario(name):
+    """Replace the simulation with one of the popengine preset scenarios"""
 
-    microbes = []
-    env = Environment(
-        initial_resources={},
-        resource_refresh_rate={}
-    )
+    simulation.load_preset(name)
 
-    reset_graph()
-    graph_info(ax, 3)
+@app.route("/reset", methods=['POST'])
+def reset():
+    simulation.reset()
     return '', 204
     
-@app.route("/basic_symbiosis", methods=['POST'])
-def basic_symbiosis():
-    global env
-    global microbes
-
-    reset_graph()
+@app.route("/save_checkpoint", methods=['POST'])
+def save_checkpoint():
+    os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+    simulation.save_checkpoint(checkpoint_path())
+    return '', 204
 
-    env = Environment(
-        initial_resources={"Oxygen": 10, "Glucose": 10, "Lead": 0},
-        resource_refresh_rate={"Oxygen": 0, "Glucose": 0, "Lead": 0}
-    )
+@app.route("/load_checkpoint", methods=['POST'])
+def load_checkpoint():
+    # Nothing saved yet
+    if(not os.path.exists(checkpoint_path())):
+        return '', 404
 
-    microbes = [
-        Microbe(
-            name="OxygenEater",
-            initial_population=1,
-            growth_rate=1.2,
-            required_resources={"Oxygen": 1},
-            produced_resources={"Glucose": 1},
-            toxins={
-                "Lead": {"toxicity": 1.0, "min_safe_density": 0.0, "max_safe_density": 0.4, "lethal_density": 0.6}
-            }
-        ),
-        Microbe(
-            name="GlucoseEater",
-            initial_population=1,
-            growth_rate=1.2,
-            required_resources={"Glucose": 1},
-            produced_resources={"Oxygen": 1},
-            toxins={}
-        ),
-    ]
+    simulation.resume(checkpoint_path())
+    return '', 204
 
+@app.route("/basic_symbiosis", methods=['POST'])
+def basic_symbiosis():
+    load_preset_scenario("basic_symbiosis")
     advance_simulation()
+    return '', 204
 
 @app.route("/basic_with_lead", methods=['POST'])
 def basic_with_lead():
-    global env
-    global microbes
-
-    reset_graph()
-
-    env = Environment(
-        initial_resources={"Oxygen": 10, "Glucose": 10, "Lead": 0},
-        resource_refresh_rate={"Oxygen": 0, "Glucose": 0, "Lead": 1}
-    )
-
-    microbes = [
-        Microbe(
-            name="OxygenEater",
-            initial_population=1,
-            growth_rate=1.2,
-            required_resources={"Oxygen": 1},
-            produced_resources={"Glucose": 1},
-            toxins={
-                "Lead": {"toxicity": 1.0, "min_safe_density": 0.0, "max_safe_density": 0.4, "lethal_density": 0.6}
-            }
-        ),
-        Microbe(
-            name="GlucoseEater",
-            initial_population=1,
-            growth_rate=1.2,
-            required_resources={"Glucose": 1},
-            produced_resources={"Oxygen": 1},
-            toxins={}
-        ),
-    ]
-
+    load_preset_scenario("basic_with_lead")
     advance_simulation()
+    return '', 204
 
 @app.route("/3_microbe_symbiosis", methods=['POST'])
 def three_microbe_symbiosis():
-    global env
-    global microbes
-
-    reset_graph()
-
-    env = Environment(
-        initial_resources={"Oxygen": 10, "Glucose": 10, "Lead": 1},
-        resource_refresh_rate={"Oxygen": 0, "Glucose": 0, "Lead": 1}
-    )
-
-    microbes = [
-        Microbe(
-            name="O2Eater",
-            initial_population=1,
-            growth_rate=1.2,
-            required_resources={"Oxygen": 1},
-            produced_resources={"Glucose": 1},
-            toxins={
-                "Lead": {"toxicity": 1.0, "min_safe_density": 0.0, "max_safe_density": 0.4, "lethal_density": 0.6}
-            }
-        ),
-        Microbe(
-            name="GlucoseEater",
-            initial_population=1,
-            growth_rate=1.2,
-            required_resources={"Glucose": 1},
-            produced_resources={"Oxygen": 1},
-            toxins={}
-        ),
-        Microbe(
-            name="LeadEater",
-            initial_population=1,
-            growth_rate=1.2,
-            required_resources={"Lead": 1},
-            produced_resources={},
-            toxins={}
-        ),
-    ]
-
-    advance_simulation()
\ No newline at end of file
+    load_preset_scenario("three_microbe_symbiosis")
+    advance_simulation()
+    return '', 204
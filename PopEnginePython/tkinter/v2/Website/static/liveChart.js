@@ -0,0 +1,305 @@
+// Draws the simulation in the browser from /history, asking only for the steps
+// that are new since the last request
+
+// The same three panels the matplotlib figure had
+var panels = [
+    { prefix: "pop.", title: "Smoothed Microbial Growth Over Time", ylabel: "Population", smooth: true },
+    { prefix: "k.", title: "Smoothed Carrying Capacity Over Time", ylabel: "Carrying Capacity", smooth: true },
+    { prefix: "resource.", title: "Resource Levels Over Time", ylabel: "Resource Level", smooth: false },
+];
+
+// Matplotlib's default colors
+var lineColors = ["#1f77b4", "#ff7f0e", "#2ca02c", "#d62728", "#9467bd", "#8c564b", "#e377c2", "#7f7f7f", "#bcbd22", "#17becf"];
+
+// Smoothing on graphical representation
+var windowSize = 3;
+
+// Most min/max buckets kept per line, a few times the pixel width of a panel
+var maxBuckets = 4096;
+
+// Every sample received so far by column name, and the view each line is drawn from
+var samples = { generation: -1, step: 0, columns: [], series: {}, views: {} };
+
+// Fetch the new steps and redraw
+function refreshChart() {
+    var url = `/history?since=${samples.step}&generation=${samples.generation}&format=f32`;
+
+    return fetch(url)
+    .then(response => {
+        var meta = JSON.parse(response.headers.get("X-History"));
+        return response.arrayBuffer().then(buffer => appendSamples(meta, new Float32Array(buffer)));
+    })
+    .then(drawChart)
+    .catch(error => console.error('Error:', error));
+}
+
+// Fast forward, drawing the new steps as the server streams them. Calls done with the
+// job's progress once it has finished, or with null if the stream broke off
+function streamFastForward(steps, done) {
+    var source = new EventSource(`/fastForwardStream?ffAmount=${steps}&since=${samples.step}&generation=${samples.generation}`);
+
+    source.addEventListener("history", event => {
+        var meta = JSON.parse(event.data);
+        appendSamples(meta, decodeFloat32(meta.values));
+        drawChart();
+    });
+
+    source.addEventListener("done", event => {
+        source.close();
+        done(JSON.parse(event.data));
+    });
+
+    // Without this the browser would reconnect and fast forward all over again
+    source.onerror = () => {
+        source.close();
+        done(null);
+    };
+}
+
+// Base64 float32 values from a stream event
+function decodeFloat32(text) {
+    var bytes = Uint8Array.from(atob(text), c => c.charCodeAt(0));
+    return new Float32Array(bytes.buffer);
+}
+
+// Add a block of new steps, one run of values per column
+function appendSamples(meta, values) {
+    // The simulation was reset or replaced, start again
+    if (meta.reset) {
+        samples.series = {};
+        samples.views = {};
+    }
+
+    var count = meta.step - meta.since;
+    var series = {};
+    var views = {};
+
+    meta.columns.forEach((name, i) => {
+        var column = samples.series[name] || [];
+
+        // Columns that are new to us read as missing before now
+        while (column.length < meta.since) {
+            column.push(NaN);
+        }
+
+        for (var j = 0; j < count; j++) {
+            column.push(values[i * count + j]);
+        }
+        series[name] = column;
+
+        var panel = panels.find(panel => name.startsWith(panel.prefix));
+        views[name] = samples.views[name] || newView(panel !== undefined && panel.smooth);
+        extendView(views[name], column);
+    });
+
+    samples.generation = meta.generation;
+    samples.step = meta.step;
+    samples.columns = meta.columns;
+    samples.series = series;
+    samples.views = views;
+}
+
+// What a line is drawn from: its smoothed values, their limits and min/max buckets
+function newView(smooth) {
+    return { smooth: smooth, smoothed: [], length: 0, low: Infinity, high: -Infinity, size: 1, mins: [], maxs: [] };
+}
+
+// Fold the values added since the last call into a view
+function extendView(view, values) {
+    var shown = values;
+    if (view.smooth) {
+        // Same as np.convolve(values, np.ones(w) / w, mode='valid'), for the new windows only
+        for (var i = view.smoothed.length; i + windowSize <= values.length; i++) {
+            var total = 0;
+            for (var j = i; j < i + windowSize; j++) {
+                total += values[j];
+            }
+            view.smoothed.push(total / windowSize);
+        }
+        shown = view.smoothed;
+    }
+
+    for (var i = view.length; i < shown.length; i++) {
+        var bucket = Math.floor(i / view.size);
+        if (bucket === view.mins.length) {
+            view.mins.push(Infinity);
+            view.maxs.push(-Infinity);
+        }
+
+        if (isFinite(shown[i])) {
+            view.mins[bucket] = Math.min(view.mins[bucket], shown[i]);
+            view.maxs[bucket] = Math.max(view.maxs[bucket], shown[i]);
+            view.low = Math.min(view.low, shown[i]);
+            view.high = Math.max(view.high, shown[i]);
+        }
+
+        // Too many buckets, so merge them in pairs
+        if (view.mins.length > maxBuckets) {
+            var mins = [];
+            var maxs = [];
+            for (var b = 0; b < view.mins.length; b += 2) {
+                mins.push(Math.min(view.mins[b], b + 1 < view.mins.length ? view.mins[b + 1] : Infinity));
+                maxs.push(Math.max(view.maxs[b], b + 1 < view.maxs.length ? view.maxs[b + 1] : -Infinity));
+            }
+            view.mins = mins;
+            view.maxs = maxs;
+            view.size *= 2;
+        }
+    }
+    view.length = shown.length;
+}
+
+function drawChart() {
+    var canvas = document.getElementById("graphCanvas");
+    var context = canvas.getContext("2d");
+    context.clearRect(0, 0, canvas.width, canvas.height);
+
+    var width = canvas.width / panels.length;
+    panels.forEach((panel, p) => drawPanel(context, panel, p * width, width, canvas.height));
+}
+
+function drawPanel(context, panel, left, width, height) {
+    // Leave room around the plot for the title, ticks and labels
+    var plot = { left: left + 80, top: 40, width: width - 110, height: height - 100 };
+
+    var lines = samples.columns
+        .filter(name => name.startsWith(panel.prefix))
+        .map(name => ({
+            label: name.slice(panel.prefix.length),
+            view: samples.views[name],
+        }));
+
+    // Limits over every line, kept up to date by extendView
+    var length = 1;
+    var low = Infinity;
+    var high = -Infinity;
+    lines.forEach(line => {
+        length = Math.max(length, line.view.length);
+        low = Math.min(low, line.view.low);
+        high = Math.max(high, line.view.high);
+    });
+    if (low === Infinity) {
+        low = 0;
+        high = 1;
+    }
+    if (low === high) {
+        high = low + 1;
+    }
+
+    var x = step => plot.left + step / length * plot.width;
+    var y = value => plot.top + (high - value) / (high - low) * plot.height;
+
+    // Grid and ticks
+    context.font = "12px sans-serif";
+    context.lineWidth = 1;
+    context.strokeStyle = "#e0e0e0";
+    context.fillStyle = "#000";
+
+    context.textAlign = "center";
+    context.textBaseline = "top";
+    niceTicks(0, length).forEach(tick => {
+        gridLine(context, x(tick), plot.top, x(tick), plot.top + plot.height);
+        context.fillText(formatTick(tick), x(tick), plot.top + plot.height + 6);
+    });
+
+    context.textAlign = "right";
+    context.textBaseline = "middle";
+    niceTicks(low, high).forEach(tick => {
+        gridLine(context, plot.left, y(tick), plot.left + plot.width, y(tick));
+        context.fillText(formatTick(tick), plot.left - 6, y(tick));
+    });
+
+    context.strokeStyle = "#000";
+    context.strokeRect(plot.left, plot.top, plot.width, plot.height);
+
+    // Lines
+    context.lineWidth = 1.5;
+    lines.forEach((line, i) => {
+        context.strokeStyle = lineColors[i % lineColors.length];
+        drawLine(context, line.view, plot, x, y);
+    });
+
+    // Title and axis labels
+    context.textAlign = "center";
+    context.textBaseline = "alphabetic";
+    context.font = "14px sans-serif";
+    context.fillText(panel.title, plot.left + plot.width / 2, plot.top - 12);
+    context.font = "12px sans-serif";
+    context.fillText("Time", plot.left + plot.width / 2, plot.top + plot.height + 40);
+
+    context.save();
+    context.translate(left + 16, plot.top + plot.height / 2);
+    context.rotate(-Math.PI / 2);
+    context.fillText(panel.ylabel, 0, 0);
+    context.restore();
+
+    // Legend
+    context.textAlign = "left";
+    context.textBaseline = "middle";
+    lines.forEach((line, i) => {
+        var row = plot.top + 14 + i * 18;
+        context.fillStyle = lineColors[i % lineColors.length];
+        context.fillRect(plot.left + plot.width - 120, row - 2, 20, 4);
+        context.fillStyle = "#000";
+        context.fillText(line.label, plot.left + plot.width - 94, row);
+    });
+}
+
+// Draw one line from its view with at most one min/max pair per pixel, breaking at
+// missing values
+function drawLine(context, view, plot, x, y) {
+    var buckets = view.mins.length;
+    var group = Math.max(1, Math.floor(buckets / plot.width));
+    var drawing = false;
+
+    context.beginPath();
+    for (var start = 0; start < buckets; start += group) {
+        var low = Infinity;
+        var high = -Infinity;
+        for (var i = start; i < Math.min(start + group, buckets); i++) {
+            low = Math.min(low, view.mins[i]);
+            high = Math.max(high, view.maxs[i]);
+        }
+
+        if (low === Infinity) {
+            drawing = false;
+            continue;
+        }
+
+        var step = start * view.size;
+        if (drawing) {
+            context.lineTo(x(step), y(low));
+        } else {
+            context.moveTo(x(step), y(low));
+            drawing = true;
+        }
+        if (high !== low) {
+            context.lineTo(x(step), y(high));
+        }
+    }
+    context.stroke();
+}
+
+function gridLine(context, x1, y1, x2, y2) {
+    context.beginPath();
+    context.moveTo(x1, y1);
+    context.lineTo(x2, y2);
+    context.stroke();
+}
+
+// About five round numbered ticks between low and high
+function niceTicks(low, high) {
+    var rough = (high - low) / 5;
+    var magnitude = Math.pow(10, Math.floor(Math.log10(rough)));
+    var step = [1, 2, 5, 10].map(m => m * magnitude).find(s => s >= rough);
+
+    var ticks = [];
+    for (var tick = Math.ceil(low / step) * step; tick <= high + step * 1e-9; tick += step) {
+        ticks.push(tick);
+    }
+    return ticks;
+}
+
+function formatTick(value) {
+    return Number(value.toPrecision(6)).toString();
+}
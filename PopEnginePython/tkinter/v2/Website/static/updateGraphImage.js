@@ -1,29 +1,11 @@
-var imageURI = 'static/images/plot.png';
-var img = new Image();
-
-// Function to update the canvas with the new image
+// Function to update the canvas with the new steps
 function updateCanvas() {
-    img.src = imageURI + '?d=' + Date.now(); // Cache busting
-
-    var canvas = document.getElementById("graphCanvas");
-    var context = canvas.getContext("2d");
-
-    // Ensure image is fully loaded before drawing
-    img.onload = function() {
-        context.clearRect(0, 0, canvas.width, canvas.height);
-
-        // Calculate the position to center the image in the canvas
-        var x = (canvas.width - img.width) / 2;
-        var y = (canvas.height - img.height) / 2;
-
-        context.drawImage(img, x, y, img.width, img.height);
-    };
-
-    img.onerror = function() {
-        console.error("Error loading image.");
-    };
+    refreshChart();
 }
 
+// Draw whatever the simulation already has
+updateCanvas();
+
 // Handle next time step
 document.getElementById("nextTimeStepButton").addEventListener("click", function() {
     var loadingIndicator = document.getElementById("loadingIndicator");
@@ -45,23 +27,48 @@ document.getElementById("ffButton").addEventListener("click", function() {
     var loadingIndicator = document.getElementById("loadingIndicator");
     loadingIndicator.style.display = "block";
 
-    fetch('/fastForward', {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/x-www-form-urlencoded' },
-        body: `ffAmount=${ffAmount}`,
-    })
-    .then(response => {
-        if (response.ok) {
-            updateCanvas();
-        }
-    })
-    .catch(error => console.error('Error:', error))
-    .finally(() => loadingIndicator.style.display = "none");
+    streamFastForward(ffAmount, progress => {
+        loadingIndicator.style.display = "none";
+        showFastForwardResult(progress);
+    });
 });
 
+// Say where the fast forward settled or started cycling, if it did
+function showFastForwardResult(progress) {
+    var result = document.getElementById("fastForwardResult");
+
+    if (progress && progress.equilibrium_step !== null) {
+        result.textContent = `Settled at step ${progress.equilibrium_step}`;
+    } else if (progress && progress.orbit !== null) {
+        var orbit = progress.orbit;
+        var swings = Object.entries(orbit.population_amplitude)
+            .map(([name, amplitude]) => `${name} ${amplitude.toPrecision(3)}`);
+        result.textContent = `Cycles every ${orbit.period} steps from step ${orbit.start_step}, populations swing by ${swings.join(", ")}`;
+    } else {
+        result.textContent = "";
+    }
+}
+
 // Handle reset
 document.getElementById("resetButton").addEventListener("click", function() {
     fetch('/reset', { method: 'POST' })
     .then(() => updateCanvas())
     .catch(error => console.error('Error:', error));
 });
+
+// Handle saving a checkpoint
+document.getElementById("saveCheckpointButton").addEventListener("click", function() {
+    fetch('/save_checkpoint', { method: 'POST' })
+    .catch(error => console.error('Error:', error));
+});
+
+// Handle loading the last checkpoint
+document.getElementById("loadCheckpointButton").addEventListener("click", function() {
+    fetch('/load_checkpoint', { method: 'POST' })
+    .then(response => {
+        if (response.ok) {
+            updateCanvas();
+        }
+    })
+    .catch(error => console.error('Error:', error));
+});
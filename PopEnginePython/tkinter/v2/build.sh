@@ -1 +1 @@
-pyinstaller --onefile --hidden-import PIL._tkinter_finder model2.py
+pyinstaller --onefile --hidden-import PIL._tkinter_finder --paths ../.. --add-data ../../popengine/scenarios:popengine/scenarios model2.py
@@ -4,210 +4,13 @@ import numpy as np
 import tkinter as tk
 from tkinter import ttk, messagebox
 import PIL.ImageTk
+import os
+import sys
 
-#
-# --- MICROBE CLASS
-#
-
-class Microbe:
-    def __init__(self, name, initial_population, growth_rate, required_resources, produced_resources, toxins):
-        """Create a new Microbe population with given properties"""
-
-        # Basics required for growth equation
-        self.name = name
-        self.population = initial_population
-        self.growth_rate = growth_rate
-        self.competitors = {}
-
-        # Resources and toxins
-        self.required_resources = required_resources
-        self.produced_resources = produced_resources
-        self.toxins = toxins
-
-        # Carry capacity
-        self.k_resources = {}
-
-        # Set up arrays to keep track of history (for graphing :3)
-        self.pop_history = []
-        self.k_history = []
-
-    def compute_growth(self):
-        """Compute growth using the Lotka-Volterra model"""
-
-        # Determine the limiting resource
-        min_k = min(self.k_resources[res] for res in self.required_resources)
-
-        # Avoid division by zero if resources are depleted
-        if min_k == 0:
-            if(self.population <= 2):
-                return -1 * self.population # Kill population if small enough
-            return self.growth_rate * -0.33 * self.population  # Extinction effect
-
-        # Compute competition effect
-        competition_effect = sum(self.competitors[m] for m in self.competitors)
-
-        # Compute the growth
-        growth = self.growth_rate * self.population * (1 - (competition_effect / min_k))
-
-        # Prevent overshooting into negative population
-        return max(growth, -self.population)
-    
-    def calculate_toxicity_multiplier(self, env_resources):
-        """Calculate the impact of toxins on microbial growth"""
-
-        # Find total resources 
-        total_resources = sum(env_resources.values())
-
-        if(total_resources == 0):
-            return 0.0
-
-        min_toxicity = 1.0
-
-        for res in self.toxins:
-            # Find weighted density of the current toxin
-            cur_toxin = self.toxins[res]
-            max_safe_density = cur_toxin["max_safe_density"]
-            min_safe_density = cur_toxin["min_safe_density"]
-            lethal_density = cur_toxin["lethal_density"]
-            toxin_weighted_density = (cur_toxin["toxicity"] * env_resources[res]) / total_resources
-
-            # If the density is in the safe range, continue to next toxin
-            if (toxin_weighted_density <= max_safe_density and toxin_weighted_density >= min_safe_density):
-                continue
-            
-            # If the density is lethal, return 0
-            if(toxin_weighted_density >= lethal_density):
-                return 0.0
-            
-            # If the density is between lethal and max safe density, then normalize the toxicity between the two
-            if (toxin_weighted_density >= max_safe_density and toxin_weighted_density <= lethal_density):
-                cur_toxicity = (toxin_weighted_density - lethal_density) / (max_safe_density - lethal_density)
-            
-            # If the density is less than the minimum that is safe, 
-            if(toxin_weighted_density <= min_safe_density):
-                cur_toxicity = (toxin_weighted_density) / (min_safe_density)
-            
-            # Keep track of the most toxic thing (least multiple because it acts as a multiplier)
-            min_toxicity = min(min_toxicity, cur_toxicity)
-
-        return min_toxicity
-
-    def update_population(self, new_pop):
-        """Update the population of a microbe and track the history"""
-
-        self.pop_history.append(self.population)
-        self.population = max(0, self.population + new_pop)
-
-    def add_competitor(self, other_microbe):
-        """Calculate the competition coefficient for another microbe based on shared resources"""
-
-        # Reset competition coefficients to be empty
-        competition_coefficients = []
-
-        # Find the shared resources
-        shared_resources = set(self.required_resources.keys()).intersection(set(other_microbe.required_resources.keys()))
-
-        # Calculate competition coefficient
-        for res in shared_resources:
-            competition_coefficients.append(other_microbe.required_resources[res] / self.required_resources[res])
-
-        # If no competition coefficients, the master competition coefficient is determined to be zero
-        if not competition_coefficients:
-            self.competitors[other_microbe] = 0
-
-        # Otherwise, it's the max of the competition coefficients
-        else:
-            self.competitors[other_microbe] = other_microbe.population * max(competition_coefficients)
-    
-    def produce_consume_resources(self):
-        """Calculate net resource change per time step"""
-
-        # Dict to keep track of the resource changes
-        resource_change = {}
-
-        # Determine the limiting resource
-        min_k = min(self.k_resources[res] for res in self.required_resources)
-
-        # Add the consumed resources
-        for res in self.required_resources:
-            resource_change[res] = self.required_resources[res] * min(min_k, self.population) * -1
-
-        # Add the produced resources, adding to dict if necessary
-        for res in self.produced_resources:
-            if res in resource_change:
-                resource_change[res] += self.produced_resources[res] * min(min_k, self.population)
-            else:
-                resource_change[res] = self.produced_resources[res] * min(min_k, self.population)
-
-        return resource_change
-    
-    def compute_carry_capacity(self, env_resources):
-        """Calculate the carrying capacity based on environmental resources and their toxicity"""
-
-        # Find minimum toxicity multiplier
-        toxicity_mult = self.calculate_toxicity_multiplier(env_resources)
-
-        # Find the carry capacity
-        for res in env_resources:
-            resource_consumption = self.required_resources.get(res, 0)  # Per microbe consumption
-
-            # If no pop, then k = 0
-            if(self.population == 0):
-                self.k_resources[res] = 0
-
-            # Microbe doesn't use this resource, so no limit
-            elif resource_consumption == 0:
-                self.k_resources[res] = float('inf')
-
-            # K = num resouces * toxicity multiplier / resource_consumption
-            else:
-                self.k_resources[res] = (env_resources[res] / resource_consumption) * toxicity_mult
-        
-        # Append the minimum to the history
-        min_k = min(self.k_resources[res] for res in self.required_resources)
-        self.k_history.append(min_k)
-
-#
-# --- ENVIRONMENT CLASS ---
-#
-
-class Environment:
-    def __init__(self, initial_resources, resource_refresh_rate):
-        """Initialize the environment with resources and refresh rates"""
-
-        self.resources = initial_resources
-        self.resource_refresh_rate = resource_refresh_rate
-        self.resource_history = {res: [] for res in initial_resources}
-
-    def update_resource_history(self):
-        """Log and refresh resources over time"""
-
-        # For all resources
-        for res in self.resources:
-            # Add new resource
-            if res not in self.resource_history:
-                # Create entry
-                self.resource_history[res] = []
-
-                # Backlog history as 0
-                for x in range(hist_len):
-                    self.resource_history[res].append(0)
-
-            hist_len = len(self.resource_history[res])
-
-            # Add current resource amount to history
-            self.resource_history[res].append(self.resources[res])
-
-            # Get resources from refresh rate
-            self.resources[res] += self.resource_refresh_rate[res]
-            if(self.resources[res] < 0):
-                self.resources[res] = 0
-
-    def add_resources(self, added_resources):
-        """Add resources that come from outside sources (i.e. Microbes)"""
-
-        for res in added_resources:
-            self.resources[res] += added_resources[res]
+# The shared popengine package lives three folders up
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", ".."))
+from popengine.model import Microbe
+from popengine.simulation import Simulation
 
 #
 # --- GRAPHING ---
@@ -222,7 +25,7 @@ def graph_info(ax, window_size):
         a.clear()  # Clear previous plots
 
     # Microbes
-    for microbe in microbes:
+    for microbe in simulation.microbes:
         smoothed_pop = moving_average(microbe.pop_history, window_size)
         ax[0].plot(range(len(smoothed_pop)), smoothed_pop, label=microbe.name)
 
@@ -233,7 +36,7 @@ def graph_info(ax, window_size):
     ax[0].grid()
 
     # Carrying capacity
-    for microbe in microbes:
+    for microbe in simulation.microbes:
         smoothed_k = moving_average(microbe.k_history, window_size)
         ax[1].plot(range(len(smoothed_k)), smoothed_k, label=microbe.name)
 
@@ -244,7 +47,7 @@ def graph_info(ax, window_size):
     ax[1].grid()
 
     # Resource Levels Over Time
-    for resource, values in env.resource_history.items():
+    for resource, values in simulation.env.resource_history.items():
         ax[2].plot(range(len(values)), values, label=resource)
 
     ax[2].set_xlabel("Time")
@@ -259,72 +62,16 @@ def graph_info(ax, window_size):
 # -- SETUP ---
 #
 
-env = Environment(
-    initial_resources={"Oxygen": 2, "Glucose": 2, "Lead": 0},
-    resource_refresh_rate={"Oxygen": 0, "Glucose": 0, "Lead": 1}
-)
-
-microbes = [
-    Microbe(
-        name="m1",
-        initial_population=1,
-        growth_rate=1.2,
-        required_resources={"Oxygen": 1},
-        produced_resources={"Glucose": 1},
-        toxins={
-            "Lead": {"toxicity": 1.0, "min_safe_density": 0.0, "max_safe_density": 0.4, "lethal_density": 0.6}
-        }
-    ),
-    Microbe(
-        name="m2",
-        initial_population=1,
-        growth_rate=1.2,
-        required_resources={"Glucose": 1},
-        produced_resources={"Oxygen": 1},
-        toxins={}
-    ),
-]
+simulation = Simulation.from_preset("demo_symbiosis_with_toxins")
 
 #
 # --- SIMULATION ---
 #
 
-def advance_simulation():
-    global current_step
-    # Begin the simulation
-    if(len(microbes) != 0):
-        # Calculate competition coefficients at every time step because population is part of the calculations
-        for m1 in microbes:
-            m1.competitors = {}
-            for m2 in microbes:
-                m1.add_competitor(m2)
-
-        total_resource_usage = {}
-
-        # Process each microbe
-        for microbe in microbes:
-            # Get carry capacity of microbe
-            microbe.compute_carry_capacity(env.resources)
-
-            # Get resource changes due to microbe
-            net_resource_usage = microbe.produce_consume_resources()
-            print(net_resource_usage)
-            for resource in net_resource_usage:
-                if resource in total_resource_usage:
-                    total_resource_usage[resource] += net_resource_usage[resource]
-                else:
-                    total_resource_usage[resource] = net_resource_usage[resource]
-
-            # Calculate new microbe population
-            pop_change = microbe.compute_growth()
-            microbe.update_population(pop_change)
-
-    # Log resource history
-    env.add_resources(total_resource_usage)
-    env.update_resource_history()
-
-    current_step += 1
-    step_label.config(text=f"Time Step: {current_step}")
+def advance_simulation(steps=1):
+    # The shared engine stops on its own once every resource has run out
+    simulation.run(steps)
+    step_label.config(text=f"Time Step: {simulation.current_step}")
 
 #
 # --- GUI ---
@@ -407,11 +154,11 @@ def show_microbes_popup():
             widget.destroy()
 
         # Display no microbes
-        if(len(microbes) == 0):
+        if(len(simulation.microbes) == 0):
             microbe_label = ttk.Label(scrollable_frame, text="No microbes!", font=("Arial", 12, "bold"))
             microbe_label.pack(anchor="w", padx=10, pady=10)
 
-        for microbe in microbes:
+        for microbe in simulation.microbes:
             # Create label for microbe name
             microbe_label = ttk.Label(scrollable_frame, text=f"Microbe: {microbe.name}", font=("Arial", 12, "bold"))
             microbe_label.pack(anchor="w", padx=10, pady=10)
@@ -511,11 +258,7 @@ def add_microbe_popup():
             toxins=toxins
         )
 
-        for x in range(current_step):
-            new_microbe.pop_history.append(0)
-            new_microbe.k_history.append(0)
-
-        microbes.append(new_microbe)
+        simulation.add_microbe(new_microbe)
         form.destroy()
     # Get the name
     ttk.Label(scroll_frame, text="Name:").pack(pady=5)
@@ -538,7 +281,7 @@ def add_microbe_popup():
     required_resource_vars = {}
     req_quantity_entry = {}
     
-    for resource in env.resources:
+    for resource in simulation.env.resources:
         req_var = tk.BooleanVar()
         required_resource_vars[resource] = req_var
         
@@ -562,7 +305,7 @@ def add_microbe_popup():
     produced_resource_vars = {}
     prod_quantity_entry = {}
     
-    for resource in env.resources:
+    for resource in simulation.env.resources:
         prod_var = tk.BooleanVar()
         produced_resource_vars[resource] = prod_var
         
@@ -584,7 +327,7 @@ def add_microbe_popup():
     ttk.Label(scroll_frame, text="Toxins:").pack(pady=5)
     
     toxin_widgets = []
-    for resource in env.resources:
+    for resource in simulation.env.resources:
         toxin = ResourceToxinWidget(scroll_frame, resource)
         toxin.pack(pady=2, anchor='center', fill='x')
         toxin_widgets.append(toxin)
@@ -621,13 +364,13 @@ def remove_microbe_popup():
     def remove_microbes():
         # Append microbes to remove to a list to avoid modifying as we iterate
         remove_list = []
-        for microbe in microbes:
+        for microbe in simulation.microbes:
             if (microbes_to_remove_vars[microbe].get()):
                 remove_list.append(microbe)
 
         # Remove all the ones in the list
         for microbe in remove_list:
-            microbes.remove(microbe)
+            simulation.microbes.remove(microbe)
 
         # Update the GUI
         update_remove_microbe_gui()
@@ -640,7 +383,7 @@ def remove_microbe_popup():
         for widget in scrollable_frame.winfo_children():
             widget.destroy()
 
-        for microbe in microbes:
+        for microbe in simulation.microbes:
             # Set up our value to access later
             var = tk.BooleanVar()
             microbes_to_remove_vars[microbe] = var
@@ -684,23 +427,23 @@ def view_environment_popup():
             widget.destroy()
 
         # Handle no resources
-        if(len(env.resources) == 0):
+        if(len(simulation.env.resources) == 0):
             no_resources_label = ttk.Label(scrollable_frame, text="No resources!", font=("Arial", 12, "bold"))
             no_resources_label.pack(anchor="w", padx=10, pady=10)
             return
 
         # For each resource, print:
-        for resource in env.resources:
+        for resource in simulation.env.resources:
             # Name
             resource_label = ttk.Label(scrollable_frame, text=f"Resource: {resource}", font=("Arial", 12, "bold"))
             resource_label.pack(anchor="w", padx=10, pady=10)
 
             # Current amount
-            amount_label = ttk.Label(scrollable_frame, text=f"Amount: {env.resources[resource]}", font=("Arial", 12))
+            amount_label = ttk.Label(scrollable_frame, text=f"Amount: {simulation.env.resources[resource]}", font=("Arial", 12))
             amount_label.pack(anchor="w", padx=10, pady=10)
 
             # Refresh rate
-            refresh_label = ttk.Label(scrollable_frame, text=f"Refresh amount: {env.resource_refresh_rate[resource]}", font=("Arial", 12))
+            refresh_label = ttk.Label(scrollable_frame, text=f"Refresh amount: {simulation.env.resource_refresh_rate[resource]}", font=("Arial", 12))
             refresh_label.pack(anchor="w", padx=10, pady=10)
 
             # Separator
@@ -735,15 +478,15 @@ def edit_environment_popup():
     )
 
     def update_env_resources_GUI():
-        for resource in env.resources:
-            env.resources[resource] = int(float(amount_entries[resource].get().strip()))
-            env.resource_refresh_rate[resource] = int(float(refresh_entries[resource].get().strip()))
+        for resource in simulation.env.resources:
+            simulation.env.resources[resource] = int(float(amount_entries[resource].get().strip()))
+            simulation.env.resource_refresh_rate[resource] = int(float(refresh_entries[resource].get().strip()))
         popup.destroy()
 
     amount_entries = {}
     refresh_entries = {}
 
-    for resource in env.resources:
+    for resource in simulation.env.resources:
         # Create frame
         resource_frame = ttk.Frame(scrollable_frame)
         resource_frame.pack(pady=2)
@@ -758,7 +501,7 @@ def edit_environment_popup():
 
         # Amount entry
         amount_entry_field = ttk.Entry(resource_frame, width = 5)
-        amount_entry_field.insert(0, env.resources[resource])
+        amount_entry_field.insert(0, simulation.env.resources[resource])
         amount_entry_field.grid(row=1, column=1, padx=5, pady=5)
         
         amount_entries[resource] = amount_entry_field
@@ -769,7 +512,7 @@ def edit_environment_popup():
 
         # Refresh entry
         refresh_entry_field = ttk.Entry(resource_frame, width = 5)
-        refresh_entry_field.insert(0, env.resource_refresh_rate[resource])
+        refresh_entry_field.insert(0, simulation.env.resource_refresh_rate[resource])
         refresh_entry_field.grid(row=2, column=1, padx=5, pady=5)
 
         refresh_entries[resource] = refresh_entry_field
@@ -802,8 +545,8 @@ def add_resources_popup():
 
     def submit_add_resource():
         new_microbe_name = new_microbe_entry.get()
-        env.resources[new_microbe_name] = 0
-        env.resource_refresh_rate[new_microbe_name] = 0
+        simulation.env.resources[new_microbe_name] = 0
+        simulation.env.resource_refresh_rate[new_microbe_name] = 0
         popup.destroy()
 
     new_microbe_label = tk.Label(scrollable_frame, text="Name of new resource")
@@ -816,8 +559,7 @@ def add_resources_popup():
     submit_button.pack(padx=5, pady=5)
 
 def fast_forward_pressed():
-    for x in range(ff_amount):
-        advance_simulation()
+    advance_simulation(ff_amount)
     graph_info(ax, window_size)
 
 def next_time_step_pressed():
@@ -872,7 +614,6 @@ def environment_button_pressed():
 
 # Set how long the simulation will run for
 window_size = 3
-current_step = 0
 ff_amount = 1
 
 # TKinter window
@@ -884,7 +625,7 @@ canvas = FigureCanvasTkAgg(fig, master=root)
 canvas.get_tk_widget().pack()
 
 # Labels to show timestep
-step_label = tk.Label(root, text=f"Time Step: {current_step}")
+step_label = tk.Label(root, text=f"Time Step: {simulation.current_step}")
 step_label.pack()
 
 # Button to advance time
@@ -2,336 +2,84 @@ import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import numpy as np
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
 import PIL.ImageTk
+import os
+import sys
 
-#
-# --- MICROBE CLASS
-#
-
-class Microbe:
-    def __init__(self, name, initial_population, growth_rate, required_resources, produced_resources, toxins):
-        """Create a new Microbe population with given properties"""
-
-        # Basics required for growth equation
-        self.name = name
-        self.population = initial_population
-        self.growth_rate = growth_rate
-        self.competitors = {}
-
-        # Resources and toxins
-        self.required_resources = required_resources
-        self.produced_resources = produced_resources
-        self.toxins = toxins
-
-        # Carry capacity
-        self.k_resources = {}
-
-        # Set up arrays to keep track of history (for graphing :3)
-        self.pop_history = []
-        self.k_history = []
-
-    def compute_growth(self):
-        """Compute growth using the Lotka-Volterra model"""
-
-        # Determine the limiting resource
-        min_k = min(self.k_resources[res] for res in self.required_resources)
-
-        # Avoid division by zero if resources are depleted
-        if min_k == 0:
-            if(self.population <= 2):
-                return -1 * self.population # Kill population if small enough
-            return self.growth_rate * -0.33 * self.population  # Extinction effect
-
-        # Compute competition effect
-        competition_effect = sum(self.competitors[m] for m in self.competitors)
-
-        # Compute the growth
-        growth = self.growth_rate * self.population * (1 - (competition_effect / min_k))
-
-        # Prevent overshooting into negative population
-        return max(growth, -self.population)
-    
-    def calculate_toxicity_multiplier(self, env_resources):
-        """Calculate the impact of toxins on microbial growth"""
-
-        # Find total resources 
-        total_resources = sum(env_resources.values())
-
-        if(total_resources == 0):
-            return 0.0
-
-        min_toxicity = 1.0
-
-        for res in self.toxins:
-            # Find weighted density of the current toxin
-            cur_toxin = self.toxins[res]
-            max_safe_density = cur_toxin["max_safe_density"]
-            min_safe_density = cur_toxin["min_safe_density"]
-            lethal_density = cur_toxin["lethal_density"]
-            toxin_weighted_density = (cur_toxin["toxicity"] * env_resources[res]) / total_resources
-
-            # If the density is in the safe range, continue to next toxin
-            if (toxin_weighted_density <= max_safe_density and toxin_weighted_density >= min_safe_density):
-                continue
-            
-            # If the density is lethal, return 0
-            if(toxin_weighted_density >= lethal_density):
-                return 0.0
-            
-            # If the density is between lethal and max safe density, then normalize the toxicity between the two
-            if (toxin_weighted_density >= max_safe_density and toxin_weighted_density <= lethal_density):
-                cur_toxicity = (toxin_weighted_density - lethal_density) / (max_safe_density - lethal_density)
-            
-            # If the density is less than the minimum that is safe, 
-            if(toxin_weighted_density <= min_safe_density):
-                cur_toxicity = (toxin_weighted_density) / (min_safe_density)
-            
-            # Keep track of the most toxic thing (least multiple because it acts as a multiplier)
-            min_toxicity = min(min_toxicity, cur_toxicity)
-
-        return min_toxicity
-
-    def update_population(self, new_pop):
-        """Update the population of a microbe and track the history"""
-
-        self.pop_history.append(self.population)
-        self.population = max(0, self.population + new_pop)
-
-    def add_competitor(self, other_microbe):
-        """Calculate the competition coefficient for another microbe based on shared resources"""
-
-        # Reset competition coefficients to be empty
-        competition_coefficients = []
-
-        # Find the shared resources
-        shared_resources = set(self.required_resources.keys()).intersection(set(other_microbe.required_resources.keys()))
-
-        # Calculate competition coefficient
-        for res in shared_resources:
-            competition_coefficients.append(other_microbe.required_resources[res] / self.required_resources[res])
-
-        # If no competition coefficients, the master competition coefficient is determined to be zero
-        if not competition_coefficients:
-            self.competitors[other_microbe] = 0
-
-        # Otherwise, it's the max of the competition coefficients
-        else:
-            self.competitors[other_microbe] = other_microbe.population * max(competition_coefficients)
-    
-    def produce_consume_resources(self):
-        """Calculate net resource change per time step"""
-
-        # Dict to keep track of the resource changes
-        resource_change = {}
-
-        # Determine the limiting resource
-        min_k = min(self.k_resources[res] for res in self.required_resources)
-
-        # Add the consumed resources
-        for res in self.required_resources:
-            resource_change[res] = self.required_resources[res] * min(min_k, self.population) * -1
-
-        # Add the produced resources, adding to dict if necessary
-        for res in self.produced_resources:
-            if res in resource_change:
-                resource_change[res] += self.produced_resources[res] * min(min_k, self.population)
-            else:
-                resource_change[res] = self.produced_resources[res] * min(min_k, self.population)
-
-        return resource_change
-    
-    def compute_carry_capacity(self, env_resources):
-        """Calculate the carrying capacity based on environmental resources and their toxicity"""
-
-        # Find minimum toxicity multiplier
-        toxicity_mult = self.calculate_toxicity_multiplier(env_resources)
-
-        # Find the carry capacity
-        for res in env_resources:
-            resource_consumption = self.required_resources.get(res, 0)  # Per microbe consumption
-
-            # If no pop, then k = 0
-            if(self.population == 0):
-                self.k_resources[res] = 0
-
-            # Microbe doesn't use this resource, so no limit
-            elif resource_consumption == 0:
-                self.k_resources[res] = float('inf')
-
-            # K = num resouces * toxicity multiplier / resource_consumption
-            else:
-                self.k_resources[res] = (env_resources[res] / resource_consumption) * toxicity_mult
-        
-        # Append the minimum to the history
-        min_k = min(self.k_resources[res] for res in self.required_resources)
-        self.k_history.append(min_k)
+# The shared popengine package lives two folders up
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from popengine.model import Microbe
+from popengine.plotting import LivePlot
+from popengine.simulation import Simulation
+from popengine.smoothing import StreamingSmoother
 
 #
-# --- ENVIRONMENT CLASS ---
+# --- GRAPHING ---
 #
 
-class Environment:
-    def __init__(self, initial_resources, resource_refresh_rate):
-        """Initialize the environment with resources and refresh rates"""
-
-        self.resources = initial_resources
-        self.resource_refresh_rate = resource_refresh_rate
-        self.resource_history = {res: [] for res in initial_resources}
+# Smoothing on graphical representation, one (population, k) smoother pair per microbe
+smoothers = {}
 
-    def update_resource_history(self):
-        """Log and refresh resources over time"""
+def smoothed_histories(microbe, window_size):
+    if microbe not in smoothers or window_size not in smoothers[microbe][0].window_sizes:
+        smoothers[microbe] = (StreamingSmoother((window_size,)), StreamingSmoother((window_size,)))
 
-        # For all resources
-        for res in self.resources:
-            # Add new resource
-            if res not in self.resource_history:
-                # Create entry
-                self.resource_history[res] = []
+    # Only the points added since the last redraw get smoothed
+    pop_smoother, k_smoother = smoothers[microbe]
+    pop_smoother.update(microbe.pop_history)
+    k_smoother.update(microbe.k_history)
 
-                # Backlog history as 0
-                for x in range(hist_len):
-                    self.resource_history[res].append(0)
+    return pop_smoother.values(window_size), k_smoother.values(window_size)
 
-            hist_len = len(self.resource_history[res])
+def graph_info(ax, window_size):
+    # Forget smoothers of microbes that have been removed
+    for microbe in list(smoothers):
+        if microbe not in simulation.microbes:
+            del smoothers[microbe]
 
-            # Add current resource amount to history
-            self.resource_history[res].append(self.resources[res])
+    smoothed = [smoothed_histories(microbe, window_size) for microbe in simulation.microbes]
 
-            # Get resources from refresh rate
-            self.resources[res] += self.resource_refresh_rate[res]
-            if(self.resources[res] < 0):
-                self.resources[res] = 0
+    # Lines are kept between calls and only their data is replaced
+    live_plot.update([
+        # Microbes
+        [(microbe.name, pop) for microbe, (pop, k) in zip(simulation.microbes, smoothed)],
 
-    def add_resources(self, added_resources):
-        """Add resources that come from outside sources (i.e. Microbes)"""
+        # Carrying capacity
+        [(microbe.name, k) for microbe, (pop, k) in zip(simulation.microbes, smoothed)],
 
-        for res in added_resources:
-            self.resources[res] += added_resources[res]
-
-#
-# --- GRAPHING ---
-#
-
-# Smoothing on graphical representation
-def moving_average(data, window_size):
-    return np.convolve(data, np.ones(window_size)/window_size, mode='valid')
-
-def graph_info(ax, window_size):
-    for a in ax:
-        a.clear()  # Clear previous plots
-
-    # Microbes
-    for microbe in microbes:
-        smoothed_pop = moving_average(microbe.pop_history, window_size)
-        ax[0].plot(range(len(smoothed_pop)), smoothed_pop, label=microbe.name)
-
-    ax[0].set_xlabel("Time")
-    ax[0].set_ylabel("Population")
-    ax[0].set_title("Smoothed Microbial Growth Over Time")
-    ax[0].legend()
-    ax[0].grid()
-
-    # Carrying capacity
-    for microbe in microbes:
-        smoothed_k = moving_average(microbe.k_history, window_size)
-        ax[1].plot(range(len(smoothed_k)), smoothed_k, label=microbe.name)
-
-    ax[1].set_xlabel("Time")
-    ax[1].set_ylabel("Carrying Capacity")
-    ax[1].set_title("Smoothed Carrying Capacity Over Time")
-    ax[1].legend()
-    ax[1].grid()
-
-    # Resource Levels Over Time
-    for resource, values in env.resource_history.items():
-        ax[2].plot(range(len(values)), values, label=resource)
-
-    ax[2].set_xlabel("Time")
-    ax[2].set_ylabel("Resource Level")
-    ax[2].set_title("Resource Levels Over Time")
-    ax[2].legend()
-    ax[2].grid()
-
-    canvas.draw()
+        # Resource Levels Over Time
+        [(resource, values) for resource, values in simulation.env.resource_history.items()],
+    ])
 
 #
 # -- SETUP ---
 #
 
-env = Environment(
-    initial_resources={"Oxygen": 2, "Glucose": 2, "Lead": 1},
-    resource_refresh_rate={"Oxygen": 0, "Glucose": 0, "Lead": 1}
-)
-
-microbes = [
-    Microbe(
-        name="O2Eater",
-        initial_population=1,
-        growth_rate=1.2,
-        required_resources={"Oxygen": 1},
-        produced_resources={"Glucose": 1},
-        toxins={
-            "Lead": {"toxicity": 1.0, "min_safe_density": 0.0, "max_safe_density": 0.4, "lethal_density": 0.6}
-        }
-    ),
-    Microbe(
-        name="GlucoseEater",
-        initial_population=1,
-        growth_rate=1.2,
-        required_resources={"Glucose": 1},
-        produced_resources={"Oxygen": 1},
-        toxins={}
-    ),
-    Microbe(
-        name="LeadEater",
-        initial_population=1,
-        growth_rate=1.2,
-        required_resources={"Lead": 1},
-        produced_resources={},
-        toxins={}
-    ),
-]
+simulation = Simulation.from_preset("demo_stable_with_toxins")
 
 #
 # --- SIMULATION ---
 #
 
-def advance_simulation():
-    global current_step
-    # Begin the simulation
-    if(len(microbes) != 0):
-        # Calculate competition coefficients at every time step because population is part of the calculations
-        for m1 in microbes:
-            m1.competitors = {}
-            for m2 in microbes:
-                m1.add_competitor(m2)
-
-        total_resource_usage = {}
-
-        # Process each microbe
-        for microbe in microbes:
-            # Get carry capacity of microbe
-            microbe.compute_carry_capacity(env.resources)
-
-            # Get resource changes due to microbe
-            net_resource_usage = microbe.produce_consume_resources()
-            for resource in net_resource_usage:
-                if resource in total_resource_usage:
-                    total_resource_usage[resource] += net_resource_usage[resource]
-                else:
-                    total_resource_usage[resource] = net_resource_usage[resource]
-
-            # Calculate new microbe population
-            pop_change = microbe.compute_growth()
-            microbe.update_population(pop_change)
-
-    # Log resource history
-    env.add_resources(total_resource_usage)
-    env.update_resource_history()
-
-    current_step += 1
-    step_label.config(text=f"Time Step: {current_step}")
+def advance_simulation(steps=1):
+    # The shared engine stops on its own once every resource has run out
+    simulation.run(steps)
+    step_label.config(text=f"Time Step: {simulation.current_step}")
+
+def fast_forward_simulation(steps):
+    # Skips the work once the populations settle or cycle, and shows where they did
+    equilibrium_step = simulation.fast_forward(steps)
+    orbit = simulation.orbit
+
+    text = f"Time Step: {simulation.current_step}"
+    if(equilibrium_step is not None):
+        text += f" (settled at step {equilibrium_step})"
+    elif(orbit is not None):
+        text += f" (cycles every {orbit.period} steps from step {orbit.start_step})"
+        swings = zip([microbe.name for microbe in simulation.microbes], orbit.population_amplitude)
+        text += "\nPopulations swing by " + ", ".join(f"{name} {amplitude:.3g}" for name, amplitude in swings)
+    step_label.config(text=text)
 
 #
 # --- GUI ---
@@ -414,11 +162,11 @@ def show_microbes_popup():
             widget.destroy()
 
         # Display no microbes
-        if(len(microbes) == 0):
+        if(len(simulation.microbes) == 0):
             microbe_label = ttk.Label(scrollable_frame, text="No microbes!", font=("Arial", 12, "bold"))
             microbe_label.pack(anchor="w", padx=10, pady=10)
 
-        for microbe in microbes:
+        for microbe in simulation.microbes:
             # Create label for microbe name
             microbe_label = ttk.Label(scrollable_frame, text=f"Microbe: {microbe.name}", font=("Arial", 12, "bold"))
             microbe_label.pack(anchor="w", padx=10, pady=10)
@@ -518,11 +266,7 @@ def add_microbe_popup():
             toxins=toxins
         )
 
-        for x in range(current_step):
-            new_microbe.pop_history.append(0)
-            new_microbe.k_history.append(0)
-
-        microbes.append(new_microbe)
+        simulation.add_microbe(new_microbe)
         form.destroy()
     # Get the name
     ttk.Label(scroll_frame, text="Name:").pack(pady=5)
@@ -545,7 +289,7 @@ def add_microbe_popup():
     required_resource_vars = {}
     req_quantity_entry = {}
     
-    for resource in env.resources:
+    for resource in simulation.env.resources:
         req_var = tk.BooleanVar()
         required_resource_vars[resource] = req_var
         
@@ -569,7 +313,7 @@ def add_microbe_popup():
     produced_resource_vars = {}
     prod_quantity_entry = {}
     
-    for resource in env.resources:
+    for resource in simulation.env.resources:
         prod_var = tk.BooleanVar()
         produced_resource_vars[resource] = prod_var
         
@@ -591,7 +335,7 @@ def add_microbe_popup():
     ttk.Label(scroll_frame, text="Toxins:").pack(pady=5)
     
     toxin_widgets = []
-    for resource in env.resources:
+    for resource in simulation.env.resources:
         toxin = ResourceToxinWidget(scroll_frame, resource)
         toxin.pack(pady=2, anchor='center', fill='x')
         toxin_widgets.append(toxin)
@@ -628,13 +372,13 @@ def remove_microbe_popup():
     def remove_microbes():
         # Append microbes to remove to a list to avoid modifying as we iterate
         remove_list = []
-        for microbe in microbes:
+        for microbe in simulation.microbes:
             if (microbes_to_remove_vars[microbe].get()):
                 remove_list.append(microbe)
 
         # Remove all the ones in the list
         for microbe in remove_list:
-            microbes.remove(microbe)
+            simulation.microbes.remove(microbe)
 
         # Update the GUI
         update_remove_microbe_gui()
@@ -647,7 +391,7 @@ def remove_microbe_popup():
         for widget in scrollable_frame.winfo_children():
             widget.destroy()
 
-        for microbe in microbes:
+        for microbe in simulation.microbes:
             # Set up our value to access later
             var = tk.BooleanVar()
             microbes_to_remove_vars[microbe] = var
@@ -687,13 +431,13 @@ def edit_microbes_popup():
     )
 
     def update_microbe_pops_GUI():
-        for microbe in microbes:
+        for microbe in simulation.microbes:
             microbe.population = float(amount_entries[microbe].get().strip())
         popup.destroy()
 
     amount_entries = {}
 
-    for microbe in microbes:
+    for microbe in simulation.microbes:
         # Create frame
         microbe_frame = ttk.Frame(scrollable_frame)
         microbe_frame.pack(pady=2)
@@ -744,23 +488,23 @@ def view_environment_popup():
             widget.destroy()
 
         # Handle no resources
-        if(len(env.resources) == 0):
+        if(len(simulation.env.resources) == 0):
             no_resources_label = ttk.Label(scrollable_frame, text="No resources!", font=("Arial", 12, "bold"))
             no_resources_label.pack(anchor="w", padx=10, pady=10)
             return
 
         # For each resource, print:
-        for resource in env.resources:
+        for resource in simulation.env.resources:
             # Name
             resource_label = ttk.Label(scrollable_frame, text=f"Resource: {resource}", font=("Arial", 12, "bold"))
             resource_label.pack(anchor="w", padx=10, pady=10)
 
             # Current amount
-            amount_label = ttk.Label(scrollable_frame, text=f"Amount: {env.resources[resource]}", font=("Arial", 12))
+            amount_label = ttk.Label(scrollable_frame, text=f"Amount: {simulation.env.resources[resource]}", font=("Arial", 12))
             amount_label.pack(anchor="w", padx=10, pady=10)
 
             # Refresh rate
-            refresh_label = ttk.Label(scrollable_frame, text=f"Refresh amount: {env.resource_refresh_rate[resource]}", font=("Arial", 12))
+            refresh_label = ttk.Label(scrollable_frame, text=f"Refresh amount: {simulation.env.resource_refresh_rate[resource]}", font=("Arial", 12))
             refresh_label.pack(anchor="w", padx=10, pady=10)
 
             # Separator
@@ -795,15 +539,15 @@ def edit_environment_popup():
     )
 
     def update_env_resources_GUI():
-        for resource in env.resources:
-            env.resources[resource] = int(float(amount_entries[resource].get().strip()))
-            env.resource_refresh_rate[resource] = int(float(refresh_entries[resource].get().strip()))
+        for resource in simulation.env.resources:
+            simulation.env.resources[resource] = int(float(amount_entries[resource].get().strip()))
+            simulation.env.resource_refresh_rate[resource] = int(float(refresh_entries[resource].get().strip()))
         popup.destroy()
 
     amount_entries = {}
     refresh_entries = {}
 
-    for resource in env.resources:
+    for resource in simulation.env.resources:
         # Create frame
         resource_frame = ttk.Frame(scrollable_frame)
         resource_frame.pack(pady=2)
@@ -818,7 +562,7 @@ def edit_environment_popup():
 
         # Amount entry
         amount_entry_field = ttk.Entry(resource_frame, width = 5)
-        amount_entry_field.insert(0, env.resources[resource])
+        amount_entry_field.insert(0, simulation.env.resources[resource])
         amount_entry_field.grid(row=1, column=1, padx=5, pady=5)
         
         amount_entries[resource] = amount_entry_field
@@ -829,7 +573,7 @@ def edit_environment_popup():
 
         # Refresh entry
         refresh_entry_field = ttk.Entry(resource_frame, width = 5)
-        refresh_entry_field.insert(0, env.resource_refresh_rate[resource])
+        refresh_entry_field.insert(0, simulation.env.resource_refresh_rate[resource])
         refresh_entry_field.grid(row=2, column=1, padx=5, pady=5)
 
         refresh_entries[resource] = refresh_entry_field
@@ -862,8 +606,8 @@ def add_resources_popup():
 
     def submit_add_resource():
         new_microbe_name = new_microbe_entry.get()
-        env.resources[new_microbe_name] = 0
-        env.resource_refresh_rate[new_microbe_name] = 0
+        simulation.env.resources[new_microbe_name] = 0
+        simulation.env.resource_refresh_rate[new_microbe_name] = 0
         popup.destroy()
 
     new_microbe_label = tk.Label(scrollable_frame, text="Name of new resource")
@@ -876,14 +620,39 @@ def add_resources_popup():
     submit_button.pack(padx=5, pady=5)
 
 def fast_forward_pressed():
-    for x in range(ff_amount):
-        advance_simulation()
+    fast_forward_simulation(ff_amount)
     graph_info(ax, window_size)
 
 def next_time_step_pressed():
     advance_simulation()
     graph_info(ax, window_size)
 
+def save_checkpoint_pressed():
+    path = filedialog.asksaveasfilename(defaultextension=".popckpt", filetypes=[("Checkpoints", "*.popckpt")])
+
+    # Cancelled
+    if(not path):
+        return
+
+    simulation.save_checkpoint(path)
+
+def load_checkpoint_pressed():
+    path = filedialog.askopenfilename(filetypes=[("Checkpoints", "*.popckpt")])
+
+    # Cancelled
+    if(not path):
+        return
+
+    try:
+        simulation.resume(path)
+    except ValueError as error:
+        messagebox.showerror("Load Checkpoint", str(error))
+        return
+
+    reset_graph()
+    graph_info(ax, window_size)
+    step_label.config(text=f"Time Step: {simulation.current_step}")
+
 def quit_pressed():
     plt.close(fig)
     root.destroy()
@@ -935,124 +704,28 @@ def environment_button_pressed():
     add_resource_button.pack()
 
 def reset_graph():
-    global current_step
-    current_step = 0
-    plt.cla()
+    live_plot.reset()
 
 def presets_button_pressed():
     form = tk.Toplevel(root)
     form.geometry("400x300")
     form.title("Presets")
 
-    def basic_symbiosis_button_pressed():
-        global microbes
-        global env
-
-        env = Environment(
-            initial_resources={"Oxygen": 10, "Glucose": 10, "Lead": 0},
-            resource_refresh_rate={"Oxygen": 0, "Glucose": 0, "Lead": 0}
-        )
-
-        microbes = [
-            Microbe(
-                name="OxygenEater",
-                initial_population=1,
-                growth_rate=1.2,
-                required_resources={"Oxygen": 1},
-                produced_resources={"Glucose": 1},
-                toxins={
-                    "Lead": {"toxicity": 1.0, "min_safe_density": 0.0, "max_safe_density": 0.4, "lethal_density": 0.6}
-                }
-            ),
-            Microbe(
-                name="GlucoseEater",
-                initial_population=1,
-                growth_rate=1.2,
-                required_resources={"Glucose": 1},
-                produced_resources={"Oxygen": 1},
-                toxins={}
-            ),
-        ]
+    def preset_button_pressed(name):
+        simulation.load_preset(name)
 
         reset_graph()
         next_time_step_pressed()
         form.destroy()
 
-    def lead_button_pressed():
-        global microbes
-        global env
-
-        env = Environment(
-            initial_resources={"Oxygen": 10, "Glucose": 10, "Lead": 0},
-            resource_refresh_rate={"Oxygen": 0, "Glucose": 0, "Lead": 1}
-        )
-
-        microbes = [
-            Microbe(
-                name="OxygenEater",
-                initial_population=1,
-                growth_rate=1.2,
-                required_resources={"Oxygen": 1},
-                produced_resources={"Glucose": 1},
-                toxins={
-                    "Lead": {"toxicity": 1.0, "min_safe_density": 0.0, "max_safe_density": 0.4, "lethal_density": 0.6}
-                }
-            ),
-            Microbe(
-                name="GlucoseEater",
-                initial_population=1,
-                growth_rate=1.2,
-                required_resources={"Glucose": 1},
-                produced_resources={"Oxygen": 1},
-                toxins={}
-            ),
-        ]
+    def basic_symbiosis_button_pressed():
+        preset_button_pressed("basic_symbiosis")
 
-        reset_graph()
-        next_time_step_pressed()
-        form.destroy()
+    def lead_button_pressed():
+        preset_button_pressed("basic_with_lead")
 
     def stable_with_lead_button_pressed():
-        global microbes
-        global env
-
-        env = Environment(
-            initial_resources={"Oxygen": 10, "Glucose": 10, "Lead": 1},
-            resource_refresh_rate={"Oxygen": 0, "Glucose": 0, "Lead": 1}
-        )
-
-        microbes = [
-            Microbe(
-                name="O2Eater",
-                initial_population=1,
-                growth_rate=1.2,
-                required_resources={"Oxygen": 1},
-                produced_resources={"Glucose": 1},
-                toxins={
-                    "Lead": {"toxicity": 1.0, "min_safe_density": 0.0, "max_safe_density": 0.4, "lethal_density": 0.6}
-                }
-            ),
-            Microbe(
-                name="GlucoseEater",
-                initial_population=1,
-                growth_rate=1.2,
-                required_resources={"Glucose": 1},
-                produced_resources={"Oxygen": 1},
-                toxins={}
-            ),
-            Microbe(
-                name="LeadEater",
-                initial_population=1,
-                growth_rate=1.2,
-                required_resources={"Lead": 1},
-                produced_resources={},
-                toxins={}
-            ),
-        ]
-
-        reset_graph()
-        next_time_step_pressed()
-        form.destroy()
+        preset_button_pressed("three_microbe_symbiosis")
 
     # View environment stats
     basic_symbiosis_button = tk.Button(form, text="Basic Symbiosis", command=basic_symbiosis_button_pressed)
@@ -1067,21 +740,13 @@ def presets_button_pressed():
     stable_with_lead_button.pack()
 
 def reset_pressed():
-    global microbes
-    global env
-
-    microbes = []
-    env = Environment(
-        initial_resources={},
-        resource_refresh_rate={}
-    )
+    simulation.reset()
 
     reset_graph()
     graph_info(ax, window_size)
 
 # Set how long the simulation will run for
 window_size = 3
-current_step = 0
 ff_amount = 1
 
 # TKinter window
@@ -1091,9 +756,10 @@ root.title("Microbe Simulation")
 fig, ax = plt.subplots(1, 3, figsize=(18, 5))
 canvas = FigureCanvasTkAgg(fig, master=root)
 canvas.get_tk_widget().pack()
+live_plot = LivePlot(canvas, ax)
 
 # Labels to show timestep
-step_label = tk.Label(root, text=f"Time Step: {current_step}")
+step_label = tk.Label(root, text=f"Time Step: {simulation.current_step}")
 step_label.pack()
 
 # Button to advance time
@@ -1125,6 +791,13 @@ presets_button.pack()
 reset_button = tk.Button(root, text="Reset", command=reset_pressed)
 reset_button.pack()
 
+# Checkpoints
+save_checkpoint_button = tk.Button(root, text="Save Checkpoint", command=save_checkpoint_pressed)
+save_checkpoint_button.pack()
+
+load_checkpoint_button = tk.Button(root, text="Load Checkpoint", command=load_checkpoint_pressed)
+load_checkpoint_button.pack()
+
 # Quit button
 quit_button = tk.Button(root, text="Quit", command=quit_pressed)
 quit_button.pack()
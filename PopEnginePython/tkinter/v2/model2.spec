@@ -3,9 +3,9 @@
 
 a = Analysis(
     ['model2.py'],
-    pathex=[],
+    pathex=['../..'],
     binaries=[],
-    datas=[],
+    datas=[('../../popengine/scenarios', 'popengine/scenarios')],
     hiddenimports=['PIL._tkinter_finder'],
     hookspath=[],
     hooksconfig={},